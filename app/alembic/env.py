@@ -0,0 +1,86 @@
+"""Alembic environment that migrates the database of the application."""
+
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import Connection
+from sqlmodel import SQLModel
+
+import app.models.tables  # noqa: F401 - registers all tables on the metadata
+from app.config import settings
+from app.database import create_database_engine
+from app.migrations import include_name, stamp_unversioned_database
+
+config = context.config
+
+# A connection is passed in when the migrations are run from Python, e.g. by
+# tests, which configure logging themselves.
+if config.config_file_name is not None and "connection" not in config.attributes:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = SQLModel.metadata
+
+
+def get_url() -> str:
+    """Get the URL of the database to migrate."""
+    return config.get_main_option("sqlalchemy.url") or settings.DATABASE_URL
+
+
+def run_migrations_offline() -> None:
+    """Write the SQL of the migrations to stdout instead of running them."""
+    context.configure(
+        url=get_url(),
+        target_metadata=target_metadata,
+        include_name=include_name,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations(connection: Connection) -> None:
+    """Run the migrations on a connection, each in its own transaction."""
+    stamp_unversioned_database(connection)
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_name=include_name,
+        # SQLite can only alter most of a table by recreating it
+        render_as_batch=connection.dialect.name == "sqlite",
+        transaction_per_migration=True,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Run the migrations on the database.
+
+    A connection can be passed in the ``connection`` attribute of the config,
+    otherwise the database from the settings is used.
+    """
+    if (connection := config.attributes.get("connection")) is not None:
+        run_migrations(connection)
+        return
+
+    engine = create_database_engine(get_url())
+    try:
+        with engine.connect() as connection:
+            if connection.dialect.name == "sqlite":
+                # SQLite alters a table by recreating it, which would fail or
+                # cascade while other tables refer to it. The pragma only takes
+                # effect outside of a transaction.
+                connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+                connection.commit()
+            run_migrations(connection)
+    finally:
+        engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,92 @@
+"""Create the initial schema.
+
+This is the schema that ``create_all`` created before migrations existed.
+Such databases already have it, so env.py marks them as being at this
+revision and the later revisions then bring them up to date.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 08:23:35.447024
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+import sqlmodel
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: str | Sequence[str] | None = None
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "user",
+        sa.Column("username", sqlmodel.AutoString(length=255), nullable=False),
+        sa.Column("email", sqlmodel.AutoString(length=255), nullable=False),
+        sa.Column("first_name", sqlmodel.AutoString(length=255), nullable=True),
+        sa.Column("last_name", sqlmodel.AutoString(length=255), nullable=True),
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("hashed_password", sqlmodel.AutoString(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=False),
+        sa.Column("is_superuser", sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_user_email", "user", ["email"])
+    op.create_index("ix_user_username", "user", ["username"], unique=True)
+
+    op.create_table(
+        "folder",
+        sa.Column("name", sqlmodel.AutoString(length=128), nullable=False),
+        sa.Column("owner_id", sa.Uuid(), nullable=True),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("parent_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["owner_id"], ["user.id"]),
+        sa.ForeignKeyConstraint(["parent_id"], ["folder.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+    op.create_table(
+        "tag",
+        sa.Column("owner_id", sa.Uuid(), nullable=True),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sqlmodel.AutoString(length=128), nullable=False),
+        sa.Column("parent_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["owner_id"], ["user.id"]),
+        sa.ForeignKeyConstraint(["parent_id"], ["tag.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+    op.create_table(
+        "note",
+        sa.Column("title", sqlmodel.AutoString(), nullable=False),
+        sa.Column("body", sqlmodel.AutoString(), nullable=False),
+        sa.Column("folder_id", sa.Integer(), nullable=True),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("owner_id", sa.Uuid(), nullable=True),
+        sa.ForeignKeyConstraint(["folder_id"], ["folder.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["owner_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+    op.create_table(
+        "notetaglink",
+        sa.Column("note_id", sa.Integer(), nullable=False),
+        sa.Column("tag_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["note_id"], ["note.id"]),
+        sa.ForeignKeyConstraint(["tag_id"], ["tag.id"]),
+        sa.PrimaryKeyConstraint("note_id", "tag_id"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("notetaglink")
+    op.drop_table("note")
+    op.drop_table("tag")
+    op.drop_table("folder")
+    op.drop_table("user")
@@ -0,0 +1,110 @@
+"""Add full names and paths to tags.
+
+The full names and paths of existing tags are computed from their parents,
+one level of the hierarchy at a time. Every level is backfilled in batches
+that are committed on their own. Tags whose parent was deleted while foreign
+keys were not enforced become root tags, as they do when a tag is deleted now.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 11:42:17.305518
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+import sqlmodel
+from alembic import op
+
+from app.migrations import backfill_in_batches
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: str | Sequence[str] | None = "0001"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+tag = sa.table(
+    "tag",
+    sa.column("id", sa.Integer()),
+    sa.column("name", sa.String()),
+    sa.column("parent_id", sa.Integer()),
+    sa.column("full_name", sa.String()),
+    sa.column("path", sa.String()),
+)
+parent = tag.alias("parent")
+
+
+def backfill_tags(connection: sa.Connection) -> None:
+    """Compute the full names and paths of all tags from their parents."""
+    is_parent = parent.c.id == tag.c.parent_id
+    backfill_in_batches(
+        connection,
+        tag,
+        tag.c.id,
+        {"parent_id": None},
+        where=tag.c.parent_id.is_not(None) & ~sa.exists().where(is_parent),
+    )
+    backfill_in_batches(
+        connection,
+        tag,
+        tag.c.id,
+        {"full_name": tag.c.name, "path": ""},
+        where=tag.c.parent_id.is_(None),
+    )
+
+    # Every pass fills the children of the tags filled by the previous ones
+    values = {
+        "full_name": sa.select(parent.c.full_name + "/" + tag.c.name)
+        .where(is_parent)
+        .scalar_subquery(),
+        "path": sa.select(parent.c.path + sa.cast(parent.c.id, sa.String) + "/")
+        .where(is_parent)
+        .scalar_subquery(),
+    }
+    where = tag.c.full_name.is_(None) & sa.exists().where(
+        is_parent,
+        parent.c.full_name.is_not(None),
+    )
+    while backfill_in_batches(connection, tag, tag.c.id, values, where=where):
+        pass
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "tag",
+        sa.Column("full_name", sqlmodel.AutoString(length=128), nullable=True),
+    )
+    op.add_column("tag", sa.Column("path", sqlmodel.AutoString(), nullable=True))
+
+    with op.get_context().autocommit_block():
+        backfill_tags(op.get_bind())
+
+    # Tags are few compared to notes, so recreating the table on SQLite is quick
+    with op.batch_alter_table("tag") as batch_op:
+        batch_op.alter_column(
+            "full_name",
+            existing_type=sqlmodel.AutoString(length=128),
+            nullable=False,
+        )
+        batch_op.alter_column(
+            "path",
+            existing_type=sqlmodel.AutoString(),
+            nullable=False,
+        )
+        batch_op.create_index(
+            "ix_tag_owner_id_full_name",
+            ["owner_id", "full_name"],
+            unique=True,
+        )
+        batch_op.create_index("ix_tag_path", ["path"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("tag") as batch_op:
+        batch_op.drop_index("ix_tag_path")
+        batch_op.drop_index("ix_tag_owner_id_full_name")
+        batch_op.drop_column("path")
+        batch_op.drop_column("full_name")
@@ -0,0 +1,66 @@
+"""Add the full-text search index for notes.
+
+Only SQLite has the index, it is filled from the existing notes and kept in
+sync by triggers.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 11:58:40.162734
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: str | Sequence[str] | None = "0002"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# SQLite FTS5 index over the title and body of notes, kept in sync by triggers
+NOTE_SEARCH_DDL = (
+    """
+    CREATE VIRTUAL TABLE note_fts USING fts5(
+        title, body, content='note', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER note_fts_after_insert AFTER INSERT ON note BEGIN
+        INSERT INTO note_fts(rowid, title, body)
+        VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER note_fts_after_delete AFTER DELETE ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER note_fts_after_update AFTER UPDATE OF title, body
+    ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO note_fts(rowid, title, body)
+        VALUES (new.id, new.title, new.body);
+    END
+    """,
+    "INSERT INTO note_fts(note_fts) VALUES ('rebuild')",
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == "sqlite":
+        for ddl in NOTE_SEARCH_DDL:
+            op.execute(ddl)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == "sqlite":
+        for trigger in ("insert", "delete", "update"):
+            op.execute(f"DROP TRIGGER note_fts_after_{trigger}")
+        op.execute("DROP TABLE note_fts")
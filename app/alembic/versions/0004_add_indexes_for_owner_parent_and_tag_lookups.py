@@ -0,0 +1,44 @@
+"""Add indexes for owner, parent and tag lookups.
+
+On PostgreSQL the indexes are built concurrently, so the tables stay writable
+meanwhile. That cannot run in a transaction, so every index is committed on
+its own.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 12:03:11.840519
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: str | Sequence[str] | None = "0003"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+INDEXES = (
+    ("ix_folder_owner_id_id", "folder", ["owner_id", "id"]),
+    ("ix_folder_parent_id_name", "folder", ["parent_id", "name"]),
+    ("ix_tag_owner_id_id", "tag", ["owner_id", "id"]),
+    ("ix_tag_parent_id_name", "tag", ["parent_id", "name"]),
+    ("ix_note_owner_id_id", "note", ["owner_id", "id"]),
+    ("ix_note_folder_id", "note", ["folder_id"]),
+    ("ix_notetaglink_tag_id_note_id", "notetaglink", ["tag_id", "note_id"]),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table, postgresql_concurrently=True)
@@ -0,0 +1,101 @@
+"""Add versions to notes and folders.
+
+The versions are used as entity tags, so ids must not be reused either. On
+SQLite that requires AUTOINCREMENT, for which the tables are recreated. The
+rows are copied in batches while the old tables stay writable.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 08:28:04.928388
+"""
+
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+
+import sqlalchemy as sa
+import sqlmodel
+from alembic import op
+from alembic.operations import BatchOperations
+
+from app.migrations import rebuild_table_in_batches
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: str | Sequence[str] | None = "0004"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+TABLES = ("folder", "note")
+
+
+@contextmanager
+def recreate_table(table: str, *, autoincrement: bool) -> Iterator[BatchOperations]:
+    """Alter a table, recreating it on SQLite with or without AUTOINCREMENT.
+
+    Recreating a table drops its triggers, e.g. those that keep the search
+    index of notes in sync, so they are created again afterwards.
+    """
+    bind = op.get_bind()
+    if bind.dialect.name != "sqlite":
+        with op.batch_alter_table(table) as batch_op:
+            yield batch_op
+        return
+
+    statement = sa.text(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = :table",
+    )
+    triggers = bind.execute(statement, {"table": table}).scalars().all()
+    with op.batch_alter_table(
+        table,
+        recreate="always",
+        table_kwargs={"sqlite_autoincrement": autoincrement},
+    ) as batch_op:
+        yield batch_op
+    for trigger in triggers:
+        op.execute(trigger)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "sqlite":
+        for table in TABLES:
+            op.add_column(
+                table,
+                sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+            )
+        return
+
+    rebuild_table_in_batches(
+        "folder",
+        sa.Column("name", sqlmodel.AutoString(length=128), nullable=False),
+        sa.Column("owner_id", sa.Uuid(), nullable=True),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("parent_id", sa.Integer(), nullable=True),
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+        sa.ForeignKeyConstraint(["owner_id"], ["user.id"]),
+        sa.ForeignKeyConstraint(["parent_id"], ["folder.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        columns=["name", "owner_id", "id", "parent_id"],
+        sqlite_autoincrement=True,
+    )
+    rebuild_table_in_batches(
+        "note",
+        sa.Column("title", sqlmodel.AutoString(), nullable=False),
+        sa.Column("body", sqlmodel.AutoString(), nullable=False),
+        sa.Column("folder_id", sa.Integer(), nullable=True),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("owner_id", sa.Uuid(), nullable=True),
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+        sa.ForeignKeyConstraint(["folder_id"], ["folder.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["owner_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        columns=["title", "body", "folder_id", "id", "owner_id"],
+        sqlite_autoincrement=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        with recreate_table(table, autoincrement=False) as batch_op:
+            batch_op.drop_column("version")
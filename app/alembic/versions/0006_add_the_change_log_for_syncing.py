@@ -0,0 +1,69 @@
+"""Add the change log for syncing.
+
+Every existing note, folder and tag gets a change, so the first sync of a
+client returns all of them.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 08:36:03.178392
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+import sqlmodel
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: str | Sequence[str] | None = "0005"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+TABLES = ("folder", "tag", "note")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    change = op.create_table(
+        "change",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("owner_id", sa.Uuid(), nullable=False),
+        sa.Column("kind", sqlmodel.AutoString(length=32), nullable=False),
+        sa.Column("object_id", sa.Integer(), nullable=False),
+        sa.Column("deleted", sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(["owner_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sqlite_autoincrement=True,
+    )
+    with op.batch_alter_table("change", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_change_kind_object_id",
+            ["kind", "object_id"],
+            unique=True,
+        )
+        batch_op.create_index("ix_change_owner_id_id", ["owner_id", "id"], unique=False)
+
+    for name in TABLES:
+        table = sa.table(name, sa.column("id"), sa.column("owner_id", sa.Uuid()))
+        objects = sa.select(
+            table.c.owner_id,
+            sa.literal(name),
+            table.c.id,
+            sa.false(),
+        ).where(table.c.owner_id.is_not(None))
+        op.execute(
+            change.insert().from_select(
+                ["owner_id", "kind", "object_id", "deleted"],
+                objects,
+            ),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("change", schema=None) as batch_op:
+        batch_op.drop_index("ix_change_owner_id_id")
+        batch_op.drop_index("ix_change_kind_object_id")
+
+    op.drop_table("change")
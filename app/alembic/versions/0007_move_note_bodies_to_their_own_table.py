@@ -0,0 +1,309 @@
+"""Move note bodies to their own table.
+
+Scans over notes then read fewer pages, and long bodies are compressed. The
+bodies are copied and compressed in batches, on SQLite triggers copy the
+bodies that change meanwhile and the note table is recreated the same way.
+The search index then reads the bodies through a view, so it is recreated
+with new triggers and rebuilt.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 09:05:34.582465
+"""
+
+from collections.abc import Iterator, Sequence
+from typing import Any
+
+import sqlalchemy as sa
+import sqlmodel
+from alembic import op
+
+from app.migrations import iter_key_ranges, rebuild_table_in_batches
+from app.shared.compression import compress_body, decompress_body
+from app.shared.constants import BACKFILL_BATCH_SIZE
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: str | Sequence[str] | None = "0006"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# SQLite FTS5 index over the title and body of notes, kept in sync by triggers.
+# The view needs the decompress_body function registered by app.database.
+NOTE_SEARCH_DDL = (
+    """
+    CREATE VIEW note_fts_content AS
+    SELECT note.id, note.title,
+        decompress_body(notebody.plain, notebody.compressed) AS body
+    FROM note JOIN notebody ON notebody.note_id = note.id
+    """,
+    """
+    CREATE VIRTUAL TABLE note_fts USING fts5(
+        title, body, content='note_fts_content', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER note_fts_after_body_insert AFTER INSERT ON notebody
+    BEGIN
+        INSERT INTO note_fts(rowid, title, body)
+        SELECT note.id, note.title, decompress_body(new.plain, new.compressed)
+        FROM note WHERE note.id = new.note_id;
+    END
+    """,
+    """
+    CREATE TRIGGER note_fts_before_delete BEFORE DELETE ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, body)
+        SELECT 'delete', old.id, old.title, body
+        FROM note_fts_content WHERE id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER note_fts_after_title_update AFTER UPDATE OF title
+    ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, body)
+        SELECT 'delete', old.id, old.title, body
+        FROM note_fts_content WHERE id = old.id;
+        INSERT INTO note_fts(rowid, title, body)
+        SELECT id, title, body FROM note_fts_content WHERE id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER note_fts_after_body_update
+    AFTER UPDATE OF plain, compressed ON notebody BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, body)
+        SELECT 'delete', note.id, note.title,
+            decompress_body(old.plain, old.compressed)
+        FROM note WHERE note.id = old.note_id;
+        INSERT INTO note_fts(rowid, title, body)
+        SELECT id, title, body FROM note_fts_content WHERE id = new.note_id;
+    END
+    """,
+    "INSERT INTO note_fts(note_fts) VALUES ('rebuild')",
+)
+
+# The index of revision 0003, which read the bodies from the note table
+OLD_NOTE_SEARCH_DDL = (
+    """
+    CREATE VIRTUAL TABLE note_fts USING fts5(
+        title, body, content='note', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER note_fts_after_insert AFTER INSERT ON note BEGIN
+        INSERT INTO note_fts(rowid, title, body)
+        VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER note_fts_after_delete AFTER DELETE ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER note_fts_after_update AFTER UPDATE OF title, body
+    ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO note_fts(rowid, title, body)
+        VALUES (new.id, new.title, new.body);
+    END
+    """,
+    "INSERT INTO note_fts(note_fts) VALUES ('rebuild')",
+)
+
+# SQLite triggers that copy the bodies written while they are moved
+BODY_COPY_DDL = (
+    """
+    CREATE TRIGGER _note_body_copy_insert AFTER INSERT ON note BEGIN
+        INSERT OR REPLACE INTO notebody(note_id, plain) VALUES (new.id, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER _note_body_copy_update AFTER UPDATE OF body ON note BEGIN
+        INSERT OR REPLACE INTO notebody(note_id, plain) VALUES (new.id, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER _note_body_copy_delete AFTER DELETE ON note BEGIN
+        DELETE FROM notebody WHERE note_id = old.id;
+    END
+    """,
+)
+BODY_COPY_TRIGGERS = (
+    "_note_body_copy_insert",
+    "_note_body_copy_update",
+    "_note_body_copy_delete",
+)
+
+note = sa.table("note", sa.column("id", sa.Integer()), sa.column("body", sa.String()))
+notebody = sa.table(
+    "notebody",
+    sa.column("note_id", sa.Integer()),
+    sa.column("plain", sa.String()),
+    sa.column("compressed", sa.LargeBinary()),
+)
+
+
+def is_sqlite() -> bool:
+    """Check if the migration runs on SQLite, the only database with search."""
+    return op.get_bind().dialect.name == "sqlite"
+
+
+def iter_batches(
+    key: sa.ColumnElement[int],
+    columns: Sequence[sa.ColumnElement[Any]],
+) -> Iterator[Sequence[sa.Row[Any]]]:
+    """Read all rows of a table in batches, in order of the key."""
+    last_key = 0
+    while True:
+        statement = sa.select(key, *columns).where(key > last_key).order_by(key)
+        rows = op.get_bind().execute(statement.limit(BACKFILL_BATCH_SIZE)).all()
+        if not rows:
+            return
+        yield rows
+        last_key = rows[-1][0]
+
+
+def copy_bodies(connection: sa.Connection) -> None:
+    """Copy the bodies that are not copied yet to their table, in batches."""
+    is_copied = sa.exists().where(notebody.c.note_id == note.c.id)
+    for first, last in iter_key_ranges(connection, note.c.id):
+        rows = sa.select(note.c.id, note.c.body).where(
+            note.c.id.between(first, last),
+            ~is_copied,
+        )
+        statement = notebody.insert().from_select(["note_id", "plain"], rows)
+        connection.execute(statement)
+
+
+def compress_bodies(connection: sa.Connection) -> None:
+    """Compress the long bodies, in batches.
+
+    A body is only replaced if it did not change since it was read, a body
+    that was changed meanwhile just stays uncompressed.
+    """
+    statement = (
+        notebody.update()
+        .where(
+            notebody.c.note_id == sa.bindparam("_note_id"),
+            notebody.c.plain == sa.bindparam("_plain"),
+        )
+        .values(plain=sa.bindparam("plain"), compressed=sa.bindparam("compressed"))
+    )
+    for first, last in iter_key_ranges(connection, notebody.c.note_id):
+        rows = connection.execute(
+            sa.select(notebody.c.note_id, notebody.c.plain).where(
+                notebody.c.note_id.between(first, last),
+                notebody.c.plain.is_not(None),
+            ),
+        ).all()
+        batch = []
+        for note_id, body in rows:
+            plain, compressed = compress_body(body)
+            if compressed is not None:
+                batch.append(
+                    {
+                        "_note_id": note_id,
+                        "_plain": body,
+                        "plain": plain,
+                        "compressed": compressed,
+                    },
+                )
+        if batch:
+            connection.execute(statement, batch)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if is_sqlite():
+        for trigger in ("insert", "delete", "update"):
+            op.execute(f"DROP TRIGGER note_fts_after_{trigger}")
+        op.execute("DROP TABLE note_fts")
+
+    op.create_table(
+        "notebody",
+        sa.Column("note_id", sa.Integer(), nullable=False),
+        sa.Column("plain", sqlmodel.AutoString(), nullable=True),
+        sa.Column("compressed", sa.LargeBinary(), nullable=True),
+        sa.ForeignKeyConstraint(["note_id"], ["note.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("note_id"),
+    )
+    if is_sqlite():
+        for ddl in BODY_COPY_DDL:
+            op.execute(ddl)
+
+    with op.get_context().autocommit_block():
+        copy_bodies(op.get_bind())
+        compress_bodies(op.get_bind())
+
+    if not is_sqlite():
+        op.drop_column("note", "body")
+        return
+
+    rebuild_table_in_batches(
+        "note",
+        sa.Column("title", sqlmodel.AutoString(), nullable=False),
+        sa.Column("folder_id", sa.Integer(), nullable=True),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("owner_id", sa.Uuid(), nullable=True),
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+        sa.ForeignKeyConstraint(["folder_id"], ["folder.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["owner_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        columns=["title", "folder_id", "id", "owner_id", "version"],
+        drop_triggers=BODY_COPY_TRIGGERS,
+        sqlite_autoincrement=True,
+    )
+    for ddl in NOTE_SEARCH_DDL:
+        op.execute(ddl)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if is_sqlite():
+        for trigger in (
+            "after_body_insert",
+            "before_delete",
+            "after_title_update",
+            "after_body_update",
+        ):
+            op.execute(f"DROP TRIGGER note_fts_{trigger}")
+        op.execute("DROP TABLE note_fts")
+        op.execute("DROP VIEW note_fts_content")
+
+    with op.batch_alter_table(
+        "note",
+        recreate="always",
+        table_kwargs={"sqlite_autoincrement": True},
+    ) as batch_op:
+        batch_op.add_column(sa.Column("body", sqlmodel.AutoString(), nullable=True))
+
+    columns = [notebody.c.plain, notebody.c.compressed]
+    for rows in iter_batches(notebody.c.note_id, columns):
+        op.get_bind().execute(
+            note.update().where(note.c.id == sa.bindparam("note_id")),
+            [
+                {"note_id": note_id, "body": decompress_body(plain, compressed)}
+                for note_id, plain, compressed in rows
+            ],
+        )
+
+    with op.batch_alter_table(
+        "note",
+        recreate="always",
+        table_kwargs={"sqlite_autoincrement": True},
+    ) as batch_op:
+        batch_op.alter_column(
+            "body",
+            existing_type=sqlmodel.AutoString(),
+            nullable=False,
+        )
+
+    op.drop_table("notebody")
+
+    if is_sqlite():
+        for ddl in OLD_NOTE_SEARCH_DDL:
+            op.execute(ddl)
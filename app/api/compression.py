@@ -0,0 +1,297 @@
+"""Compression of responses, negotiated with the Accept-Encoding header."""
+
+import zlib
+from collections.abc import Callable, Sequence
+from typing import Protocol
+
+from starlette import status
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.api.conditional import make_encoded_etag
+from app.shared.constants import (
+    BROTLI_COMPRESSION_QUALITY,
+    GZIP_COMPRESSION_LEVEL,
+    ZSTD_COMPRESSION_LEVEL,
+)
+from app.typedefs import ContentEncoding
+
+try:
+    import brotli
+except ImportError:  # Optional dependency
+    brotli = None  # type: ignore[assignment]
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency
+    zstandard = None  # type: ignore[assignment]
+
+# Only these media types are compressed, others such as images already are
+COMPRESSIBLE_MEDIA_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+class Encoder(Protocol):
+    """Compressor for the body of a single response."""
+
+    def encode(self, data: bytes) -> bytes:
+        """Compress a chunk, possibly keeping some of it for later."""
+        ...
+
+    def flush(self) -> bytes:
+        """Get everything compressed so far, so the client can decode it."""
+        ...
+
+    def finish(self) -> bytes:
+        """Get the rest of the compressed body after the last chunk."""
+        ...
+
+
+class GzipEncoder:
+    """Encoder for ``gzip``, which every client supports."""
+
+    def __init__(self) -> None:
+        """Create the compressor, writing a gzip header and trailer."""
+        self._compressor = zlib.compressobj(
+            GZIP_COMPRESSION_LEVEL,
+            zlib.DEFLATED,
+            16 + zlib.MAX_WBITS,
+        )
+
+    def encode(self, data: bytes) -> bytes:
+        """Compress a chunk, possibly keeping some of it for later."""
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        """Get everything compressed so far, so the client can decode it."""
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        """Get the rest of the compressed body after the last chunk."""
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    """Encoder for ``br``, which needs the optional brotli package."""
+
+    def __init__(self) -> None:
+        """Create the compressor."""
+        self._compressor = brotli.Compressor(quality=BROTLI_COMPRESSION_QUALITY)
+
+    def encode(self, data: bytes) -> bytes:
+        """Compress a chunk, possibly keeping some of it for later."""
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        """Get everything compressed so far, so the client can decode it."""
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        """Get the rest of the compressed body after the last chunk."""
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    """Encoder for ``zstd``, which needs the optional zstandard package."""
+
+    def __init__(self) -> None:
+        """Create the compressor."""
+        compressor = zstandard.ZstdCompressor(level=ZSTD_COMPRESSION_LEVEL)
+        self._compressor = compressor.compressobj()
+
+    def encode(self, data: bytes) -> bytes:
+        """Compress a chunk, possibly keeping some of it for later."""
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        """Get everything compressed so far, so the client can decode it."""
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        """Get the rest of the compressed body after the last chunk."""
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+# Encoders of the encodings whose packages are installed
+ENCODERS: dict[ContentEncoding, Callable[[], Encoder]] = {
+    ContentEncoding.GZIP: GzipEncoder,
+}
+if brotli is not None:
+    ENCODERS[ContentEncoding.BROTLI] = BrotliEncoder
+if zstandard is not None:
+    ENCODERS[ContentEncoding.ZSTD] = ZstdEncoder
+
+
+def select_encoding(
+    accept_encoding: str,
+    encodings: Sequence[ContentEncoding],
+) -> ContentEncoding | None:
+    """Select the encoding of a response from an Accept-Encoding header.
+
+    The encoding the client gives the highest quality value wins, ties go to
+    the first one in ``encodings``. Encodings with ``q=0`` are refused, as are
+    all others with ``*;q=0``. Returns None if no encoding is acceptable.
+    """
+    qualities: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+
+    selected, selected_quality = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > selected_quality:
+            selected, selected_quality = encoding, quality
+    return selected
+
+
+class CompressionMiddleware:
+    """ASGI middleware that compresses responses the client accepts compressed.
+
+    A response is compressed if it has a compressible media type, is not
+    encoded yet and its body has at least ``minimum_size`` bytes. Streamed
+    bodies are buffered until they reach the minimum size, then every chunk
+    is compressed and flushed right away, so clients can process the stream
+    while it is received. A 304 gets the entity tag and Vary header of the
+    response it stands for.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        encodings: Sequence[ContentEncoding],
+        minimum_size: int,
+    ) -> None:
+        """Wrap an app, preferring the encodings in the given order."""
+        if missing := [encoding for encoding in encodings if encoding not in ENCODERS]:
+            msg = (
+                f"Response compression with {', '.join(missing)} needs the "
+                "optional compression dependencies."
+            )
+            raise RuntimeError(msg)
+        self.app = app
+        self.encodings = encodings
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle a request, compressing the response if possible."""
+        if scope["type"] != "http" or not self.encodings:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        encoding = select_encoding(headers.get("accept-encoding", ""), self.encodings)
+        responder = _CompressingResponder(
+            send,
+            encoding,
+            self.minimum_size,
+            headers.get("if-none-match", ""),
+        )
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    """Sender that compresses the body of a single response."""
+
+    def __init__(
+        self,
+        send: Send,
+        encoding: ContentEncoding | None,
+        minimum_size: int,
+        if_none_match: str,
+    ) -> None:
+        self._send = send
+        self._encoding = encoding
+        self._minimum_size = minimum_size
+        self._if_none_match = if_none_match
+        self._start: Message = {}
+        self._buffer: list[bytes] = []
+        self._encoder: Encoder | None = None
+        self._pass_through = False
+
+    async def send(self, message: Message) -> None:
+        """Send a message of the response, holding back the start until needed."""
+        if message["type"] == "http.response.start":
+            self._start = message
+            if message["status"] == status.HTTP_304_NOT_MODIFIED:
+                self._set_not_modified_headers()
+            self._pass_through = not self._is_compressible()
+            if self._pass_through:
+                await self._send(message)
+            return
+
+        if message["type"] != "http.response.body" or self._pass_through:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self._encoder is not None:
+            body = self._encoder.encode(body)
+            body += self._encoder.flush() if more_body else self._encoder.finish()
+            await self._send_body(body, more_body=more_body)
+            return
+
+        self._buffer.append(body)
+        size = sum(len(chunk) for chunk in self._buffer)
+        if more_body and size < self._minimum_size:
+            return
+
+        body = b"".join(self._buffer)
+        self._buffer = []
+        headers = MutableHeaders(raw=list(self._start["headers"]))
+        self._start["headers"] = headers.raw
+        # The response differs by Accept-Encoding once it is large enough
+        headers.add_vary_header("Accept-Encoding")
+        if self._encoding is not None and size >= self._minimum_size:
+            self._encoder = ENCODERS[self._encoding]()
+            headers["Content-Encoding"] = self._encoding
+            if (etag := headers.get("etag")) is not None:
+                headers["ETag"] = make_encoded_etag(etag, self._encoding)
+            body = self._encoder.encode(body)
+            if more_body:
+                body += self._encoder.flush()
+                del headers["Content-Length"]
+            else:
+                body += self._encoder.finish()
+                headers["Content-Length"] = str(len(body))
+
+        await self._send(self._start)
+        await self._send_body(body, more_body=more_body)
+
+    def _set_not_modified_headers(self) -> None:
+        """Give a 304 the headers of the response it stands for.
+
+        A 304 has no body that shows whether the response would have been
+        compressed, so its entity tag names the encoding if the client's copy
+        does.
+        """
+        headers = MutableHeaders(raw=list(self._start["headers"]))
+        self._start["headers"] = headers.raw
+        headers.add_vary_header("Accept-Encoding")
+        if self._encoding is None or (etag := headers.get("etag")) is None:
+            return
+        encoded_etag = make_encoded_etag(etag, self._encoding)
+        if encoded_etag in {tag.strip() for tag in self._if_none_match.split(",")}:
+            headers["ETag"] = encoded_etag
+
+    def _is_compressible(self) -> bool:
+        """Check if the response is not encoded and has a compressible media type."""
+        headers = Headers(raw=self._start["headers"])
+        media_type = headers.get("content-type", "")
+        return "content-encoding" not in headers and media_type.startswith(
+            COMPRESSIBLE_MEDIA_TYPES,
+        )
+
+    async def _send_body(self, body: bytes, *, more_body: bool) -> None:
+        """Send a chunk of the body."""
+        await self._send(
+            {"type": "http.response.body", "body": body, "more_body": more_body},
+        )
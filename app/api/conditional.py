@@ -0,0 +1,98 @@
+"""Entity tags and conditional requests, see RFC 9110 section 13."""
+
+import hashlib
+from collections.abc import Iterable
+from typing import Annotated
+
+from fastapi import Header, HTTPException, Response, status
+
+from app.typedefs import ContentEncoding
+
+IfNoneMatchHeader = Annotated[str | None, Header()]
+IfMatchHeader = Annotated[str | None, Header()]
+
+
+def make_etag(version: int) -> str:
+    """Create a strong entity tag for a version of a single object."""
+    return f'"{version}"'
+
+
+def make_page_etag(
+    versions: Iterable[tuple[int | None, int]],
+    next_cursor: str | None,
+    representation: str = "",
+) -> str:
+    """Create a strong entity tag for a page from the ids and versions of its items.
+
+    Any change, addition or removal of an item on the page changes the tag.
+    Different representations of the same page, e.g. summaries instead of the
+    full items, get different tags.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(representation.encode())
+    for obj_id, version in versions:
+        digest.update(f"{obj_id}:{version},".encode())
+    digest.update(f"{next_cursor}".encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def make_encoded_etag(etag: str, encoding: ContentEncoding) -> str:
+    """Create the entity tag of a response compressed with a content encoding.
+
+    The compressed bytes differ from the uncompressed ones, so they need a
+    different strong tag, e.g. ``"5-gzip"`` for ``"5"``.
+    """
+    return etag.removesuffix('"') + f'-{encoding}"'
+
+
+def _strip_encoding(etag: str) -> str:
+    """Get the entity tag of the uncompressed response from any tag of it."""
+    for encoding in ContentEncoding:
+        if etag.endswith(suffix := f'-{encoding}"'):
+            return etag.removesuffix(suffix) + '"'
+    return etag
+
+
+def _parse_etags(header: str) -> set[str]:
+    """Parse the list of entity tags in a conditional header.
+
+    Tags of compressed responses are those of the uncompressed ones, as they
+    are compared with the tags of the resources.
+    """
+    return {_strip_encoding(etag.strip()) for etag in header.split(",")}
+
+
+def is_not_modified(if_none_match: str | None, etag: str) -> bool:
+    """Check if the client's copy is current according to If-None-Match.
+
+    If-None-Match uses the weak comparison, so weak tags also match.
+    """
+    if if_none_match is None:
+        return False
+    etags = {etag.removeprefix("W/") for etag in _parse_etags(if_none_match)}
+    return "*" in etags or etag in etags
+
+
+def not_modified(etag: str) -> Response:
+    """Create a 304 response that tells the client to use its copy."""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+def check_if_match(if_match: str | None, etag: str) -> None:
+    """Check that the client changes the current version, if it requires one.
+
+    If-Match uses the strong comparison, so weak tags never match.
+    """
+    if if_match is None:
+        return
+    etags = _parse_etags(if_match)
+    if "*" not in etags and etag not in etags:
+        raise precondition_failed()
+
+
+def precondition_failed() -> HTTPException:
+    """Create the error for a change to a resource that was changed meanwhile."""
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="The resource has been changed.",
+    )
@@ -1,16 +1,71 @@
 from collections.abc import Generator
+from dataclasses import dataclass
 from typing import Annotated
 
-from fastapi import Depends
+from fastapi import Depends, Query, Request
 from sqlmodel import Session
 
-from app.database import engine
+from app.cache import TTLCache
+from app.config import settings
+from app.database import engine, read_engine
+from app.shared.constants import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
+# Request methods that do not change any data
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
 
-def get_db() -> Generator[Session]:
-    """Yield a session to the database."""
-    with Session(engine) as session:
+# Clients that recently sent a request that may have written data, keyed by
+# their authorization header
+recent_writers: TTLCache[str, bool] = TTLCache(
+    max_size=settings.READ_YOUR_WRITES_MAX_CLIENTS,
+    ttl=settings.READ_YOUR_WRITES_SECONDS,
+)
+
+
+def get_db(request: Request) -> Generator[Session]:
+    """Yield a session to the database.
+
+    Read requests use the read replica, if one is configured. A client that
+    sent any other request within the read-your-writes window reads from the
+    primary database instead, so it always sees its own writes.
+    """
+    client = request.headers.get("Authorization")
+    writes = request.method not in READ_METHODS
+
+    bind = engine
+    if (
+        read_engine is not None
+        and not writes
+        and (client is None or recent_writers.get(client) is None)
+    ):
+        bind = read_engine
+
+    # A writing client is marked before and after the request, so the window
+    # starts before its first write and lasts until after its last one.
+    if writes and client is not None:
+        recent_writers.set(client, value=True)
+    with Session(bind) as session:
         yield session
+    if writes and client is not None:
+        recent_writers.set(client, value=True)
 
 
 SessionDep = Annotated[Session, Depends(get_db)]
+
+
+@dataclass(frozen=True)
+class Pagination:
+    """Cursor and page size requested for a listing."""
+
+    cursor: str | None
+    limit: int
+
+
+def get_pagination(
+    cursor: str | None = None,
+    limit: Annotated[int, Query(gt=0, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+) -> Pagination:
+    """Read the pagination query parameters."""
+    return Pagination(cursor=cursor, limit=limit)
+
+
+PaginationDep = Annotated[Pagination, Depends(get_pagination)]
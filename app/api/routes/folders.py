@@ -1,51 +1,223 @@
 from typing import Any
 
-from fastapi import APIRouter, status
+from fastapi import APIRouter, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete
+from sqlalchemy.orm import selectinload
+from sqlmodel import col, select
 
-from app.api.deps import SessionDep
+from app.api.conditional import (
+    IfNoneMatchHeader,
+    is_not_modified,
+    make_etag,
+    make_page_etag,
+    not_modified,
+)
+from app.api.deps import PaginationDep, SessionDep
 from app.api.routes.constants import FOLDER_ROUTE_PREFIX
-from app.api.schemas.folders import FolderNew, FolderPublic
-from app.crud import get_object_or_404_by_owner, get_objects_by_owner
-from app.models.tables import Folder
+from app.api.routing import PrevalidatedRoute
+from app.api.schemas.folders import FolderNew, FolderPublic, FolderTree
+from app.api.schemas.notes import NotePublic
+from app.api.schemas.pagination import Page
+from app.api.streaming import stream_json_array
+from app.crud import (
+    check_owned_ids,
+    get_object_or_404_by_owner,
+    get_objects_by_owner,
+    get_version_or_404_by_owner,
+    get_versions_by_owner,
+    paginate,
+    record_changes,
+    record_changes_where,
+    select_by_owner,
+    select_folder_subtree,
+)
+from app.models.tables import Folder, Note, NoteTagLink
 from app.security import CurrentUser
 
-router = APIRouter(prefix=FOLDER_ROUTE_PREFIX, tags=["folders"])
+router = APIRouter(
+    prefix=FOLDER_ROUTE_PREFIX,
+    tags=["folders"],
+    route_class=PrevalidatedRoute,
+)
 
 
 @router.get("/{folder_id}", response_model=FolderPublic)
-async def get_folder_by_id(
+def get_folder_by_id(
     folder_id: int,
     user: CurrentUser,
     session: SessionDep,
+    response: Response,
+    if_none_match: IfNoneMatchHeader = None,
 ) -> Any:
-    """Endpoint to get a folder by ID."""
-    return get_object_or_404_by_owner(Folder, folder_id, user.id, session)
+    """Endpoint to get a folder by ID.
 
+    If the client already has the current version, 304 Not Modified is returned.
+    """
+    if if_none_match is not None:
+        version = get_version_or_404_by_owner(Folder, folder_id, user.id, session)
+        etag = make_etag(version)
+        if is_not_modified(if_none_match, etag):
+            return not_modified(etag)
 
-@router.get("/", response_model=list[FolderPublic])
-async def get_all_folders(user: CurrentUser, session: SessionDep) -> Any:
-    """Endpoint to get all folders."""
-    return get_objects_by_owner(Folder, user.id, session)
+    folder = get_object_or_404_by_owner(Folder, folder_id, user.id, session)
+    response.headers["ETag"] = make_etag(folder.version)
+    return FolderPublic.model_validate(folder)
+
+
+@router.get("/{folder_id}/tree", response_model=FolderTree)
+def get_folder_tree(folder_id: int, user: CurrentUser, session: SessionDep) -> Any:
+    """Endpoint to get a folder and all of its descendants.
+
+    The whole subtree is read in one query, however deep or wide it is.
+    """
+    subtree = select_folder_subtree(folder_id, user.id)
+    statement = (
+        select(Folder).join(subtree, Folder.id == subtree.c.id).order_by(Folder.id)
+    )
+    if not (folders := session.exec(statement).all()):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Nothing found with that id.",
+        )
+
+    return FolderTree(
+        folders=[FolderPublic.model_validate(folder) for folder in folders],
+    )
+
+
+@router.get("/{folder_id}/notes", response_model=Page[NotePublic])
+def get_folder_notes(
+    folder_id: int,
+    user: CurrentUser,
+    session: SessionDep,
+    pagination: PaginationDep,
+    recursive: bool = False,  # noqa: FBT001, FBT002
+) -> Any:
+    """Endpoint to get a page of the notes in a folder.
+
+    With ``recursive=true`` the notes in all descendants of the folder are
+    included too.
+    """
+    folder = get_object_or_404_by_owner(Folder, folder_id, user.id, session)
+
+    in_folder = Note.folder_id == folder.id
+    if recursive:
+        subtree = select_folder_subtree(folder_id, user.id)
+        in_folder = col(Note.folder_id).in_(select(subtree.c.id))
+
+    # Load the tags and bodies of all notes in one extra query each, not per note
+    statement = (
+        select_by_owner(Note, user.id)
+        .where(in_folder)
+        .options(selectinload(Note.tags), selectinload(Note.content))
+    )
+    notes, next_cursor = paginate(
+        statement,
+        Note.id,
+        session,
+        pagination.cursor,
+        pagination.limit,
+    )
+    return Page[NotePublic](
+        items=[NotePublic.from_note(note) for note in notes],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get("/", response_model=Page[FolderPublic])
+def get_all_folders(  # noqa: PLR0913
+    user: CurrentUser,
+    session: SessionDep,
+    pagination: PaginationDep,
+    response: Response,
+    if_none_match: IfNoneMatchHeader = None,
+    stream: bool = False,  # noqa: FBT001, FBT002
+) -> Any:
+    """Endpoint to get a page of folders.
+
+    If the client already has the current page, 304 Not Modified is returned.
+    With ``stream=true`` all folders are streamed as one JSON array instead.
+    """
+    if stream:
+        statement = select_by_owner(Folder, user.id).order_by(Folder.id)
+        return StreamingResponse(
+            stream_json_array(statement, FolderPublic.model_validate, session),
+            media_type="application/json",
+        )
+
+    if if_none_match is not None:
+        versions, next_cursor = get_versions_by_owner(
+            Folder,
+            user.id,
+            session,
+            pagination.cursor,
+            pagination.limit,
+        )
+        etag = make_page_etag(versions, next_cursor)
+        if is_not_modified(if_none_match, etag):
+            return not_modified(etag)
+
+    folders, next_cursor = get_objects_by_owner(
+        Folder,
+        user.id,
+        session,
+        pagination.cursor,
+        pagination.limit,
+    )
+    response.headers["ETag"] = make_page_etag(
+        ((folder.id, folder.version) for folder in folders),
+        next_cursor,
+    )
+    return Page[FolderPublic](
+        items=[FolderPublic.model_validate(folder) for folder in folders],
+        next_cursor=next_cursor,
+    )
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-async def create_folder(
+def create_folder(
     folder_request: FolderNew,
     user: CurrentUser,
     session: SessionDep,
 ) -> None:
     """Endpoint to create a folder."""
+    if folder_request.parent_id is not None:
+        check_owned_ids(Folder, [folder_request.parent_id], user.id, session)
+
     folder_data = folder_request.model_dump()
     folder_data["owner_id"] = user.id
     new_folder = Folder(**folder_data)
 
     session.add(new_folder)
+    session.flush()
+    record_changes(Folder, [new_folder.id], user.id, session)
     session.commit()
 
 
 @router.delete("/{folder_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_folder(folder_id: int, user: CurrentUser, session: SessionDep) -> None:
-    """Endpoint to delete a folder by ID."""
-    folder = get_object_or_404_by_owner(Folder, folder_id, user.id, session)
-    session.delete(folder)
+def delete_folder(folder_id: int, user: CurrentUser, session: SessionDep) -> None:
+    """Endpoint to delete a folder by ID with all of its descendants and notes.
+
+    The subtree is deleted by a few set-based statements in one transaction,
+    without loading any folder or note. The deleted folders and notes are
+    recorded as changed.
+    """
+    # Only check that the folder exists, without loading it
+    get_version_or_404_by_owner(Folder, folder_id, user.id, session)
+
+    subtree = select(select_folder_subtree(folder_id, user.id).c.id)
+    in_subtree = col(Folder.id).in_(subtree)
+    notes_in_subtree = col(Note.folder_id).in_(subtree)
+    record_changes_where(Note, notes_in_subtree, session, deleted=True)
+    record_changes_where(Folder, in_subtree, session, deleted=True)
+
+    # The objects are not loaded, so the session does not have to be updated
+    note_ids = select(Note.id).where(notes_in_subtree)
+    for statement in (
+        delete(NoteTagLink).where(col(NoteTagLink.note_id).in_(note_ids)),
+        delete(Note).where(notes_in_subtree),
+        delete(Folder).where(in_subtree),
+    ):
+        session.exec(statement.execution_options(synchronize_session=False))
     session.commit()
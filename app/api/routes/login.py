@@ -1,25 +1,34 @@
 from datetime import timedelta
-from typing import Annotated, Any
+from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 
 from app.api.deps import SessionDep
 from app.api.routes.constants import LOGIN_ROUTE_PREFIX
+from app.api.routing import PrevalidatedRoute
 from app.api.schemas.tokens import Token
 from app.config import settings
 from app.security import authenticate_user, create_access_token
 
-router = APIRouter(prefix=LOGIN_ROUTE_PREFIX, tags=["login"])
+router = APIRouter(
+    prefix=LOGIN_ROUTE_PREFIX,
+    tags=["login"],
+    route_class=PrevalidatedRoute,
+)
 
 
 @router.post("/token")
 async def login(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     session: SessionDep,
-) -> Any:
-    """Endpoint to log in a user and return a JWT token."""
-    user = authenticate_user(session, form_data.username, form_data.password)
+) -> Token:
+    """Endpoint to log in a user and return a JWT token.
+
+    The endpoint is async so that requests waiting for the password hashing
+    pool do not hold on to a worker thread.
+    """
+    user = await authenticate_user(session, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     if not user.is_active:
@@ -1,90 +1,651 @@
-from typing import Annotated, Any
+import uuid
+from collections.abc import Iterable, Sequence
+from typing import Annotated, Any, Literal
 
-from fastapi import APIRouter, HTTPException, Path, status
-from sqlmodel import select
+from fastapi import APIRouter, HTTPException, Path, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import ColumnElement, delete, insert, update
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, SQLModel, col, select
 
-from app.api.deps import SessionDep
+from app.api.conditional import (
+    IfMatchHeader,
+    IfNoneMatchHeader,
+    check_if_match,
+    is_not_modified,
+    make_etag,
+    make_page_etag,
+    not_modified,
+    precondition_failed,
+)
+from app.api.deps import Pagination, PaginationDep, SessionDep
 from app.api.routes.constants import NOTES_ROUTE_PREFIX
-from app.api.schemas.notes import NoteNew, NotePublic
-from app.crud import get_object_or_404
-from app.models.tables import Note, Tag
+from app.api.routing import PrevalidatedRoute
+from app.api.schemas.changes import Changes
+from app.api.schemas.folders import FolderPublic
+from app.api.schemas.notes import (
+    NoteBodyEdit,
+    NoteImportResult,
+    NoteNew,
+    NotePatch,
+    NotePublic,
+    NoteSearchHit,
+    NoteSummary,
+)
+from app.api.schemas.pagination import Page
+from app.api.schemas.tags import TagPublic
+from app.api.streaming import iter_lines, stream_json_array, stream_ndjson
+from app.crud import (
+    check_owned_ids,
+    encode_cursor,
+    get_note_summaries,
+    get_object_or_404,
+    get_objects_by_ids,
+    get_objects_by_owner,
+    get_owned_ids,
+    get_tag_ids_by_note,
+    get_version_or_404_by_owner,
+    get_versions_by_owner,
+    notes_with_tags,
+    paginate,
+    record_changes,
+    search_notes,
+    select_by_owner,
+)
+from app.models.tables import Change, Folder, Note, NoteBody, NoteTagLink, Tag
 from app.security import CurrentUser
+from app.shared.constants import (
+    DEFAULT_PAGE_SIZE,
+    IMPORT_CHUNK_SIZE,
+    MAX_FILTER_TAGS,
+    MAX_IMPORT_LINE_BYTES,
+    MAX_NAME_LEN,
+    MAX_PAGE_SIZE,
+)
 
-router = APIRouter(prefix=NOTES_ROUTE_PREFIX, tags=["notes"])
+router = APIRouter(
+    prefix=NOTES_ROUTE_PREFIX,
+    tags=["notes"],
+    route_class=PrevalidatedRoute,
+)
+
+
+@router.get("/search", response_model=Page[NoteSearchHit])
+def search(
+    q: Annotated[str, Query(min_length=1, max_length=MAX_NAME_LEN)],
+    user: CurrentUser,
+    session: SessionDep,
+    pagination: PaginationDep,
+) -> Any:
+    """Endpoint to search the title and body of the notes of the current user.
+
+    All words in the query have to match, the last one also as a prefix. The
+    best matches are returned first.
+    """
+    hits, next_cursor = search_notes(
+        user.id,
+        q,
+        session,
+        pagination.cursor,
+        pagination.limit,
+    )
+    return Page[NoteSearchHit](
+        items=[NoteSearchHit.model_validate(hit._asdict()) for hit in hits],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get("/changes", response_model=Changes)
+def get_changes(
+    user: CurrentUser,
+    session: SessionDep,
+    since: str | None = None,
+    limit: Annotated[int, Query(gt=0, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+) -> Any:
+    """Endpoint to get the notes, folders and tags changed since a sync token.
+
+    Without a token all objects are returned. The response holds the token to
+    pass next time. As long as ``has_more`` is true, there are more changes
+    that can be read right away with that token. Deleted objects are only
+    returned by id.
+    """
+    changes, next_cursor = paginate(
+        select_by_owner(Change, user.id),
+        Change.id,
+        session,
+        since,
+        limit,
+    )
+    notes = get_objects_by_ids(
+        Note,
+        _changed_ids(changes, Note),
+        user.id,
+        session,
+        options=[selectinload(Note.tags), selectinload(Note.content)],
+    )
+    folders = get_objects_by_ids(
+        Folder,
+        _changed_ids(changes, Folder),
+        user.id,
+        session,
+    )
+    tags = get_objects_by_ids(
+        Tag,
+        _changed_ids(changes, Tag),
+        user.id,
+        session,
+        options=[selectinload(Tag.child_tags)],
+    )
+
+    if changes:
+        since = encode_cursor(changes[-1].id)
+    return Changes(
+        notes=[NotePublic.from_note(note) for note in notes],
+        folders=[FolderPublic.model_validate(folder) for folder in folders],
+        tags=[TagPublic.from_tag(tag) for tag in tags],
+        deleted_note_ids=_changed_ids(changes, Note, deleted=True),
+        deleted_folder_ids=_changed_ids(changes, Folder, deleted=True),
+        deleted_tag_ids=_changed_ids(changes, Tag, deleted=True),
+        token=since or encode_cursor(0),
+        has_more=next_cursor is not None,
+    )
+
+
+def _changed_ids(
+    changes: Iterable[Change],
+    obj_type: type[SQLModel],
+    *,
+    deleted: bool = False,
+) -> list[int]:
+    """Get the ids of the changed or deleted objects of one type."""
+    return [
+        change.object_id
+        for change in changes
+        if change.kind == obj_type.__tablename__ and change.deleted == deleted
+    ]
+
+
+@router.get("/export")
+def export_notes(user: CurrentUser, session: SessionDep) -> StreamingResponse:
+    """Endpoint to export all notes of the current user.
+
+    The notes are streamed as newline delimited JSON, one note per line, in the
+    same format as they are returned by the other endpoints.
+    """
+    statement = (
+        select_by_owner(Note, user.id)
+        .order_by(Note.id)
+        .options(selectinload(Note.tags), selectinload(Note.content))
+    )
+    return StreamingResponse(
+        stream_ndjson(statement, NotePublic.from_note, session),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.post("/import", response_model=NoteImportResult)
+async def import_notes(
+    request: Request,
+    user: CurrentUser,
+    session: SessionDep,
+) -> Any:
+    """Endpoint to import notes from newline delimited JSON.
+
+    Every line holds one note in the same format as for creating a note. The
+    body is parsed while it is received and the notes are stored in chunks,
+    each in its own transaction. Lines that cannot be imported, including
+    those longer than MAX_IMPORT_LINE_BYTES, are skipped and reported in the
+    result.
+    """
+    result = NoteImportResult()
+    chunk: list[tuple[int, NoteNew]] = []
+
+    line_number = 0
+    async for line in iter_lines(request, MAX_IMPORT_LINE_BYTES):
+        line_number += 1
+        if line is None:
+            result.add_error(
+                line_number,
+                f"Lines can be at most {MAX_IMPORT_LINE_BYTES} bytes long.",
+            )
+            continue
+        if not line.strip():
+            continue
+
+        try:
+            chunk.append((line_number, NoteNew.model_validate_json(line)))
+        except ValidationError as e:
+            result.add_error(line_number, _format_validation_error(e))
+
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            await run_in_threadpool(_import_chunk, chunk, user.id, session, result)
+            chunk = []
+
+    if chunk:
+        await run_in_threadpool(_import_chunk, chunk, user.id, session, result)
+
+    return result
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    """Summarize a validation error in a single line."""
+    return "; ".join(
+        ".".join(str(part) for part in details["loc"]) + ": " + details["msg"]
+        if details["loc"]
+        else details["msg"]
+        for details in error.errors()
+    )
+
+
+def _import_chunk(
+    chunk: list[tuple[int, NoteNew]],
+    owner_id: uuid.UUID,
+    session: Session,
+    result: NoteImportResult,
+) -> None:
+    """Insert a chunk of notes in one transaction.
+
+    Notes referring to tags or folders the owner does not have are skipped.
+    """
+    tag_ids = get_owned_ids(
+        Tag,
+        (tag_id for _, note in chunk for tag_id in note.tag_ids),
+        owner_id,
+        session,
+    )
+    folder_ids = get_owned_ids(
+        Folder,
+        (note.folder_id for _, note in chunk if note.folder_id is not None),
+        owner_id,
+        session,
+    )
+
+    notes = []
+    for line_number, note in chunk:
+        if unknown_tag_ids := set(note.tag_ids) - tag_ids:
+            result.add_error(line_number, f"Unknown tag ids: {sorted(unknown_tag_ids)}")
+        elif note.folder_id is not None and note.folder_id not in folder_ids:
+            result.add_error(line_number, f"Unknown folder id: {note.folder_id}")
+        else:
+            notes.append(note)
+
+    if not notes:
+        return
+
+    statement = insert(Note).returning(Note.id, sort_by_parameter_order=True)
+    note_ids = session.scalars(
+        statement,
+        [
+            note.model_dump(exclude={"body", "tag_ids"}) | {"owner_id": owner_id}
+            for note in notes
+        ],
+    ).all()
+    session.exec(
+        insert(NoteBody),
+        params=[
+            NoteBody.from_body(note.body).model_dump(exclude={"note_id"})
+            | {"note_id": note_id}
+            for note_id, note in zip(note_ids, notes, strict=True)
+        ],
+    )
+    links = [
+        {"note_id": note_id, "tag_id": tag_id}
+        for note_id, note in zip(note_ids, notes, strict=True)
+        for tag_id in set(note.tag_ids)
+    ]
+    if links:
+        session.exec(insert(NoteTagLink), params=links)
+    record_changes(Note, note_ids, owner_id, session)
+    session.commit()
+
+    result.imported += len(notes)
 
 
 @router.get("/{note_id}", response_model=NotePublic)
-async def get_note(
+def get_note(
     note_id: Annotated[int, Path(gt=0)],
     session: SessionDep,
     user: CurrentUser,
+    response: Response,
+    if_none_match: IfNoneMatchHeader = None,
 ) -> Any:
     """Endpoint to get a note by id.
 
     If the note does not belong to the current user, a 404 error is raised.
+    If the client already has the current version, only the version is read
+    and 304 Not Modified is returned.
     """
-    note = get_object_or_404(Note, note_id, session)
+    if if_none_match is not None:
+        etag = make_etag(get_version_or_404_by_owner(Note, note_id, user.id, session))
+        if is_not_modified(if_none_match, etag):
+            return not_modified(etag)
+
+    note = get_object_or_404(
+        Note,
+        note_id,
+        session,
+        options=[selectinload(Note.tags), selectinload(Note.content)],
+    )
 
     if note.owner_id != user.id:
         raise HTTPException(status_code=404, detail="Note not found")
 
+    response.headers["ETag"] = make_etag(note.version)
     return NotePublic.from_note(note)
 
 
-@router.get("/", response_model=list[NotePublic])
-async def get_all_notes(user: CurrentUser, session: SessionDep) -> Any:
-    """Endpoint to get all notes for a specific owner."""
-    statement = select(Note).where(Note.owner_id == user.id)
-    notes = session.exec(statement).all()
-    return [NotePublic.from_note(note) for note in notes]
+@router.get("/", response_model=Page[NotePublic] | Page[NoteSummary])
+def get_all_notes(  # noqa: PLR0913
+    user: CurrentUser,
+    session: SessionDep,
+    pagination: PaginationDep,
+    response: Response,
+    if_none_match: IfNoneMatchHeader = None,
+    tag_ids: Annotated[list[int] | None, Query(max_length=MAX_FILTER_TAGS)] = None,
+    tag_match: Literal["any", "all"] = "any",
+    include_descendants: bool = False,  # noqa: FBT001, FBT002
+    summary: bool = False,  # noqa: FBT001, FBT002
+    stream: bool = False,  # noqa: FBT001, FBT002
+) -> Any:
+    """Endpoint to get a page of notes for a specific owner.
+
+    With ``tag_ids`` only notes with any of the tags are returned, or with all
+    of them if ``tag_match=all``. With ``include_descendants=true`` a note
+    with a descendant of a tag counts as having the tag. With ``summary=true``
+    the notes are returned without their bodies, only with a preview.
+
+    If the client already has the current page, only the ids and versions of
+    the notes are read and 304 Not Modified is returned. With ``stream=true``
+    all notes are streamed as one JSON array instead.
+    """
+    where: list[ColumnElement[bool]] = []
+    if tag_ids:
+        where.append(
+            notes_with_tags(
+                tag_ids,
+                user.id,
+                session,
+                match_all=tag_match == "all",
+                include_descendants=include_descendants,
+            ),
+        )
+
+    if stream:
+        if summary:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Summaries cannot be streamed.",
+            )
+        statement = (
+            select_by_owner(Note, user.id)
+            .where(*where)
+            .order_by(Note.id)
+            .options(selectinload(Note.tags), selectinload(Note.content))
+        )
+        return StreamingResponse(
+            stream_json_array(statement, NotePublic.from_note, session),
+            media_type="application/json",
+        )
+
+    if if_none_match is not None:
+        versions, next_cursor = get_versions_by_owner(
+            Note,
+            user.id,
+            session,
+            pagination.cursor,
+            pagination.limit,
+            where=where,
+        )
+        etag = make_page_etag(versions, next_cursor, "summary" if summary else "")
+        if is_not_modified(if_none_match, etag):
+            return not_modified(etag)
+
+    if summary:
+        return _get_summary_page(user.id, session, pagination, response, where)
+
+    # Load the tags and bodies of all notes in one extra query each, not per note
+    notes, next_cursor = get_objects_by_owner(
+        Note,
+        user.id,
+        session,
+        pagination.cursor,
+        pagination.limit,
+        options=[selectinload(Note.tags), selectinload(Note.content)],
+        where=where,
+    )
+    response.headers["ETag"] = make_page_etag(
+        ((note.id, note.version) for note in notes),
+        next_cursor,
+    )
+    return Page[NotePublic](
+        items=[NotePublic.from_note(note) for note in notes],
+        next_cursor=next_cursor,
+    )
+
+
+def _get_summary_page(
+    owner_id: uuid.UUID,
+    session: Session,
+    pagination: Pagination,
+    response: Response,
+    where: Sequence[ColumnElement[bool]],
+) -> Page[NoteSummary]:
+    """Get a page of note summaries, reading neither bodies nor tags."""
+    rows, next_cursor = get_note_summaries(
+        owner_id,
+        session,
+        pagination.cursor,
+        pagination.limit,
+        where=where,
+    )
+    tag_ids = get_tag_ids_by_note((row.id for row in rows), session)
+    response.headers["ETag"] = make_page_etag(
+        ((row.id, row.version) for row in rows),
+        next_cursor,
+        "summary",
+    )
+    return Page[NoteSummary](
+        items=[NoteSummary(**row._asdict(), tag_ids=tag_ids[row.id]) for row in rows],
+        next_cursor=next_cursor,
+    )
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-async def create_note(
+def create_note(
     user: CurrentUser,
     note_request: NoteNew,
     session: SessionDep,
 ) -> Any:
     """Endpoint to create a new note."""
-    post_body = note_request.model_dump()
+    if note_request.folder_id is not None:
+        check_owned_ids(Folder, [note_request.folder_id], user.id, session)
 
-    # If the request contains tag ids, fetch the tags from the database
-    if len(tag_ids := post_body.pop("tag_ids", [])) > 0:
-        post_body["tags"] = [session.get(Tag, tag_id) for tag_id in tag_ids]
+    # Check all tag ids in one query, the tags themselves are not needed
+    tag_ids = set(note_request.tag_ids)
+    check_owned_ids(Tag, tag_ids, user.id, session)
+
+    post_body = note_request.model_dump(exclude={"body", "tag_ids"})
 
     # Add the owner id to the note
     post_body["owner_id"] = user.id
 
-    note = Note(**post_body)
+    note = Note(**post_body, content=NoteBody.from_body(note_request.body))
 
     session.add(note)
+    session.flush()
+    _link_tags(note.id, tag_ids, session)
+    record_changes(Note, [note.id], user.id, session)
     session.commit()
 
 
 @router.put("/{note_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def update_note(
+def update_note(  # noqa: PLR0913
     user: CurrentUser,
     note_request: NoteNew,
     note_id: Annotated[int, Path(gt=0)],
     session: SessionDep,
+    response: Response,
+    if_match: IfMatchHeader = None,
 ) -> None:
-    """Endpoint to update a note."""
+    """Endpoint to update a note.
+
+    With an If-Match header the note is only updated if it still has the
+    version the client read, otherwise 412 Precondition Failed is returned.
+    """
     note = get_object_or_404(Note, note_id, session)
 
     if note.owner_id != user.id:
         raise HTTPException(status_code=404, detail="Note not found")
 
+    check_if_match(if_match, make_etag(note.version))
+    if note_request.folder_id is not None:
+        check_owned_ids(Folder, [note_request.folder_id], user.id, session)
+
     note.title = note_request.title
-    note.body = note_request.body
     note.folder_id = note_request.folder_id
-    note.tags = [session.get(Tag, tag_id) for tag_id in note_request.tag_ids]
-
     session.add(note)
+    _update_body(note_id, note_request.body, session)
+    _update_tag_links(note.id, note_request.tag_ids, user.id, session)
+
+    statement = (
+        update(Note)
+        .where(Note.id == note.id)
+        .values(version=Note.version + 1)
+        .returning(Note.version)
+    )
+    if if_match is not None:
+        # A concurrent update after the check must fail the precondition too
+        statement = statement.where(Note.version == note.version)
+    if (version := session.exec(statement).scalar()) is None:
+        raise precondition_failed()
+    record_changes(Note, [note.id], user.id, session)
+    session.commit()
+
+    response.headers["ETag"] = make_etag(version)
+
+
+@router.patch("/{note_id}", status_code=status.HTTP_204_NO_CONTENT)
+def patch_note(  # noqa: PLR0913
+    user: CurrentUser,
+    note_request: NotePatch,
+    note_id: Annotated[int, Path(gt=0)],
+    session: SessionDep,
+    response: Response,
+    if_match: IfMatchHeader = None,
+) -> None:
+    """Endpoint to change only some fields of a note.
+
+    Only the columns of the fields that are sent are written, and the body
+    and tag links are only touched if they are sent. Body edits are applied to the
+    stored body, so they only succeed if the note was not changed meanwhile.
+    """
+    version = get_version_or_404_by_owner(Note, note_id, user.id, session)
+    check_if_match(if_match, make_etag(version))
+
+    values = note_request.model_dump(
+        include={"title", "folder_id"},
+        exclude_unset=True,
+    )
+    # A title of null means the title is not changed
+    if values.get("title", "") is None:
+        del values["title"]
+    if values.get("folder_id") is not None:
+        check_owned_ids(Folder, [values["folder_id"]], user.id, session)
+    body = note_request.body
+    if note_request.body_edits is not None:
+        content = session.exec(select(NoteBody).where(NoteBody.note_id == note_id))
+        body = _apply_body_edits(content.one().body, note_request.body_edits)
+
+    if not values and body is None and note_request.tag_ids is None:
+        response.headers["ETag"] = make_etag(version)
+        return
+
+    if body is not None:
+        _update_body(note_id, body, session)
+    if note_request.tag_ids is not None:
+        _update_tag_links(note_id, note_request.tag_ids, user.id, session)
+
+    statement = (
+        update(Note)
+        .where(Note.id == note_id)
+        .values(**values, version=Note.version + 1)
+        .returning(Note.version)
+    )
+    if if_match is not None or note_request.body_edits is not None:
+        # The note must not have changed since its version or body was read
+        statement = statement.where(Note.version == version)
+    if (version := session.exec(statement).scalar()) is None:
+        raise precondition_failed()
+    record_changes(Note, [note_id], user.id, session)
     session.commit()
 
+    response.headers["ETag"] = make_etag(version)
+
+
+def _apply_body_edits(body: str, edits: list[NoteBodyEdit]) -> str:
+    """Apply sorted, non-overlapping edits to the body of a note."""
+    if edits and edits[-1].end > len(body):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Body edits must end within the body of {len(body)} characters.",
+        )
+
+    parts: list[str] = []
+    position = 0
+    for edit in edits:
+        parts.extend((body[position : edit.start], edit.text))
+        position = edit.end
+    parts.append(body[position:])
+    return "".join(parts)
+
+
+def _update_body(note_id: int | None, body: str, session: Session) -> None:
+    """Replace the stored body of a note without loading it."""
+    content = NoteBody.from_body(body)
+    statement = (
+        update(NoteBody)
+        .where(NoteBody.note_id == note_id)
+        .values(plain=content.plain, compressed=content.compressed)
+    )
+    session.exec(statement)
+
+
+def _link_tags(note_id: int | None, tag_ids: Iterable[int], session: Session) -> None:
+    """Link a note to tags in a single statement."""
+    links = [{"note_id": note_id, "tag_id": tag_id} for tag_id in sorted(tag_ids)]
+    if links:
+        session.exec(insert(NoteTagLink), params=links)
+
+
+def _update_tag_links(
+    note_id: int | None,
+    tag_ids: Iterable[int],
+    owner_id: uuid.UUID,
+    session: Session,
+) -> None:
+    """Link a note to exactly the given tags, only changing links that differ.
+
+    The current links are read in one query. Only the added tags are checked
+    for their owner, the other tags are already linked to the note.
+    """
+    statement = select(NoteTagLink.tag_id).where(NoteTagLink.note_id == note_id)
+    current_ids = set(session.exec(statement).all())
+    tag_ids = set(tag_ids)
+    check_owned_ids(Tag, tag_ids - current_ids, owner_id, session)
+
+    if removed_ids := current_ids - tag_ids:
+        statement = delete(NoteTagLink).where(
+            NoteTagLink.note_id == note_id,
+            col(NoteTagLink.tag_id).in_(removed_ids),
+        )
+        session.exec(statement)
+    _link_tags(note_id, tag_ids - current_ids, session)
+
 
 @router.delete("/{note_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_note(
+def delete_note(
     user: CurrentUser,
     session: SessionDep,
     note_id: Annotated[int, Path(gt=0)],
@@ -96,4 +657,5 @@ async def delete_note(
         raise HTTPException(status_code=404, detail="Note not found")
 
     session.delete(note)
+    record_changes(Note, [note.id], user.id, session, deleted=True)
     session.commit()
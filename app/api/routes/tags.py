@@ -1,61 +1,155 @@
 from typing import Any
 
-from fastapi import APIRouter, status
-from sqlmodel import select
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, func, update
+from sqlalchemy.orm import selectinload
+from sqlmodel import col, select
 
-from app.api.deps import SessionDep
+from app.api.deps import PaginationDep, SessionDep
 from app.api.routes.constants import TAG_ROUTE_PREFIX
+from app.api.routing import PrevalidatedRoute
+from app.api.schemas.pagination import Page
 from app.api.schemas.tags import TagNew, TagPublic
+from app.api.streaming import stream_json_array
 from app.crud import (
     get_object_or_404_by_owner,
-    get_tag_by_parent_and_name,
+    get_objects_by_owner,
+    get_or_create_tag,
+    record_changes,
+    select_by_owner,
 )
-from app.models.tables import Tag
+from app.models.tables import Note, NoteTagLink, Tag
 from app.security import CurrentUser
 
-router = APIRouter(prefix=TAG_ROUTE_PREFIX, tags=["tags"])
+router = APIRouter(
+    prefix=TAG_ROUTE_PREFIX,
+    tags=["tags"],
+    route_class=PrevalidatedRoute,
+)
 
 
 @router.get("/{tag_id}", response_model=TagPublic)
-async def get_tag(tag_id: int, user: CurrentUser, session: SessionDep) -> Tag:
+def get_tag(tag_id: int, user: CurrentUser, session: SessionDep) -> Any:
     """Endpoint to get a tag by ID."""
     tag = get_object_or_404_by_owner(Tag, tag_id, user.id, session)
     return TagPublic.from_tag(tag)
 
 
-@router.get("/", response_model=list[TagPublic])
-async def get_all_tags(session: SessionDep) -> Any:
-    """Endpoint to get all tags."""
-    statement = select(Tag)
-    tags = session.exec(statement).all()
+@router.get("/", response_model=Page[TagPublic])
+def get_all_tags(
+    user: CurrentUser,
+    session: SessionDep,
+    pagination: PaginationDep,
+    stream: bool = False,  # noqa: FBT001, FBT002
+) -> Any:
+    """Endpoint to get a page of tags.
+
+    With ``stream=true`` all tags are streamed as one JSON array instead.
+    """
+    if stream:
+        statement = (
+            select_by_owner(Tag, user.id)
+            .order_by(Tag.id)
+            .options(selectinload(Tag.child_tags))
+        )
+        return StreamingResponse(
+            stream_json_array(statement, TagPublic.from_tag, session),
+            media_type="application/json",
+        )
 
-    return [TagPublic.from_tag(tag) for tag in tags]
+    tags, next_cursor = get_objects_by_owner(
+        Tag,
+        user.id,
+        session,
+        pagination.cursor,
+        pagination.limit,
+        options=[selectinload(Tag.child_tags)],
+    )
+    return Page[TagPublic](
+        items=[TagPublic.from_tag(tag) for tag in tags],
+        next_cursor=next_cursor,
+    )
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-async def create_tag(tag_request: TagNew, session: SessionDep) -> None:
-    """Endpoint to create a tag."""
-    tag_names = Tag.full_name_to_tag_names(tag_request.full_name)
+def create_tag(tag_request: TagNew, user: CurrentUser, session: SessionDep) -> None:
+    """Endpoint to create a tag.
 
-    parent_id = None
-    created_tags = []
+    All tags along the full name that do not exist yet are created in one
+    transaction.
+    """
+    tag_names = Tag.full_name_to_tag_names(tag_request.full_name)
+    if not tag_names:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="The full name does not contain any tag names.",
+        )
 
-    for tag_name in tag_names:
-        possible_tag = get_tag_by_parent_and_name(parent_id, tag_name, session)
-        if possible_tag is None:
-            new_tag = Tag(name=tag_name, parent_id=parent_id)
-            session.add(new_tag)
-            session.commit()
-            session.refresh(new_tag)
-            parent_id = new_tag.id
-            created_tags.append(tag_name)
-        else:
-            parent_id = possible_tag.id
+    get_or_create_tag(tag_names, user.id, session)
+    session.commit()
 
 
 @router.delete("/{tag_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_tag(tag_id: int, user: CurrentUser, session: SessionDep) -> None:
-    """Endpoint to delete a tag by ID."""
+def delete_tag(tag_id: int, user: CurrentUser, session: SessionDep) -> None:
+    """Endpoint to delete a tag by ID.
+
+    The children of the tag become root tags, so the full names and paths of
+    all descendants are shortened without loading them. If a shortened full
+    name is already taken by a tag outside the subtree, nothing is deleted and
+    409 Conflict is returned. The descendants, the parent and the notes of the
+    tag are recorded as changed.
+    """
     tag = get_object_or_404_by_owner(Tag, tag_id, user.id, session)
+    in_subtree = and_(Tag.owner_id == tag.owner_id, Tag.in_subtree(tag.descendant_path))
+    new_full_name = func.substr(Tag.full_name, len(tag.full_name) + 2)
+
+    # Descendants may take over each other's full names, only other tags conflict
+    new_full_names = select(new_full_name).where(in_subtree).correlate(None)
+    statement = select(Tag.full_name).where(
+        Tag.owner_id == tag.owner_id,
+        Tag.id != tag.id,
+        ~Tag.in_subtree(tag.descendant_path),
+        col(Tag.full_name).in_(new_full_names),
+    )
+    if conflicts := session.exec(statement).all():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Tags with these full names already exist: {sorted(conflicts)}",
+        )
+
+    # Removing the tag changes the tag ids of its notes
+    note_ids = select(NoteTagLink.note_id).where(NoteTagLink.tag_id == tag.id)
+    statement = (
+        update(Note)
+        .where(col(Note.id).in_(note_ids))
+        .values(version=Note.version + 1)
+        .returning(Note.id)
+    )
+    record_changes(Note, session.exec(statement).scalars(), user.id, session)
+
+    # The tag is deleted first, so a child can take over its full name
+    session.exec(update(Tag).where(Tag.parent_id == tag.id).values(parent_id=None))
     session.delete(tag)
+    session.flush()
+    # Unique indexes are checked row by row, so a descendant could get the full
+    # name of one that is not renamed yet. The new full names first keep their
+    # leading "/", which no full name starts with, and lose it in a second step.
+    session.exec(
+        update(Tag)
+        .where(in_subtree)
+        .values(full_name=func.substr(Tag.full_name, len(tag.full_name) + 1)),
+    )
+    statement = (
+        update(Tag)
+        .where(in_subtree)
+        .values(
+            full_name=func.substr(Tag.full_name, 2),
+            path=func.substr(Tag.path, len(tag.descendant_path) + 1),
+        )
+        .returning(Tag.id)
+    )
+    tag_ids = [*session.exec(statement).scalars(), tag.parent_id]
+    record_changes(Tag, tag_ids, user.id, session)
+    record_changes(Tag, [tag.id], user.id, session, deleted=True)
     session.commit()
@@ -2,21 +2,34 @@ import uuid
 from typing import Any
 
 from fastapi import APIRouter, status
-from sqlmodel import select
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, or_
+from sqlmodel import col, select
 
-from app.api.deps import SessionDep
+from app.api.deps import PaginationDep, SessionDep
 from app.api.routes.constants import USERS_ROUTE_PREFIX
+from app.api.routing import PrevalidatedRoute
+from app.api.schemas.pagination import Page
 from app.api.schemas.users import UserNew, UserPublic
-from app.crud import get_object_or_404
-from app.models.tables import User
-from app.security import CurrentActiveSuperUser
-from app.shared.constants import DEFAULT_LIMIT, DEFAULT_SKIP
+from app.api.streaming import stream_json_array
+from app.crud import get_object_or_404, paginate
+from app.models.tables import Change, Folder, Note, NoteTagLink, Tag, User
+from app.security import (
+    CurrentActiveSuperUser,
+    invalidate_cached_user,
+    run_in_password_hash_pool,
+)
 
-router = APIRouter(prefix=USERS_ROUTE_PREFIX, tags=["users"])
+router = APIRouter(
+    prefix=USERS_ROUTE_PREFIX,
+    tags=["users"],
+    route_class=PrevalidatedRoute,
+)
 
 
 @router.get("/{user_id}", response_model=UserPublic)
-async def get_user(
+def get_user(
     user_id: uuid.UUID,
     superuser: CurrentActiveSuperUser,
     session: SessionDep,
@@ -27,17 +40,36 @@ async def get_user(
     return UserPublic.from_user(user)
 
 
-@router.get("/", response_model=list[UserPublic])
-async def get_users(
+@router.get("/", response_model=Page[UserPublic])
+def get_users(
     superuser: CurrentActiveSuperUser,
     session: SessionDep,
-    skip: int = DEFAULT_SKIP,
-    limit: int = DEFAULT_LIMIT,
+    pagination: PaginationDep,
+    stream: bool = False,  # noqa: FBT001, FBT002
 ) -> Any:
-    """Endpoint to get all users."""
+    """Endpoint to get a page of users.
+
+    With ``stream=true`` all users are streamed as one JSON array instead.
+    """
     del superuser  # Unused, but ensures only superusers can access this endpoint
-    statement = select(User).offset(skip).limit(limit)
-    return session.exec(statement).all()
+    if stream:
+        statement = select(User).order_by(User.id)
+        return StreamingResponse(
+            stream_json_array(statement, UserPublic.from_user, session),
+            media_type="application/json",
+        )
+
+    users, next_cursor = paginate(
+        select(User),
+        User.id,
+        session,
+        pagination.cursor,
+        pagination.limit,
+    )
+    return Page[UserPublic](
+        items=[UserPublic.from_user(user) for user in users],
+        next_cursor=next_cursor,
+    )
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
@@ -46,22 +78,48 @@ async def create_user(
     superuser: CurrentActiveSuperUser,
     session: SessionDep,
 ) -> None:
-    """Endpoint to create a new user."""
+    """Endpoint to create a new user.
+
+    The endpoint is async so that requests waiting for the password hashing
+    pool do not hold on to a worker thread.
+    """
     del superuser  # Unused, but ensures only superusers can access this endpoint
-    user = new_user.into_user()
+    # Give the connection back to the pool while waiting for the hashing pool
+    await run_in_threadpool(session.close)
+    user = await run_in_password_hash_pool(new_user.into_user)
     session.add(user)
-    session.commit()
+    await run_in_threadpool(session.commit)
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_user(
+def delete_user(
     user_id: uuid.UUID,
     superuser: CurrentActiveSuperUser,
     session: SessionDep,
 ) -> None:
-    """Endpoint to delete a user."""
+    """Endpoint to delete a user with all notes, tags and folders of the user.
+
+    Foreign keys are enforced, so everything the user owns is deleted first,
+    with one set-based statement per table.
+    """
     del superuser  # Unused, but ensures only superusers can access this endpoint
     user = get_object_or_404(User, user_id, session)
 
+    note_ids = select(Note.id).where(Note.owner_id == user.id)
+    tag_ids = select(Tag.id).where(Tag.owner_id == user.id)
+    for statement in (
+        delete(NoteTagLink).where(
+            or_(
+                col(NoteTagLink.note_id).in_(note_ids),
+                col(NoteTagLink.tag_id).in_(tag_ids),
+            ),
+        ),
+        delete(Note).where(Note.owner_id == user.id),
+        delete(Tag).where(Tag.owner_id == user.id),
+        delete(Folder).where(Folder.owner_id == user.id),
+        delete(Change).where(Change.owner_id == user.id),
+    ):
+        session.exec(statement.execution_options(synchronize_session=False))
     session.delete(user)
     session.commit()
+    invalidate_cached_user(user_id)
@@ -0,0 +1,98 @@
+import functools
+import inspect
+import types
+from collections.abc import Callable, Coroutine
+from typing import Any, Union, get_args, get_origin
+
+from fastapi import Request, Response, status
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+
+class ModelJSONResponse(JSONResponse):
+    """JSON response rendered by the compiled pydantic-core serializer."""
+
+    def render(self, content: Any) -> bytes:
+        """Serialize the content, including pydantic models, to JSON bytes."""
+        return to_json(content)
+
+
+class PrevalidatedRoute(APIRoute):
+    """Route that sends response models built by the handler as they are.
+
+    Handlers build their public schemas themselves, e.g. with
+    ``NotePublic.from_note``. FastAPI would dump such a model to a dict,
+    validate the dict against the response model again and encode it with
+    ``jsonable_encoder``. When a handler returns an instance of the response
+    model, this route serializes it directly with pydantic-core instead. Any
+    other return value goes through the regular validation. Headers and the
+    status code set on a ``Response`` parameter of the endpoint are kept. If
+    the response model is a union of models, instances of any of them are
+    sent as they are.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        """Wrap the endpoint before FastAPI builds the request handler."""
+        self._models = self._get_response_models()
+        if self._can_send_as_is():
+            self.dependant.call = self._send_prevalidated(self.dependant.call)
+        return super().get_route_handler()
+
+    def _get_response_models(self) -> tuple[type[BaseModel], ...]:
+        """Get the models of the response model, if it only consists of models."""
+        if get_origin(self.response_model) in {Union, types.UnionType}:
+            models = get_args(self.response_model)
+        else:
+            models = (self.response_model,)
+        if all(
+            isinstance(model, type) and issubclass(model, BaseModel) for model in models
+        ):
+            return models
+        return ()
+
+    def _can_send_as_is(self) -> bool:
+        """Check that validating the response could not change its content."""
+        return (
+            bool(self._models)
+            and self.response_model_include is None
+            and self.response_model_exclude is None
+            and not self.response_model_exclude_unset
+            and not self.response_model_exclude_defaults
+            and not self.response_model_exclude_none
+        )
+
+    def _to_response(self, content: Any, sub_response: Response | None) -> Any:
+        """Turn an instance of the response model into a response."""
+        if type(content) not in self._models:
+            return content
+        response = ModelJSONResponse(
+            content,
+            status_code=self.status_code or status.HTTP_200_OK,
+        )
+        if sub_response is not None:
+            if sub_response.status_code:
+                response.status_code = sub_response.status_code
+            response.headers.raw.extend(sub_response.headers.raw)
+        return response
+
+    def _send_prevalidated(self, call: Callable[..., Any]) -> Callable[..., Any]:
+        """Wrap an endpoint so instances of the response model skip validation."""
+        response_param = self.dependant.response_param_name
+
+        if inspect.iscoroutinefunction(call):
+
+            @functools.wraps(call)
+            async def async_endpoint(*args: Any, **kwargs: Any) -> Any:
+                content = await call(*args, **kwargs)
+                return self._to_response(content, kwargs.get(response_param or ""))
+
+            return async_endpoint
+
+        @functools.wraps(call)
+        def endpoint(*args: Any, **kwargs: Any) -> Any:
+            content = call(*args, **kwargs)
+            return self._to_response(content, kwargs.get(response_param or ""))
+
+        return endpoint
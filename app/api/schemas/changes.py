@@ -0,0 +1,18 @@
+from sqlmodel import SQLModel
+
+from app.api.schemas.folders import FolderPublic
+from app.api.schemas.notes import NotePublic
+from app.api.schemas.tags import TagPublic
+
+
+class Changes(SQLModel):
+    """Schema for the objects that changed since a sync token."""
+
+    notes: list[NotePublic]
+    folders: list[FolderPublic]
+    tags: list[TagPublic]
+    deleted_note_ids: list[int]
+    deleted_folder_ids: list[int]
+    deleted_tag_ids: list[int]
+    token: str
+    has_more: bool
@@ -1,4 +1,4 @@
-from sqlmodel import Field
+from sqlmodel import Field, SQLModel
 
 from app.models.basemodels import FolderBase
 
@@ -13,4 +13,11 @@ class FolderPublic(FolderBase):
     """Schema for a folder returned to the public."""
 
     id: int
+    version: int
     parent_id: int | None
+
+
+class FolderTree(SQLModel):
+    """Schema for a folder and all of its descendants, ordered by id."""
+
+    folders: list[FolderPublic]
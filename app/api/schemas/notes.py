@@ -1,13 +1,20 @@
+from itertools import pairwise
 from typing import Self
 
+from pydantic import model_validator
+from sqlmodel import Field, SQLModel
+
 from app.models.basemodels import NoteBase
 from app.models.tables import Note
+from app.shared.constants import MAX_BODY_EDITS, MAX_IMPORT_ERRORS
 
 
 class NotePublic(NoteBase):
     """Schema for a note returned to the public."""
 
     id: int
+    version: int
+    body: str
     tag_ids: list[int]
 
     @classmethod
@@ -19,6 +26,7 @@ class NotePublic(NoteBase):
 
         return cls(
             id=note.id,
+            version=note.version,
             title=note.title,
             body=note.body,
             tag_ids=[tag.id for tag in note.tags],
@@ -26,8 +34,101 @@ class NotePublic(NoteBase):
         )
 
 
+class NoteSummary(NoteBase):
+    """Schema for a note in a listing, with the start of its body."""
+
+    id: int
+    version: int
+    preview: str
+    tag_ids: list[int]
+
+
 class NoteNew(NoteBase):
     """Schema for a new note."""
 
+    body: str
     folder_id: int | None = None
     tag_ids: list[int]
+
+
+class NoteBodyEdit(SQLModel):
+    """Schema for replacing a range of characters in the body of a note.
+
+    The offsets count Unicode code points of the stored body, the end is
+    exclusive. An empty range inserts the text, an empty text deletes the range.
+    """
+
+    start: int = Field(ge=0)
+    end: int = Field(ge=0)
+    text: str = ""
+
+    @model_validator(mode="after")
+    def check_range(self) -> Self:
+        """Check that the range does not end before it starts."""
+        if self.end < self.start:
+            msg = "The end of an edit must not be before its start."
+            raise ValueError(msg)
+        return self
+
+
+class NotePatch(SQLModel):
+    """Schema for a partial update of a note.
+
+    Only the fields that are sent are changed. The body can either be replaced
+    as a whole or changed with edits against the stored body, which are sorted
+    by position and must not overlap.
+    """
+
+    title: str | None = None
+    body: str | None = None
+    body_edits: list[NoteBodyEdit] | None = Field(
+        default=None,
+        max_length=MAX_BODY_EDITS,
+    )
+    folder_id: int | None = None
+    tag_ids: list[int] | None = None
+
+    @model_validator(mode="after")
+    def check_body_edits(self) -> Self:
+        """Check that edits do not overlap and are not sent with a new body."""
+        if self.body_edits is None:
+            return self
+        if self.body is not None:
+            msg = "Send either a body or body edits, not both."
+            raise ValueError(msg)
+        for edit, next_edit in pairwise(self.body_edits):
+            if next_edit.start < edit.end:
+                msg = "Body edits must be sorted and must not overlap."
+                raise ValueError(msg)
+        return self
+
+
+class NoteSearchHit(SQLModel):
+    """Schema for a note matching a search query."""
+
+    id: int
+    title: str
+    folder_id: int | None
+    snippet: str
+    rank: float
+
+
+class NoteImportError(SQLModel):
+    """Schema for a line of a bulk import that could not be imported."""
+
+    line: int
+    detail: str
+
+
+class NoteImportResult(SQLModel):
+    """Schema for the outcome of a bulk import."""
+
+    imported: int = 0
+    failed: int = 0
+    errors: list[NoteImportError] = Field(default_factory=list)
+
+    def add_error(self, line: int, detail: str) -> None:
+        """Register a line that failed, keeping a limited number of details."""
+        self.failed += 1
+        if len(self.errors) < MAX_IMPORT_ERRORS:
+            self.errors.append(NoteImportError(line=line, detail=detail))
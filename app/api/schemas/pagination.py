@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+
+
+class Page[T](BaseModel):
+    """Schema for a single page of a listing."""
+
+    items: list[T]
+    next_cursor: str | None
@@ -0,0 +1,76 @@
+from collections.abc import AsyncIterator, Callable, Iterator
+
+from fastapi import Request
+from pydantic import BaseModel
+from sqlmodel import Session
+from sqlmodel.sql.expression import SelectOfScalar
+
+from app.shared.constants import STREAM_BATCH_SIZE
+
+
+async def iter_lines(
+    request: Request,
+    max_line_bytes: int,
+) -> AsyncIterator[bytes | None]:
+    """Iterate over the lines of a request body while it is being received.
+
+    Lines longer than ``max_line_bytes`` are dropped as soon as they exceed it
+    and yielded as None, so the caller can report them and go on.
+    """
+    buffer = b""
+    oversized = False  # The rest of the current line is dropped
+    async for chunk in request.stream():
+        *lines, buffer = (buffer + chunk).split(b"\n")
+        for line in lines:
+            yield None if oversized or len(line) > max_line_bytes else line
+            oversized = False
+        if len(buffer) > max_line_bytes:
+            buffer = b""
+            oversized = True
+    if oversized or len(buffer) > max_line_bytes:
+        yield None
+    elif buffer:
+        yield buffer
+
+
+def _iter_json_batches[T](
+    statement: SelectOfScalar[T],
+    serialize: Callable[[T], BaseModel],
+    session: Session,
+) -> Iterator[list[str]]:
+    """Serialize the results of a query to JSON, one batch of rows at a time.
+
+    The rows are fetched from a server-side cursor in batches, so only a single
+    batch is held in memory. The query runs while the response is streamed,
+    after the request handler has returned, so the session is closed here.
+    """
+    try:
+        statement = statement.execution_options(yield_per=STREAM_BATCH_SIZE)
+        for rows in session.exec(statement).partitions():
+            yield [serialize(row).model_dump_json() for row in rows]
+    finally:
+        session.close()
+
+
+def stream_ndjson[T](
+    statement: SelectOfScalar[T],
+    serialize: Callable[[T], BaseModel],
+    session: Session,
+) -> Iterator[str]:
+    """Stream the results of a query as newline delimited JSON."""
+    for batch in _iter_json_batches(statement, serialize, session):
+        yield "".join(item + "\n" for item in batch)
+
+
+def stream_json_array[T](
+    statement: SelectOfScalar[T],
+    serialize: Callable[[T], BaseModel],
+    session: Session,
+) -> Iterator[str]:
+    """Stream the results of a query as a single JSON array."""
+    separator = ""
+    yield "["
+    for batch in _iter_json_batches(statement, serialize, session):
+        yield separator + ",".join(batch)
+        separator = ","
+    yield "]"
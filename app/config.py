@@ -2,7 +2,7 @@ import logging
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
-from app.typedefs import EnvironmentType, LOGLevel
+from app.typedefs import ContentEncoding, EnvironmentType, LOGLevel
 
 
 class Settings(BaseSettings):
@@ -15,11 +15,54 @@ class Settings(BaseSettings):
     )
     ENVIRONMENT: EnvironmentType
     DATABASE_URL: str
+
+    # Connection pool of the engine. A pool size of 0 opens a new connection
+    # for every session, e.g. when an external pooler such as PgBouncer is used.
+    # In-memory SQLite databases always share a single connection.
+    DATABASE_POOL_SIZE: int = 10
+    DATABASE_MAX_OVERFLOW: int = 20
+    DATABASE_POOL_TIMEOUT_SECONDS: float = 30
+    DATABASE_POOL_RECYCLE_SECONDS: int = 1800
+    DATABASE_POOL_PRE_PING: bool = True
+
+    # Optional read replica. GET requests read from it, except for clients that
+    # wrote within the read-your-writes window, which keep reading from the
+    # primary database until the replica has caught up. The window has to
+    # exceed the replication lag. Recent writers are tracked per process.
+    DATABASE_READ_URL: str | None = None
+    READ_YOUR_WRITES_SECONDS: float = 5
+    READ_YOUR_WRITES_MAX_CLIENTS: int = 10_000
+
+    # Applied to every new SQLite connection, see app.database
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE_BYTES: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KIB: int = 64 * 1024
+
     LOG_LEVEL: LOGLevel
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # Authenticated users are cached per process, so other processes may keep
+    # seeing a deleted or deactivated user for at most the TTL.
+    USER_CACHE_TTL_SECONDS: float = 60
+    USER_CACHE_MAX_SIZE: int = 10_000
+
+    # Endpoints run in a worker thread pool, so blocking database calls do not
+    # block the event loop. This caps the number of concurrent worker threads.
+    THREADPOOL_MAX_WORKERS: int = 40
+    # Maximum number of passwords that are hashed or verified at the same time.
+    PASSWORD_HASH_MAX_WORKERS: int = 4
+
+    # Responses of at least the minimum size are compressed with the first of
+    # the encodings that the client accepts, see app.api.compression. Brotli
+    # and zstd need the optional "compression" dependencies. An empty list
+    # turns compression off.
+    RESPONSE_COMPRESSION_ENCODINGS: tuple[ContentEncoding, ...] = (
+        ContentEncoding.GZIP,
+    )
+    RESPONSE_COMPRESSION_MIN_BYTES: int = 1024
+
     FIRST_SUPERUSER_USERNAME: str
     FIRST_SUPERUSER_PASSWORD: str
     FIRST_SUPERUSER_EMAIL: str
@@ -1,18 +1,74 @@
+import base64
+import binascii
+import re
 import uuid
+from collections.abc import Callable, Collection, Iterable, Sequence
+from typing import Any, ClassVar, NamedTuple, Protocol
 
 from fastapi import HTTPException, status
-from sqlmodel import Session, SQLModel, select
+from sqlalchemy import (
+    CTE,
+    ColumnElement,
+    Row,
+    Uuid,
+    and_,
+    bindparam,
+    delete,
+    func,
+    insert,
+    literal,
+    null,
+    or_,
+    text,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import InstrumentedAttribute
+from sqlalchemy.orm.interfaces import ORMOption
+from sqlmodel import Session, SQLModel, col, select
+from sqlmodel.sql.expression import SelectOfScalar
 
-from app.models.tables import Tag
+from app.models.tables import Change, Folder, Note, NoteBody, NoteTagLink, Tag
+from app.shared.compression import preview_compressed_body
+from app.shared.constants import (
+    NOTE_PREVIEW_LENGTH,
+    SEARCH_BODY_WEIGHT,
+    SEARCH_SNIPPET_TOKENS,
+    SEARCH_TITLE_WEIGHT,
+)
+
+# INSERT constructs that support ON CONFLICT, per dialect name
+_DIALECT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+class OwnedTable(Protocol):
+    """A table model whose rows have an integer id and belong to a user."""
+
+    __tablename__: ClassVar[str | Callable[..., str]]
+    id: int | None
+    owner_id: uuid.UUID | None
+
+
+class VersionedTable(OwnedTable, Protocol):
+    """An owned table model whose rows have a version used as entity tag."""
+
+    version: int
 
 
 def get_object_or_404[T = SQLModel](
     obj_type: type[T],
     obj_id: int,
     session: Session,
+    options: Sequence[ORMOption] = (),
 ) -> T:
-    """Get an object by primary key if it exists."""
-    if (obj := session.get(obj_type, obj_id)) is None:
+    """Get an object by primary key if it exists.
+
+    Loader options, e.g. ``selectinload``, can be passed to eagerly load
+    relationships together with the object.
+    """
+    if (obj := session.get(obj_type, obj_id, options=options)) is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Nothing found with that id.",
@@ -21,7 +77,7 @@ def get_object_or_404[T = SQLModel](
     return obj
 
 
-def get_object_or_404_by_owner[T = SQLModel](
+def get_object_or_404_by_owner[T: OwnedTable](
     obj_type: type[T],
     obj_id: int,
     owner_id: uuid.UUID,
@@ -41,21 +97,529 @@ def get_object_or_404_by_owner[T = SQLModel](
     return obj
 
 
-def get_objects_by_owner[T = SQLModel](
+def get_version_or_404_by_owner[T: VersionedTable](
+    obj_type: type[T],
+    obj_id: int,
+    owner_id: uuid.UUID,
+    session: Session,
+) -> int:
+    """Get only the version of an object by primary key and owner id if it exists."""
+    statement = select(obj_type.version).where(
+        obj_type.id == obj_id,
+        obj_type.owner_id == owner_id,
+    )
+    if (version := session.exec(statement).first()) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Nothing found with that id.",
+        )
+
+    return version
+
+
+def get_owned_ids[T: OwnedTable](
+    obj_type: type[T],
+    obj_ids: Iterable[int],
+    owner_id: uuid.UUID,
+    session: Session,
+) -> set[int]:
+    """Get which of the given ids belong to objects of a specific owner."""
+    if not (obj_ids := set(obj_ids)):
+        return set()
+    statement = select(obj_type.id).where(
+        obj_type.owner_id == owner_id,
+        col(obj_type.id).in_(obj_ids),
+    )
+    return set(session.exec(statement).all())
+
+
+def check_owned_ids[T: OwnedTable](
     obj_type: type[T],
+    obj_ids: Iterable[int],
     owner_id: uuid.UUID,
     session: Session,
-) -> list[T]:
-    """Get all objects owned by a specific user."""
-    statement = select(obj_type).where(obj_type.owner_id == owner_id)
+) -> None:
+    """Check that all given ids belong to objects of a specific owner."""
+    obj_ids = set(obj_ids)
+    if unknown_ids := obj_ids - get_owned_ids(obj_type, obj_ids, owner_id, session):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown {obj_type.__tablename__} ids: {sorted(unknown_ids)}",
+        )
+
+
+def encode_cursor(value: Any) -> str:
+    """Encode a key value into an opaque pagination cursor."""
+    return base64.urlsafe_b64encode(str(value).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> str:
+    """Decode an opaque pagination cursor into the raw key value."""
+    try:
+        return base64.urlsafe_b64decode(cursor.encode()).decode()
+    except (binascii.Error, UnicodeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor.",
+        ) from e
+
+
+def paginate[T = SQLModel](
+    statement: SelectOfScalar[T],
+    key: InstrumentedAttribute[Any],
+    session: Session,
+    cursor: str | None,
+    limit: int,
+) -> tuple[Sequence[T], str | None]:
+    """Get a single page of results using keyset pagination.
+
+    The results are ordered by ``key``, which must be unique, and only rows
+    after the cursor are read, so deep pages are as cheap as the first one.
+    Returns the page and the cursor for the next page, or None on the last page.
+    """
+    if cursor is not None:
+        try:
+            after = key.type.python_type(decode_cursor(cursor))
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor.",
+            ) from e
+        statement = statement.where(key > after)
+
+    # Fetch one extra row to find out if there is a next page
+    statement = statement.order_by(key).limit(limit + 1)
+    rows = session.exec(statement).all()
+
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_cursor(getattr(rows[-1], key.key))
+
+
+def get_objects_by_owner[T: OwnedTable](  # noqa: PLR0913
+    obj_type: type[T],
+    owner_id: uuid.UUID,
+    session: Session,
+    cursor: str | None,
+    limit: int,
+    options: Sequence[ORMOption] = (),
+    where: Sequence[ColumnElement[bool]] = (),
+) -> tuple[Sequence[T], str | None]:
+    """Get a page of objects owned by a specific user, ordered by id.
+
+    Extra conditions in ``where`` narrow down the objects.
+    """
+    statement = select_by_owner(obj_type, owner_id).where(*where).options(*options)
+    return paginate(statement, obj_type.id, session, cursor, limit)
+
+
+def get_objects_by_ids[T: OwnedTable](
+    obj_type: type[T],
+    obj_ids: Iterable[int],
+    owner_id: uuid.UUID,
+    session: Session,
+    options: Sequence[ORMOption] = (),
+) -> Sequence[T]:
+    """Get the objects of a specific user with the given ids, ordered by id."""
+    if not (obj_ids := set(obj_ids)):
+        return []
+    statement = (
+        select_by_owner(obj_type, owner_id)
+        .where(col(obj_type.id).in_(obj_ids))
+        .order_by(obj_type.id)
+        .options(*options)
+    )
     return session.exec(statement).all()
 
 
-def get_tag_by_parent_and_name(
-    parent_id: int | None,
-    name: str,
+def get_versions_by_owner[T: VersionedTable](  # noqa: PLR0913
+    obj_type: type[T],
+    owner_id: uuid.UUID,
     session: Session,
-) -> Tag | None:
-    """Search for a tag with a specific parent."""
-    statement = select(Tag).where(Tag.parent_id == parent_id, Tag.name == name)
-    return session.exec(statement).first()
+    cursor: str | None,
+    limit: int,
+    where: Sequence[ColumnElement[bool]] = (),
+) -> tuple[Sequence[Row[tuple[int, int]]], str | None]:
+    """Get the ids and versions of a page of objects owned by a specific user.
+
+    The page is the same as the one ``get_objects_by_owner`` would return.
+    """
+    statement = select(obj_type.id, obj_type.version).where(
+        obj_type.owner_id == owner_id,
+        *where,
+    )
+    return paginate(statement, obj_type.id, session, cursor, limit)
+
+
+class NoteSummaryRow(NamedTuple):
+    """A note without its body, but with a preview of it."""
+
+    id: int
+    version: int
+    title: str
+    folder_id: int | None
+    preview: str
+
+
+def get_note_summaries(
+    owner_id: uuid.UUID,
+    session: Session,
+    cursor: str | None,
+    limit: int,
+    where: Sequence[ColumnElement[bool]] = (),
+) -> tuple[list[NoteSummaryRow], str | None]:
+    """Get a page of notes of a specific user without their bodies.
+
+    The preview has at most ``NOTE_PREVIEW_LENGTH`` characters of the body and
+    is cut in the database, so only the start of plain bodies is read. SQLite
+    also decompresses compressed bodies only as far as needed, other databases
+    cannot decompress them, so those are read and cut here. The page is the
+    same as the one ``get_objects_by_owner`` would return.
+    """
+    preview = func.substr(NoteBody.plain, 1, NOTE_PREVIEW_LENGTH)
+    compressed: ColumnElement[bytes | None] = col(NoteBody.compressed)
+    if session.get_bind().dialect.name == "sqlite":
+        preview = func.coalesce(
+            preview,
+            func.preview_compressed_body(NoteBody.compressed, NOTE_PREVIEW_LENGTH),
+        )
+        compressed = null()
+    statement = (
+        select(
+            Note.id,
+            Note.version,
+            Note.title,
+            Note.folder_id,
+            preview.label("preview"),
+            compressed.label("compressed"),
+        )
+        .join(NoteBody, NoteBody.note_id == Note.id)
+        .where(Note.owner_id == owner_id, *where)
+    )
+    rows, next_cursor = paginate(statement, Note.id, session, cursor, limit)
+    summaries = [
+        NoteSummaryRow(
+            row.id,
+            row.version,
+            row.title,
+            row.folder_id,
+            row.preview
+            if row.preview is not None
+            else preview_compressed_body(row.compressed, NOTE_PREVIEW_LENGTH) or "",
+        )
+        for row in rows
+    ]
+    return summaries, next_cursor
+
+
+def get_tag_ids_by_note(
+    note_ids: Iterable[int],
+    session: Session,
+) -> dict[int, list[int]]:
+    """Get the ids of the tags of notes, without loading the tags."""
+    tag_ids: dict[int, list[int]] = {note_id: [] for note_id in note_ids}
+    if not tag_ids:
+        return tag_ids
+    statement = (
+        select(NoteTagLink.note_id, NoteTagLink.tag_id)
+        .where(col(NoteTagLink.note_id).in_(tag_ids))
+        .order_by(NoteTagLink.note_id, NoteTagLink.tag_id)
+    )
+    for note_id, tag_id in session.exec(statement):
+        tag_ids[note_id].append(tag_id)
+    return tag_ids
+
+
+def select_by_owner[T: OwnedTable](
+    obj_type: type[T],
+    owner_id: uuid.UUID,
+) -> SelectOfScalar[T]:
+    """Select all objects owned by a specific user."""
+    return select(obj_type).where(obj_type.owner_id == owner_id)
+
+
+def select_folder_subtree(folder_id: int, owner_id: uuid.UUID) -> CTE:
+    """Select the ids of a folder of a specific user and all of its descendants.
+
+    The recursive CTE walks the hierarchy in the database, one level per step
+    through the index on the parent id, so the whole subtree is read by a
+    single query. UNION drops ids that were already found, so the walk also
+    ends if the parents form a cycle.
+    """
+    subtree = (
+        select(Folder.id)
+        .where(Folder.id == folder_id, Folder.owner_id == owner_id)
+        .cte("subtree", recursive=True)
+    )
+    children = (
+        select(Folder.id)
+        .join(subtree, Folder.parent_id == subtree.c.id)
+        .where(Folder.owner_id == owner_id)
+    )
+    return subtree.union(children)
+
+
+def _lock_change_log(
+    owner_ids: Iterable[uuid.UUID] | SelectOfScalar[uuid.UUID],
+    session: Session,
+) -> None:
+    """Make the changes of each owner commit in the order of their ids.
+
+    Sync tokens are change ids, so a change that commits after a client read a
+    higher id would never be sent to it. On PostgreSQL ids come from a sequence
+    while transactions commit in any order, so a lock per owner is held until
+    the end of the transaction. SQLite has a single writer and needs none. The
+    owner ids can also be given as a query, which then only runs if needed.
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        return
+    if isinstance(owner_ids, SelectOfScalar):
+        owner_ids = session.exec(owner_ids).all()
+    for owner_id in sorted(set(owner_ids)):
+        key = int.from_bytes(owner_id.bytes[:8], signed=True)
+        session.exec(select(func.pg_advisory_xact_lock(key)))
+
+
+def record_changes[T: OwnedTable](
+    obj_type: type[T],
+    obj_ids: Iterable[int | None],
+    owner_id: uuid.UUID,
+    session: Session,
+    *,
+    deleted: bool = False,
+) -> None:
+    """Record that objects were created, updated or deleted for syncing clients.
+
+    The previous changes of the objects are replaced, so the change log holds
+    one change per object and syncing costs as much as the number of changed
+    objects. Call this in the transaction that changes the objects.
+    """
+    if not (obj_ids := {obj_id for obj_id in obj_ids if obj_id is not None}):
+        return
+    _lock_change_log([owner_id], session)
+    kind = obj_type.__tablename__
+    session.exec(
+        delete(Change).where(Change.kind == kind, col(Change.object_id).in_(obj_ids)),
+    )
+    session.exec(
+        insert(Change),
+        params=[
+            {
+                "owner_id": owner_id,
+                "kind": kind,
+                "object_id": obj_id,
+                "deleted": deleted,
+            }
+            for obj_id in sorted(obj_ids)
+        ],
+    )
+
+
+def record_changes_where[T: OwnedTable](
+    obj_type: type[T],
+    where: ColumnElement[bool],
+    session: Session,
+    *,
+    deleted: bool = False,
+) -> None:
+    """Record changes of all objects matching a condition without loading them.
+
+    Like ``record_changes``, but with set-based statements for any number of
+    objects. Each change is recorded for the owner of the object.
+    """
+    owner_ids = select(obj_type.owner_id).where(
+        where,
+        col(obj_type.owner_id).is_not(None),
+    )
+    _lock_change_log(owner_ids.distinct(), session)
+    kind = obj_type.__tablename__
+    obj_ids = select(obj_type.id).where(where)
+    session.exec(
+        delete(Change)
+        .where(Change.kind == kind, col(Change.object_id).in_(obj_ids))
+        .execution_options(synchronize_session=False),
+    )
+    changes = select(
+        obj_type.owner_id,
+        literal(kind),
+        obj_type.id,
+        literal(deleted),
+    ).where(where, col(obj_type.owner_id).is_not(None))
+    session.exec(
+        insert(Change).from_select(
+            ["owner_id", "kind", "object_id", "deleted"],
+            changes,
+        ),
+    )
+
+
+def notes_with_tags(
+    tag_ids: Collection[int],
+    owner_id: uuid.UUID,
+    session: Session,
+    *,
+    match_all: bool,
+    include_descendants: bool,
+) -> ColumnElement[bool]:
+    """Filter for notes that have the given tags of a specific user.
+
+    With ``match_all`` a note needs every tag, otherwise any of them will do.
+    With ``include_descendants`` a note with a descendant of a tag counts as
+    having that tag, e.g. ``work/projectx/design`` for ``work/projectx``. Each
+    tag is expanded to its ids through the primary key and the index on the
+    path, and the notes are found through the index on the links.
+    """
+    tags = get_objects_by_ids(Tag, tag_ids, owner_id, session)
+    if unknown_ids := set(tag_ids) - {tag.id for tag in tags}:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown tag ids: {sorted(unknown_ids)}",
+        )
+
+    def matches(tag: Tag) -> ColumnElement[bool]:
+        if include_descendants:
+            return or_(Tag.id == tag.id, Tag.in_subtree(tag.descendant_path))
+        return Tag.id == tag.id
+
+    def tagged(*tags: Tag) -> ColumnElement[bool]:
+        # The tags belong to the owner, so their descendants do too
+        expanded_ids = select(Tag.id).where(or_(*(matches(tag) for tag in tags)))
+        note_ids = select(NoteTagLink.note_id).where(
+            col(NoteTagLink.tag_id).in_(expanded_ids),
+        )
+        return col(Note.id).in_(note_ids)
+
+    if match_all:
+        return and_(*(tagged(tag) for tag in tags))
+    return tagged(*tags)
+
+
+def get_or_create_tag(
+    tag_names: list[str],
+    owner_id: uuid.UUID,
+    session: Session,
+) -> Tag:
+    """Get the tag at the end of a path of tag names, creating missing tags.
+
+    The existing tags along the path are read in a single query and only the
+    missing ones are inserted, all in the current transaction. The inserts skip
+    tags that were created concurrently, which the unique index on owner and
+    full name detects, and read those tags instead.
+    """
+    full_names = ["/".join(tag_names[: i + 1]) for i in range(len(tag_names))]
+    statement = select(Tag).where(
+        Tag.owner_id == owner_id,
+        col(Tag.full_name).in_(full_names),
+    )
+    existing_tags = {tag.full_name: tag for tag in session.exec(statement)}
+
+    insert = _DIALECT_INSERTS[session.get_bind().dialect.name]
+    parent: Tag | None = None
+    changed_ids: set[int | None] = set()
+
+    for tag_name, full_name in zip(tag_names, full_names, strict=True):
+        if (tag := existing_tags.get(full_name)) is None:
+            new_tag = (
+                Tag(name=tag_name, full_name=tag_name, owner_id=owner_id)
+                if parent is None
+                else parent.child_of(tag_name)
+            )
+            statement = (
+                insert(Tag)
+                .values(**new_tag.model_dump(exclude={"id"}))
+                .on_conflict_do_nothing(index_elements=[Tag.owner_id, Tag.full_name])
+                .returning(Tag)
+            )
+            if (tag := session.scalars(statement).first()) is None:
+                statement = select(Tag).where(
+                    Tag.owner_id == owner_id,
+                    Tag.full_name == full_name,
+                )
+                tag = session.exec(statement).one()
+            else:
+                changed_ids.update((tag.id, tag.parent_id))
+        parent = tag
+
+    if parent is None:
+        msg = "A tag needs at least one name."
+        raise ValueError(msg)
+
+    record_changes(Tag, changed_ids, owner_id, session)
+    return parent
+
+
+def to_match_query(query: str) -> str | None:
+    """Turn free text into a safe FTS5 query.
+
+    Every word is quoted, so FTS5 operators in the input are matched literally.
+    All words have to be present and the last one also matches as a prefix.
+    Returns None if the text does not contain any words.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+
+def search_notes(
+    owner_id: uuid.UUID,
+    query: str,
+    session: Session,
+    cursor: str | None,
+    limit: int,
+) -> tuple[Sequence[Row[Any]], str | None]:
+    """Get a page of notes matching a full-text query, best matches first.
+
+    Each row contains the id, title and folder id of the note, a snippet of
+    the body around the matched words and the rank of the match. The index
+    uses SQLite FTS5, so other databases get 501 Not Implemented.
+    """
+    if session.get_bind().dialect.name != "sqlite":
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Full-text search is only available with SQLite.",
+        )
+
+    offset = 0
+    if cursor is not None:
+        try:
+            offset = int(decode_cursor(cursor))
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor.",
+            ) from e
+
+    if (match_query := to_match_query(query)) is None:
+        return [], None
+
+    statement = text(
+        """
+        SELECT note.id, note.title, note.folder_id,
+            snippet(note_fts, 1, '<mark>', '</mark>', '…', :tokens) AS snippet,
+            bm25(note_fts, :title_weight, :body_weight) AS rank
+        FROM note_fts
+        JOIN note ON note.id = note_fts.rowid
+        WHERE note_fts MATCH :query AND note.owner_id = :owner_id
+        ORDER BY rank
+        LIMIT :limit OFFSET :offset
+        """,
+    ).bindparams(bindparam("owner_id", type_=Uuid))
+    params = {
+        "query": match_query,
+        "owner_id": owner_id,
+        "tokens": SEARCH_SNIPPET_TOKENS,
+        "title_weight": SEARCH_TITLE_WEIGHT,
+        "body_weight": SEARCH_BODY_WEIGHT,
+        # Fetch one extra row to find out if there is a next page
+        "limit": limit + 1,
+        "offset": offset,
+    }
+    rows = session.connection().execute(statement, params).all()
+
+    if len(rows) <= limit:
+        return rows, None
+
+    return rows[:limit], encode_cursor(offset + limit)
@@ -1,13 +1,97 @@
-from sqlmodel import SQLModel, create_engine
+from typing import Any
+
+from sqlalchemy import URL, Engine, event, make_url
+from sqlalchemy.pool import NullPool, QueuePool, StaticPool
+from sqlmodel import create_engine
 
 from app.config import settings
+from app.shared.compression import decompress_body, preview_compressed_body
+
+
+def is_in_memory_sqlite(url: URL) -> bool:
+    """Check if a URL points to an in-memory SQLite database."""
+    return url.get_backend_name() == "sqlite" and url.database in {None, "", ":memory:"}
+
+
+def get_engine_options(url: URL) -> dict[str, Any]:
+    """Get the pool class and connection arguments of an engine for a URL."""
+    options: dict[str, Any] = {}
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+
+    if is_in_memory_sqlite(url):
+        # Every connection to an in-memory database opens a new, empty one,
+        # so all sessions have to share a single connection.
+        options["poolclass"] = StaticPool
+    elif settings.DATABASE_POOL_SIZE == 0:
+        # Open a connection per session, e.g. behind an external pooler
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            poolclass=QueuePool,
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+            pool_timeout=settings.DATABASE_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DATABASE_POOL_RECYCLE_SECONDS,
+            pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+        )
+    return options
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False},
-)
 
+def set_sqlite_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+    """Tune a new SQLite connection for concurrent readers and writers.
 
-def create_db_and_tables() -> None:
-    """Create all tables if they do not exist yet."""
-    SQLModel.metadata.create_all(engine)
+    SQLite only enforces foreign keys, including ``ON DELETE CASCADE``, when
+    they are enabled for the connection. In WAL mode readers do not block the
+    writer and the writer does not block readers. With ``synchronous=NORMAL``
+    a commit only syncs the log at checkpoints, which is still safe against
+    corruption in WAL mode. Writers wait up to the busy timeout for the write
+    lock instead of failing with "database is locked" right away.
+    """
+    del connection_record  # Unused, but part of the event signature
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS:d}")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE_BYTES:d}")
+        # A negative cache size is in KiB instead of pages
+        cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KIB:d}")
+    finally:
+        cursor.close()
+
+
+def register_sqlite_functions(dbapi_connection: Any, connection_record: Any) -> None:
+    """Register the SQL functions of the application on a new SQLite connection."""
+    del connection_record  # Unused, but part of the event signature
+    dbapi_connection.create_function(
+        "decompress_body",
+        2,
+        decompress_body,
+        deterministic=True,
+    )
+    dbapi_connection.create_function(
+        "preview_compressed_body",
+        2,
+        preview_compressed_body,
+        deterministic=True,
+    )
+
+
+def create_database_engine(database_url: str) -> Engine:
+    """Create an engine with the configured pool and connection settings."""
+    url = make_url(database_url)
+    engine = create_engine(url, **get_engine_options(url))
+    if url.get_backend_name() == "sqlite":
+        event.listen(engine, "connect", set_sqlite_pragmas)
+        event.listen(engine, "connect", register_sqlite_functions)
+    return engine
+
+
+engine = create_database_engine(settings.DATABASE_URL)
+read_engine = (
+    create_database_engine(settings.DATABASE_READ_URL)
+    if settings.DATABASE_READ_URL
+    else None
+)
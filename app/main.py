@@ -1,7 +1,9 @@
 from contextlib import asynccontextmanager
 
+from anyio import to_thread
 from fastapi import FastAPI
 
+from app.api.compression import CompressionMiddleware
 from app.api.main import api_router
 from app.config import settings
 from app.startup import startup
@@ -12,6 +14,9 @@ from app.typedefs import EnvironmentType
 async def lifespan(app: FastAPI):  # noqa: ARG001, ANN201
     """Lifespan context manager for FastAPI app."""
     # Startup code
+    to_thread.current_default_thread_limiter().total_tokens = (
+        settings.THREADPOOL_MAX_WORKERS
+    )
     startup()
 
     yield
@@ -19,7 +24,11 @@ async def lifespan(app: FastAPI):  # noqa: ARG001, ANN201
 
 
 app = FastAPI(lifespan=lifespan)
-
+app.add_middleware(
+    CompressionMiddleware,
+    encodings=settings.RESPONSE_COMPRESSION_ENCODINGS,
+    minimum_size=settings.RESPONSE_COMPRESSION_MIN_BYTES,
+)
 
 app.include_router(api_router)
 
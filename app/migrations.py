@@ -0,0 +1,185 @@
+"""Helpers for the database migrations in app/alembic."""
+
+from collections.abc import Collection, Iterator, Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+from alembic import op
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import (
+    ColumnElement,
+    Connection,
+    Engine,
+    TableClause,
+    column,
+    insert,
+    inspect,
+    select,
+    table,
+    text,
+    update,
+)
+from sqlalchemy.sql.schema import SchemaItem
+
+from app.shared.constants import BACKFILL_BATCH_SIZE
+
+MIGRATIONS_DIRECTORY = Path(__file__).parent / "alembic"
+
+# Revision of the schema that create_all built before there were migrations
+BASELINE_REVISION = "0001"
+
+
+def include_name(name: str | None, type_: str, parent_names: Any) -> bool:
+    """Leave the SQLite full-text search tables out of autogenerate.
+
+    They are not part of the models but created by hand in the migrations.
+    """
+    del parent_names  # Unused, but part of the hook signature
+    return not (type_ == "table" and name is not None and name.startswith("note_fts"))
+
+
+def check_schema_version(engine: Engine) -> None:
+    """Check that the database has been migrated to the latest revision.
+
+    Migrations are run separately with ``alembic upgrade head``, so at startup
+    the application only compares the revision of the database with the head.
+    """
+    head = ScriptDirectory(str(MIGRATIONS_DIRECTORY)).get_current_head()
+    with engine.connect() as connection:
+        current = MigrationContext.configure(connection).get_current_revision()
+
+    if current != head:
+        msg = (
+            f"The database schema is at revision {current}, but {head} is "
+            "required. Run `alembic upgrade head` to migrate the database."
+        )
+        raise RuntimeError(msg)
+
+
+def stamp_unversioned_database(connection: Connection) -> None:
+    """Mark a database built by ``create_all`` as being at the baseline revision.
+
+    Such a database has tables but no version table, so the baseline revision
+    would fail to create its tables again. Once it is stamped, the later
+    revisions bring it up to date.
+    """
+    table_names = inspect(connection).get_table_names()
+    if table_names and "alembic_version" not in table_names:
+        script = ScriptDirectory(str(MIGRATIONS_DIRECTORY))
+        MigrationContext.configure(connection).stamp(script, BASELINE_REVISION)
+    # End the transaction, every migration runs in its own
+    connection.commit()
+
+
+def iter_key_ranges(
+    connection: Connection,
+    key: ColumnElement[Any],
+    batch_size: int = BACKFILL_BATCH_SIZE,
+) -> Iterator[tuple[Any, Any]]:
+    """Walk a large table in order of a unique key, ``batch_size`` keys at a time.
+
+    Yields the first and last key of every batch. The keys of the next batch
+    are only read after the caller processed the previous one, so rows that
+    are inserted meanwhile are included if their key is larger.
+    """
+    last_key = None
+    while True:
+        statement = select(key).order_by(key).limit(batch_size)
+        if last_key is not None:
+            statement = statement.where(key > last_key)
+        if not (keys := connection.execute(statement).scalars().all()):
+            return
+        yield keys[0], keys[-1]
+        last_key = keys[-1]
+
+
+def backfill_in_batches(  # noqa: PLR0913
+    connection: Connection,
+    table: TableClause,
+    key: ColumnElement[Any],
+    values: Mapping[str, Any],
+    where: ColumnElement[bool] | None = None,
+    batch_size: int = BACKFILL_BATCH_SIZE,
+) -> int:
+    """Update all rows of a large table in small batches.
+
+    The table is walked in order of the unique key and every batch only
+    updates the next ``batch_size`` keys, so each update holds its locks
+    briefly and already processed rows are never read again. Call this inside
+    ``op.get_context().autocommit_block()`` in a migration, so every batch is
+    committed on its own while the application keeps running.
+    Returns the number of updated rows.
+    """
+    updated = 0
+    for first, last in iter_key_ranges(connection, key, batch_size):
+        batch = update(table).where(key >= first, key <= last).values(values)
+        if where is not None:
+            batch = batch.where(where)
+        updated += connection.execute(batch).rowcount
+    return updated
+
+
+def rebuild_table_in_batches(
+    name: str,
+    *elements: SchemaItem,
+    columns: Sequence[str],
+    drop_triggers: Collection[str] = (),
+    **kwargs: Any,
+) -> None:
+    """Recreate a SQLite table with a new definition while it stays writable.
+
+    SQLite can only change most of a table by recreating it, which copies all
+    rows in one long write transaction. Instead the new table is created from
+    ``elements`` and ``kwargs`` next to the old one, triggers copy every write
+    to the old table into it, and the existing rows are copied in batches that
+    are committed on their own. Only then are the tables swapped in a short
+    transaction, which creates the indexes and triggers of the old table on
+    the new one, except ``drop_triggers``.
+
+    The given columns are copied, the new table must have all of them and the
+    integer primary key ``id``. Its other columns get their defaults. Call this
+    from a migration, it commits the transaction of the migration.
+    """
+    new_name = f"_{name}_new"
+    copy_triggers = [
+        f"_{name}_copy_{event}" for event in ("insert", "update", "delete")
+    ]
+    op.create_table(new_name, *elements, **kwargs)
+    target = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    upsert = f"INSERT OR REPLACE INTO {new_name} ({target}) VALUES ({new_values});"  # noqa: S608
+    delete = f"DELETE FROM {new_name} WHERE id = old.id;"  # noqa: S608
+    for trigger, body in zip(
+        copy_triggers,
+        (upsert, delete + upsert, delete),
+        strict=True,
+    ):
+        event = trigger.rsplit("_", 1)[-1].upper()
+        op.execute(f"CREATE TRIGGER {trigger} AFTER {event} ON {name} BEGIN {body} END")
+
+    # The triggers copy the rows that change meanwhile, the batches the rest
+    old_table = table(name, *(column(column_name) for column_name in columns))
+    new_table = table(new_name, *(column(column_name) for column_name in columns))
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        for first, last in iter_key_ranges(connection, old_table.c.id):
+            rows = select(*old_table.c).where(old_table.c.id.between(first, last))
+            statement = insert(new_table).from_select(columns, rows)
+            connection.execute(statement.prefix_with("OR REPLACE"))
+
+    connection = op.get_bind()
+    # pysqlite only begins transactions before DML, but the swap must be atomic
+    if not connection.connection.driver_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+    statement = text(
+        "SELECT name, sql FROM sqlite_master WHERE tbl_name = :name "
+        "AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+    )
+    schema = connection.execute(statement, {"name": name}).tuples().all()
+    skipped = {*copy_triggers, *drop_triggers}
+    op.drop_table(name)
+    op.rename_table(new_name, name)
+    for schema_name, sql in schema:
+        if schema_name not in skipped:
+            op.execute(sql)
@@ -5,10 +5,12 @@ from sqlmodel import Field, SQLModel
 
 
 class NoteBase(SQLModel):
-    """Base model for a note."""
+    """Base model for a note.
+
+    The body is not part of it, because it is stored in its own table.
+    """
 
     title: str = Field()
-    body: str = Field()
     folder_id: int | None = Field(
         foreign_key="folder.id",
         default=None,
@@ -1,36 +1,177 @@
 """All the database tables used in the application."""
 
 import uuid
-from typing import Optional
+from typing import Any, Optional
 
+from sqlalchemy import ColumnElement, Connection, Index, and_, event, text
 from sqlmodel import Field, Relationship, SQLModel
 
 from app.models.basemodels import FolderBase, NoteBase, TagBase, UserBase
+from app.shared.compression import compress_body, decompress_body
 from app.shared.constants import MAX_NAME_LEN, MIN_NAME_LEN
 
 
 class NoteTagLink(SQLModel, table=True):  # type: ignore[call-arg]
-    """Link between a note and a tag."""
+    """Link between a note and a tag.
+
+    The primary key finds the tags of a note, the index the notes of a tag.
+    """
+
+    __table_args__ = (Index("ix_notetaglink_tag_id_note_id", "tag_id", "note_id"),)
 
     note_id: int | None = Field(foreign_key="note.id", primary_key=True)
     tag_id: int | None = Field(foreign_key="tag.id", primary_key=True)
 
 
 class Note(NoteBase, table=True):  # type: ignore[call-arg]
-    """Representation of a note."""
+    """Representation of a note.
+
+    The version is incremented on every change and is used as entity tag.
+    Ids are never reused, so an id and version identify a note's content.
+    """
+
+    __table_args__ = (
+        Index("ix_note_owner_id_id", "owner_id", "id"),
+        Index("ix_note_folder_id", "folder_id"),
+        {"sqlite_autoincrement": True},
+    )
 
     id: int | None = Field(primary_key=True, default=None)
+    version: int = Field(default=1)
     tags: list["Tag"] = Relationship(
         back_populates="notes",
         link_model=NoteTagLink,
     )
     owner_id: uuid.UUID | None = Field(foreign_key="user.id")
+    content: "NoteBody" = Relationship(
+        sa_relationship_kwargs={"uselist": False, "cascade": "all, delete-orphan"},
+        passive_deletes=True,
+    )
+
+    @property
+    def body(self) -> str:
+        """Get the body of the note, loading it if needed."""
+        return self.content.body
+
+
+class NoteBody(SQLModel, table=True):  # type: ignore[call-arg]
+    """Body of a note, stored apart from the other columns of the note.
+
+    Queries over many notes, e.g. for pages of versions or changes, then read
+    far fewer pages of the database. Long bodies are stored compressed in
+    ``compressed`` instead of ``plain``, see ``compress_body``.
+    """
+
+    note_id: int | None = Field(
+        default=None,
+        foreign_key="note.id",
+        primary_key=True,
+        ondelete="CASCADE",
+    )
+    plain: str | None = None
+    compressed: bytes | None = None
+
+    @classmethod
+    def from_body(cls, body: str) -> "NoteBody":
+        """Create the stored form of a body."""
+        plain, compressed = compress_body(body)
+        return cls(plain=plain, compressed=compressed)
+
+    @property
+    def body(self) -> str:
+        """Get the body, decompressing it if needed."""
+        return decompress_body(self.plain, self.compressed) or ""
+
+
+# SQLite FTS5 index over the title and body of notes. It is an external content
+# table, so the text itself is only stored in the note tables and the triggers
+# keep the index in sync with them. The view joins the title with the body,
+# which needs the decompress_body function registered by app.database.
+_NOTE_SEARCH_DDL = (
+    """
+    CREATE VIEW IF NOT EXISTS note_fts_content AS
+    SELECT note.id, note.title,
+        decompress_body(notebody.plain, notebody.compressed) AS body
+    FROM note JOIN notebody ON notebody.note_id = note.id
+    """,
+    """
+    CREATE VIRTUAL TABLE note_fts USING fts5(
+        title, body, content='note_fts_content', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS note_fts_after_body_insert AFTER INSERT ON notebody
+    BEGIN
+        INSERT INTO note_fts(rowid, title, body)
+        SELECT note.id, note.title, decompress_body(new.plain, new.compressed)
+        FROM note WHERE note.id = new.note_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS note_fts_before_delete BEFORE DELETE ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, body)
+        SELECT 'delete', old.id, old.title, body
+        FROM note_fts_content WHERE id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS note_fts_after_title_update AFTER UPDATE OF title
+    ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, body)
+        SELECT 'delete', old.id, old.title, body
+        FROM note_fts_content WHERE id = old.id;
+        INSERT INTO note_fts(rowid, title, body)
+        SELECT id, title, body FROM note_fts_content WHERE id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS note_fts_after_body_update
+    AFTER UPDATE OF plain, compressed ON notebody BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, body)
+        SELECT 'delete', note.id, note.title,
+            decompress_body(old.plain, old.compressed)
+        FROM note WHERE note.id = old.note_id;
+        INSERT INTO note_fts(rowid, title, body)
+        SELECT id, title, body FROM note_fts_content WHERE id = new.note_id;
+    END
+    """,
+    "INSERT INTO note_fts(note_fts) VALUES ('rebuild')",
+)
+
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def create_note_search_index(target: Any, connection: Connection, **kw: Any) -> None:  # noqa: ARG001
+    """Create the full-text search index for notes if it does not exist yet.
+
+    Only SQLite is supported. When the index is added to an existing database,
+    it is filled with the notes that are already stored.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+
+    statement = text("SELECT 1 FROM sqlite_master WHERE name = 'note_fts'")
+    if connection.execute(statement).first():
+        return
+
+    for ddl in _NOTE_SEARCH_DDL:
+        connection.execute(text(ddl))
 
 
 class Folder(FolderBase, table=True):  # type: ignore[call-arg]
-    """Representation of a folder to group notes."""
+    """Representation of a folder to group notes.
+
+    Like notes, folders have a version that is used as entity tag.
+    """
+
+    __table_args__ = (
+        Index("ix_folder_owner_id_id", "owner_id", "id"),
+        Index("ix_folder_parent_id_name", "parent_id", "name"),
+        {"sqlite_autoincrement": True},
+    )
 
     id: int | None = Field(primary_key=True, default=None)
+    version: int = Field(default=1)
     parent_id: int | None = Field(foreign_key="folder.id", default=None)
     parent: Optional["Folder"] = Relationship(
         back_populates="child_folders",
@@ -40,10 +181,24 @@ class Folder(FolderBase, table=True):  # type: ignore[call-arg]
 
 
 class Tag(TagBase, table=True):  # type: ignore[call-arg]
-    """Represents a tag used to group notes."""
+    """Represents a tag used to group notes.
+
+    Every tag stores its full name and the materialized path of its ancestors,
+    e.g. ``"1/5/"`` for a tag whose parent has id 5 and grandparent id 1. This
+    way full names and subtrees can be read without walking the hierarchy.
+    """
+
+    __table_args__ = (
+        Index("ix_tag_owner_id_id", "owner_id", "id"),
+        Index("ix_tag_owner_id_full_name", "owner_id", "full_name", unique=True),
+        Index("ix_tag_parent_id_name", "parent_id", "name"),
+        Index("ix_tag_path", "path"),
+    )
 
     id: int | None = Field(primary_key=True, default=None)
     name: str = Field(min_length=MIN_NAME_LEN, max_length=MAX_NAME_LEN)
+    full_name: str = Field(max_length=MAX_NAME_LEN)
+    path: str = Field(default="")
     parent_id: int | None = Field(foreign_key="tag.id", default=None)
     parent_tag: Optional["Tag"] = Relationship(
         back_populates="child_tags",
@@ -55,12 +210,29 @@ class Tag(TagBase, table=True):  # type: ignore[call-arg]
         link_model=NoteTagLink,
     )
 
-    def get_full_name(self) -> str:
-        """Get the full name of a tag."""
-        full_name = self.name
-        if self.parent_tag is not None:
-            full_name = self.parent_tag.get_full_name() + "/" + full_name
-        return full_name
+    @property
+    def descendant_path(self) -> str:
+        """Get the path shared by all descendants of this tag."""
+        return f"{self.path}{self.id}/"
+
+    @staticmethod
+    def in_subtree(path: str) -> ColumnElement[bool]:
+        """Filter for tags whose path starts with the given path.
+
+        This is a range condition instead of a LIKE, so the index on the path
+        can be used: "/" is followed by "0" in every collation we support.
+        """
+        return and_(Tag.path >= path, Tag.path < path[:-1] + "0")
+
+    def child_of(self, name: str) -> "Tag":
+        """Create a new tag below this tag."""
+        return Tag(
+            name=name,
+            full_name=f"{self.full_name}/{name}",
+            path=self.descendant_path,
+            parent_id=self.id,
+            owner_id=self.owner_id,
+        )
 
     @staticmethod
     def full_name_to_tag_names(full_name: str) -> list[str]:
@@ -81,3 +253,25 @@ class User(UserBase, table=True):  # type: ignore[call-arg]
     hashed_password: str
     is_active: bool = True
     is_superuser: bool = False
+
+
+class Change(SQLModel, table=True):  # type: ignore[call-arg]
+    """Latest change to a note, folder or tag, used to sync clients.
+
+    Every object has at most one change: recording a new change replaces the
+    previous one. The ids of the changes form a monotonic sequence, so a client
+    only has to read the changes after the last one it has seen. Deleted objects
+    keep their change as tombstone.
+    """
+
+    __table_args__ = (
+        Index("ix_change_owner_id_id", "owner_id", "id"),
+        Index("ix_change_kind_object_id", "kind", "object_id", unique=True),
+        {"sqlite_autoincrement": True},
+    )
+
+    id: int | None = Field(primary_key=True, default=None)
+    owner_id: uuid.UUID = Field(foreign_key="user.id")
+    kind: str = Field(max_length=32)
+    object_id: int
+    deleted: bool = False
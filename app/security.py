@@ -1,9 +1,13 @@
+import asyncio
 import uuid
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import UTC, datetime, timedelta
 from typing import Annotated, Any
 
 import jwt
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from passlib.context import CryptContext
@@ -13,11 +17,20 @@ from sqlmodel import Session, select
 from app.api.deps import SessionDep
 from app.api.routes.constants import LOGIN_ROUTE_PREFIX
 from app.api.schemas.tokens import TokenPayload
+from app.cache import TTLCache
 from app.config import settings
 from app.models.tables import User
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt is deliberately slow, so hashing gets its own small pool. A burst of
+# logins then queues up here instead of taking up the event loop or the worker
+# threads that serve all other endpoints.
+password_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_MAX_WORKERS,
+    thread_name_prefix="password-hash",
+)
+
 
 def create_access_token(subject: str | Any, expires_delta: timedelta) -> str:
     """Create a new access token."""
@@ -40,13 +53,28 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def authenticate_user(session: Session, username: str, password: str) -> bool | User:
+async def run_in_password_hash_pool[R](func: Callable[..., R], *args: Any) -> R:
+    """Run a function that hashes or verifies passwords in the hashing pool."""
+    return await asyncio.wrap_future(password_hash_executor.submit(func, *args))
+
+
+async def authenticate_user(
+    session: Session,
+    username: str,
+    password: str,
+) -> bool | User:
     """Authenticate a user by username and password."""
     statement = select(User).where(User.username == username)
-    user = session.exec(statement).first()
+    user = await run_in_threadpool(lambda: session.exec(statement).first())
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    # Give the connection back to the pool while waiting for the hashing pool
+    await run_in_threadpool(session.close)
+    if not await run_in_password_hash_pool(
+        verify_password,
+        password,
+        user.hashed_password,
+    ):
         return False
     return user
 
@@ -56,9 +84,27 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{LOGIN_ROUTE_PREFIX}/token")
 
 TokenDep = Annotated[str, Depends(oauth2_scheme)]
 
+# Users that recently made an authenticated request, keyed by id. The cached
+# objects are detached copies, so they can be shared between sessions.
+user_cache: TTLCache[uuid.UUID, User] = TTLCache(
+    max_size=settings.USER_CACHE_MAX_SIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+)
+
+
+def invalidate_cached_user(user_id: uuid.UUID) -> None:
+    """Make sure the next request of a user reads the user from the database.
+
+    Call this whenever a user is deleted or one of its privileges changes.
+    """
+    user_cache.invalidate(user_id)
+
 
 def get_current_user(session: SessionDep, token: TokenDep) -> Any:
-    """Get the current user from the token."""
+    """Get the current user from the token.
+
+    Repeated requests of the same user are served from the user cache.
+    """
     try:
         payload = jwt.decode(
             token,
@@ -71,9 +117,12 @@ def get_current_user(session: SessionDep, token: TokenDep) -> Any:
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         ) from e
-    user = session.get(User, uuid.UUID(token_data.sub))
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user_id = uuid.UUID(token_data.sub)
+    if (user := user_cache.get(user_id)) is None:
+        if (db_user := session.get(User, user_id)) is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        user = User.model_validate(db_user)
+        user_cache.set(user_id, user)
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return user
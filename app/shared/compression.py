@@ -0,0 +1,43 @@
+"""Compression of the bodies of notes."""
+
+import zlib
+
+from app.shared.constants import BODY_COMPRESSION_LEVEL, BODY_COMPRESSION_MIN_BYTES
+
+
+def compress_body(body: str) -> tuple[str | None, bytes | None]:
+    """Get the plain and the compressed value to store a body as.
+
+    Bodies of at least ``BODY_COMPRESSION_MIN_BYTES`` are compressed with zlib,
+    unless that does not make them smaller. Exactly one value is not None.
+    """
+    data = body.encode()
+    if len(data) >= BODY_COMPRESSION_MIN_BYTES:
+        compressed = zlib.compress(data, BODY_COMPRESSION_LEVEL)
+        if len(compressed) < len(data):
+            return None, compressed
+    return body, None
+
+
+def decompress_body(plain: str | None, compressed: bytes | None) -> str | None:
+    """Get a body back from the values returned by ``compress_body``.
+
+    This is also registered as the SQL function ``decompress_body`` on SQLite
+    connections, which the full-text search index of notes relies on.
+    """
+    if compressed is None:
+        return plain
+    return zlib.decompress(compressed).decode()
+
+
+def preview_compressed_body(compressed: bytes | None, length: int) -> str | None:
+    """Get the start of a compressed body, at most ``length`` characters long.
+
+    Only as much of the body is decompressed as the preview needs. This is
+    registered as the SQL function ``preview_compressed_body`` on SQLite.
+    """
+    if compressed is None:
+        return None
+    # A character takes at most 4 bytes in UTF-8
+    data = zlib.decompressobj().decompress(compressed, 4 * length)
+    return data.decode(errors="ignore")[:length]
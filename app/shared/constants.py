@@ -4,10 +4,40 @@ MAX_NAME_LEN = 128
 # Text field
 MAX_TEXT_FIELD_LEN = 65536
 
-# endpoint defaults
-DEFAULT_SKIP = 0
-DEFAULT_LIMIT = None
+# pagination
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# filters
+MAX_FILTER_TAGS = 20
+
+# note bodies
+BODY_COMPRESSION_MIN_BYTES = 1024
+BODY_COMPRESSION_LEVEL = 6
+NOTE_PREVIEW_LENGTH = 160
+
+# partial updates
+MAX_BODY_EDITS = 100
+
+# bulk import and export
+IMPORT_CHUNK_SIZE = 500
+MAX_IMPORT_ERRORS = 100
+MAX_IMPORT_LINE_BYTES = 8 * MAX_TEXT_FIELD_LEN
+STREAM_BATCH_SIZE = 500
+
+# full-text search
+SEARCH_SNIPPET_TOKENS = 16
+SEARCH_TITLE_WEIGHT = 10.0
+SEARCH_BODY_WEIGHT = 1.0
+
+# response compression
+GZIP_COMPRESSION_LEVEL = 6
+BROTLI_COMPRESSION_QUALITY = 4
+ZSTD_COMPRESSION_LEVEL = 3
 
 # security
 MIN_PASSWORD_LEN = 8
 MAX_PASSWORD_LEN = 128
+
+# database migrations
+BACKFILL_BATCH_SIZE = 1000
@@ -1,7 +1,8 @@
 from sqlmodel import Session, select
 
 from app.config import settings
-from app.database import create_db_and_tables, engine
+from app.database import engine
+from app.migrations import check_schema_version
 from app.models.tables import User
 from app.security import get_password_hash
 
@@ -23,7 +24,7 @@ def create_first_superuser(session: Session) -> None:
 
 def startup() -> None:
     """Startup tasks to run when the application starts."""
-    create_db_and_tables()
+    check_schema_version(engine)
 
     with Session(engine) as session:
         create_first_superuser(session)
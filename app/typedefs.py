@@ -17,3 +17,11 @@ class LOGLevel(StrEnum):
     WARNING = "warning"
     ERROR = "error"
     CRITICAL = "critical"
+
+
+class ContentEncoding(StrEnum):
+    """Enumeration for content encodings that responses can be compressed with."""
+
+    GZIP = "gzip"
+    BROTLI = "br"
+    ZSTD = "zstd"
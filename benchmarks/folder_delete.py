@@ -0,0 +1,131 @@
+"""Time to delete a folder tree that contains 50k tagged notes.
+
+The set-based delete of the endpoint is compared with deleting the same tree
+through the ORM, which loads every note and its tags before deleting them one
+by one. Both start from an identical tree in a fresh transaction.
+
+Run with ``python -m benchmarks.folder_delete``.
+"""
+
+import uuid
+from datetime import timedelta
+
+from benchmarks.utils import configure_environment, timer
+
+configure_environment()
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.orm import selectinload  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+from app.crud import select_folder_subtree  # noqa: E402
+from app.database import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.tables import (  # noqa: E402
+    Folder,
+    Note,
+    NoteBody,
+    NoteTagLink,
+    Tag,
+    User,
+)
+from app.security import create_access_token  # noqa: E402
+
+NOTES = 50_000
+CHILD_FOLDERS = 10
+TAGS = 5
+
+
+def create_tree(owner_id: uuid.UUID) -> int:
+    """Create a folder with child folders and tagged notes, return its id."""
+    with Session(engine) as session:
+        root = Folder(name="root", owner_id=owner_id)
+        session.add(root)
+        session.flush()
+        children = [
+            Folder(name=f"child {i}", parent_id=root.id, owner_id=owner_id)
+            for i in range(CHILD_FOLDERS)
+        ]
+        tags = [
+            Tag(name=f"tag{i}", full_name=f"tag{i}-{root.id}", owner_id=owner_id)
+            for i in range(TAGS)
+        ]
+        session.add_all([*children, *tags])
+        session.flush()
+
+        folder_ids = [root.id, *(child.id for child in children)]
+        note_ids = session.scalars(
+            insert(Note).returning(Note.id, sort_by_parameter_order=True),
+            [
+                {
+                    "title": f"Note {i}",
+                    "folder_id": folder_ids[i % len(folder_ids)],
+                    "owner_id": owner_id,
+                }
+                for i in range(NOTES)
+            ],
+        ).all()
+        session.exec(
+            insert(NoteBody),
+            params=[
+                {"note_id": note_id, "plain": "Lorem ipsum " * 20}
+                for note_id in note_ids
+            ],
+        )
+        session.exec(
+            insert(NoteTagLink),
+            params=[
+                {"note_id": note_id, "tag_id": tags[i % TAGS].id}
+                for i, note_id in enumerate(note_ids)
+            ],
+        )
+        session.commit()
+        return root.id
+
+
+def delete_with_orm(folder_id: int, owner_id: uuid.UUID) -> None:
+    """Delete a folder tree by loading and deleting every object."""
+    with Session(engine) as session:
+        subtree = select(select_folder_subtree(folder_id, owner_id).c.id)
+        notes = session.exec(
+            select(Note)
+            .where(Note.folder_id.in_(subtree))
+            .options(selectinload(Note.tags)),
+        ).all()
+        for note in notes:
+            session.delete(note)
+        for folder in session.exec(select(Folder).where(Folder.id.in_(subtree))):
+            session.delete(folder)
+        session.commit()
+
+
+def main() -> None:
+    """Run the benchmark."""
+    with Session(engine) as session:
+        user = User(username="bench", email="bench@example.com", hashed_password="")
+        session.add(user)
+        session.commit()
+        owner_id = user.id
+
+    token = create_access_token(str(owner_id), expires_delta=timedelta(hours=1))
+    client = TestClient(app, headers={"Authorization": f"Bearer {token}"})
+
+    folder_id = create_tree(owner_id)
+    with timer() as elapsed:
+        response = client.delete(f"/folders/{folder_id}")
+    response.raise_for_status()
+    set_based = elapsed()
+
+    folder_id = create_tree(owner_id)
+    with timer() as elapsed:
+        delete_with_orm(folder_id, owner_id)
+    orm = elapsed()
+
+    print(f"delete {NOTES} notes in {CHILD_FOLDERS + 1} folders")  # noqa: T201
+    print(f"set-based endpoint:     {set_based:7.2f} s")  # noqa: T201
+    print(f"ORM, object by object:  {orm:7.2f} s")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
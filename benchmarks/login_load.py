@@ -0,0 +1,115 @@
+"""Latency of a regular endpoint while logins saturate password hashing.
+
+Run with ``python -m benchmarks.login_load``.
+"""
+
+import asyncio
+
+from benchmarks.utils import configure_environment, summarize, timer
+
+configure_environment()
+
+import httpx  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.database import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.tables import Note, NoteBody, User  # noqa: E402
+from app.security import get_password_hash  # noqa: E402
+
+USERNAME = "bench"
+PASSWORD = "Bench-password1!"  # noqa: S105
+NOTES = 200
+LIST_REQUESTS = 200
+CONCURRENT_LOGINS = 32
+
+
+def create_user_with_notes() -> None:
+    """Create the benchmark user with some notes."""
+    with Session(engine) as session:
+        user = User(
+            username=USERNAME,
+            email="bench@example.com",
+            hashed_password=get_password_hash(PASSWORD),
+        )
+        session.add(user)
+        # Notes have no relationship to their owner, so the unit of work does
+        # not know to insert the user first, which foreign keys require
+        session.flush()
+        session.add_all(
+            Note(
+                title=f"Note {i}",
+                content=NoteBody.from_body("Lorem ipsum " * 50),
+                owner_id=user.id,
+            )
+            for i in range(NOTES)
+        )
+        session.commit()
+
+
+async def login(client: httpx.AsyncClient) -> str:
+    """Log in as the benchmark user and return the access token."""
+    response = await client.post(
+        "/login/token",
+        data={"username": USERNAME, "password": PASSWORD},
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def list_notes(client: httpx.AsyncClient, token: str) -> list[float]:
+    """Request the first page of notes repeatedly and return the latencies."""
+    latencies = []
+    for _ in range(LIST_REQUESTS):
+        with timer() as elapsed:
+            response = await client.get(
+                "/notes/",
+                headers={"Authorization": f"Bearer {token}"},
+            )
+        response.raise_for_status()
+        latencies.append(elapsed())
+    return latencies
+
+
+async def keep_logging_in(client: httpx.AsyncClient, counter: list[int]) -> None:
+    """Log in over and over again until cancelled."""
+    while True:
+        await login(client)
+        counter[0] += 1
+
+
+async def main() -> None:
+    """Run the benchmark."""
+    async with app.router.lifespan_context(app):
+        create_user_with_notes()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport,
+            base_url="http://bench",
+        ) as client:
+            token = await login(client)
+            idle = await list_notes(client, token)
+
+            logins = [0]
+            login_tasks = [
+                asyncio.create_task(keep_logging_in(client, logins))
+                for _ in range(CONCURRENT_LOGINS)
+            ]
+            with timer() as elapsed:
+                loaded = await list_notes(client, token)
+            for task in login_tasks:
+                task.cancel()
+            await asyncio.gather(*login_tasks, return_exceptions=True)
+
+    print(f"password hashing workers: {settings.PASSWORD_HASH_MAX_WORKERS}")  # noqa: T201
+    print(f"GET /notes/ idle:             {summarize(idle)}")  # noqa: T201
+    print(  # noqa: T201
+        f"GET /notes/ during logins:    {summarize(loaded)}  "
+        f"({CONCURRENT_LOGINS} concurrent clients, "
+        f"{logins[0] / elapsed():.1f} logins/s)",
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,179 @@
+"""Database size and read latency of notes before and after moving their bodies.
+
+The same notes are stored in the schema of revision 0006, with the bodies in
+the note table, and after migrating them to head, with the bodies in their own
+table and long bodies compressed. For both, the size of the database and of
+the note table is reported with the latency of reading pages of note metadata,
+as list endpoints do for entity tags, and of reading single bodies. The
+generated bodies use a small vocabulary, so they compress better than most
+real notes.
+
+Run with ``python -m benchmarks.note_storage``.
+"""
+
+import random
+import uuid
+from collections.abc import Callable
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+
+from benchmarks.utils import ALEMBIC_INI, configure_environment, summarize, timer
+
+database = configure_environment()
+
+from sqlalchemy import Connection, text  # noqa: E402
+
+from app.database import engine  # noqa: E402
+from app.shared.compression import decompress_body  # noqa: E402
+
+NOTES = 20_000
+PAGE_SIZE = 50
+BODY_READS = 2_000
+WORDS = [
+    "the", "and", "meeting", "deploy", "release", "notes", "todo", "review",
+    "database", "query", "index", "cache", "client", "server", "sync", "folder",
+    "tag", "search", "follow", "up", "with", "team", "about", "next", "week",
+]  # fmt: skip
+
+METADATA_PAGE = text(
+    "SELECT id, version FROM note WHERE owner_id = :owner_id AND id > :after "
+    "ORDER BY id LIMIT :limit",
+)
+OLD_BODY = text("SELECT body FROM note WHERE id = :id")
+NEW_BODY = text("SELECT plain, compressed FROM notebody WHERE note_id = :id")
+
+
+def make_body(rng: random.Random) -> str:
+    """Make a body of prose-like text, most short and some long."""
+    length = min(int(rng.lognormvariate(5, 1.5)), 8_000)
+    lines = []
+    for _ in range(max(length // 12, 1)):
+        words = rng.choices(WORDS, k=12)
+        lines.append(" ".join(words) + ("\n" if rng.random() < 0.1 else ""))  # noqa: PLR2004
+    return " ".join(lines)
+
+
+def create_notes(connection: Connection, owner_id: uuid.UUID) -> None:
+    """Store the notes in the schema of revision 0006."""
+    rng = random.Random(42)  # noqa: S311 - reproducible test data
+    connection.execute(
+        text(
+            "INSERT INTO user (id, username, email, hashed_password, is_active, "
+            "is_superuser) VALUES (:id, 'bench', 'bench@example.com', '', 1, 0)",
+        ),
+        {"id": owner_id.hex},
+    )
+    connection.execute(
+        text(
+            "INSERT INTO note (title, body, version, owner_id) "
+            "VALUES (:title, :body, 1, :owner_id)",
+        ),
+        [
+            {"title": f"Note {i}", "body": make_body(rng), "owner_id": owner_id.hex}
+            for i in range(NOTES)
+        ],
+    )
+    connection.commit()
+
+
+def compact(connection: Connection) -> None:
+    """Rewrite the database without free pages and merge the log into it."""
+    connection.exec_driver_sql("VACUUM")
+    connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def table_sizes(connection: Connection) -> dict[str, int]:
+    """Get the bytes used by every table and index."""
+    statement = text("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name")
+    return dict(connection.execute(statement).tuples().all())
+
+
+def read_metadata(connection: Connection, owner_id: uuid.UUID) -> list[float]:
+    """Read all pages of note ids and versions, returning the page latencies."""
+    latencies = []
+    after = 0
+    while True:
+        with timer() as elapsed:
+            rows = connection.execute(
+                METADATA_PAGE,
+                {"owner_id": owner_id.hex, "after": after, "limit": PAGE_SIZE},
+            ).all()
+        latencies.append(elapsed())
+        if not rows:
+            return latencies
+        after = rows[-1].id
+
+
+def read_bodies(
+    connection: Connection,
+    read_body: Callable[[Connection, int], str],
+) -> list[float]:
+    """Read random bodies one by one, returning their latencies."""
+    rng = random.Random(7)  # noqa: S311 - reproducible test data
+    latencies = []
+    for _ in range(BODY_READS):
+        note_id = rng.randint(1, NOTES)
+        with timer() as elapsed:
+            read_body(connection, note_id)
+        latencies.append(elapsed())
+    return latencies
+
+
+def read_old_body(connection: Connection, note_id: int) -> str:
+    """Read a body stored in the note table."""
+    return connection.execute(OLD_BODY, {"id": note_id}).scalar_one()
+
+
+def read_new_body(connection: Connection, note_id: int) -> str:
+    """Read a body stored in its own table, decompressing it if needed."""
+    row = connection.execute(NEW_BODY, {"id": note_id}).one()
+    return decompress_body(row.plain, row.compressed) or ""
+
+
+def report(
+    label: str,
+    owner_id: uuid.UUID,
+    body_tables: tuple[str, ...],
+    read_body: Callable[[Connection, int], str],
+) -> None:
+    """Print the sizes and read latencies of the current schema."""
+    with engine.connect() as connection:
+        compact(connection)
+        sizes = table_sizes(connection)
+        metadata = read_metadata(connection, owner_id)
+        bodies = read_bodies(connection, read_body)
+
+    note_size = sizes["note"]
+    body_size = sum(sizes[table] for table in body_tables)
+    print(label)  # noqa: T201
+    print(f"  database file:        {Path(database).stat().st_size / 2**20:7.2f} MiB")  # noqa: T201
+    print(f"  note table:           {note_size / 2**20:7.2f} MiB")  # noqa: T201
+    print(f"  note and body tables: {body_size / 2**20:7.2f} MiB")  # noqa: T201
+    print(f"  metadata page:        {summarize(metadata)}")  # noqa: T201
+    print(f"  single body:          {summarize(bodies)}")  # noqa: T201
+
+
+def main() -> None:
+    """Run the benchmark."""
+    config = Config(ALEMBIC_INI)
+    command.downgrade(config, "0006")
+
+    owner_id = uuid.uuid4()
+    with engine.connect() as connection:
+        create_notes(connection, owner_id)
+
+    print(f"{NOTES} notes")  # noqa: T201
+    report("bodies in the note table", owner_id, ("note",), read_old_body)
+
+    engine.dispose()
+    with timer() as elapsed:
+        command.upgrade(config, "head")
+    print(f"migration:              {elapsed():7.2f} s")  # noqa: T201
+
+    report("bodies in their own table", owner_id, ("note", "notebody"), read_new_body)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""CPU time spent and bytes saved by compressing typical note responses.
+
+Every available encoding compresses a single note, a page of notes, a page of
+note summaries and an export of notes, streamed in chunks of
+``STREAM_BATCH_SIZE`` notes. The encoders of the compression middleware are
+used directly, with a flush after every chunk of the export as the middleware
+does. The generated bodies use a small vocabulary, so they compress better
+than most real notes.
+
+Run with ``python -m benchmarks.response_compression``.
+"""
+
+import random
+import time
+from collections.abc import Sequence
+
+from benchmarks.utils import configure_environment
+
+configure_environment()
+
+from app.api.compression import ENCODERS  # noqa: E402
+from app.api.schemas.notes import NotePublic, NoteSummary  # noqa: E402
+from app.api.schemas.pagination import Page  # noqa: E402
+from app.shared.constants import NOTE_PREVIEW_LENGTH, STREAM_BATCH_SIZE  # noqa: E402
+from app.typedefs import ContentEncoding  # noqa: E402
+
+REPEATS = 20
+PAGE_SIZE = 50
+SUMMARY_PAGE_SIZE = 200
+EXPORT_NOTES = 5_000
+WORDS = [
+    "the", "and", "meeting", "deploy", "release", "notes", "todo", "review",
+    "database", "query", "index", "cache", "client", "server", "sync", "folder",
+    "tag", "search", "follow", "up", "with", "team", "about", "next", "week",
+]  # fmt: skip
+
+
+def make_notes(count: int) -> list[NotePublic]:
+    """Make notes with prose-like bodies, most short and some long."""
+    rng = random.Random(42)  # noqa: S311 - reproducible test data
+    notes = []
+    for i in range(count):
+        length = min(int(rng.lognormvariate(5, 1.5)), 8_000)
+        words = rng.choices(WORDS, k=max(length // 6, 1))
+        notes.append(
+            NotePublic(
+                id=i + 1,
+                version=rng.randint(1, 20),
+                title=f"Note {i + 1}",
+                body=" ".join(words),
+                tag_ids=sorted(rng.sample(range(1, 30), k=rng.randint(0, 4))),
+                folder_id=rng.choice([None, rng.randint(1, 50)]),
+            ),
+        )
+    return notes
+
+
+def make_payloads() -> dict[str, list[bytes]]:
+    """Make the bodies of typical responses, split into the chunks they are sent in."""
+    notes = make_notes(EXPORT_NOTES)
+    summaries = [
+        NoteSummary(
+            **note.model_dump(exclude={"body"}),
+            preview=note.body[:NOTE_PREVIEW_LENGTH],
+        )
+        for note in notes[:SUMMARY_PAGE_SIZE]
+    ]
+    lines = [note.model_dump_json() + "\n" for note in notes]
+    return {
+        "single note": [notes[0].model_dump_json().encode()],
+        f"page of {PAGE_SIZE}": [
+            Page[NotePublic](items=notes[:PAGE_SIZE], next_cursor="NTA=")
+            .model_dump_json()
+            .encode(),
+        ],
+        f"{SUMMARY_PAGE_SIZE} summaries": [
+            Page[NoteSummary](items=summaries, next_cursor="MjAw")
+            .model_dump_json()
+            .encode(),
+        ],
+        f"export of {EXPORT_NOTES}": [
+            "".join(lines[i : i + STREAM_BATCH_SIZE]).encode()
+            for i in range(0, len(lines), STREAM_BATCH_SIZE)
+        ],
+    }
+
+
+def compress(encoding: ContentEncoding, chunks: Sequence[bytes]) -> tuple[int, float]:
+    """Compress chunks like the middleware, return the size and CPU seconds."""
+    start = time.process_time()
+    for _ in range(REPEATS):
+        encoder = ENCODERS[encoding]()
+        size = 0
+        for chunk in chunks[:-1]:
+            size += len(encoder.encode(chunk)) + len(encoder.flush())
+        size += len(encoder.encode(chunks[-1])) + len(encoder.finish())
+    return size, (time.process_time() - start) / REPEATS
+
+
+def main() -> None:
+    """Run the benchmark."""
+    print(f"{'payload':<16} {'encoding':<8} {'bytes':>10} {'saved':>6} {'CPU':>10}")  # noqa: T201
+    for label, chunks in make_payloads().items():
+        original = sum(len(chunk) for chunk in chunks)
+        print(f"{label:<16} {'identity':<8} {original:>10}")  # noqa: T201
+        for encoding in ENCODERS:
+            size, cpu = compress(encoding, chunks)
+            print(  # noqa: T201
+                f"{'':<16} {encoding:<8} {size:>10} {1 - size / original:6.1%} "
+                f"{cpu * 1000:7.2f} ms",
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""CPU time per request saved by sending prevalidated response models.
+
+The same endpoint, returning a ready made page of notes, is mounted once with
+the regular FastAPI route and once with ``PrevalidatedRoute``. The requests
+are sent straight to the ASGI app, so the numbers only contain the work done
+by FastAPI and the serializer.
+
+Run with ``python -m benchmarks.response_serialization``.
+"""
+
+import asyncio
+import time
+from typing import Any
+
+from benchmarks.utils import configure_environment
+
+configure_environment()
+
+from fastapi import APIRouter, FastAPI  # noqa: E402
+from fastapi.routing import APIRoute  # noqa: E402
+from starlette.types import Message  # noqa: E402
+
+from app.api.routing import PrevalidatedRoute  # noqa: E402
+from app.api.schemas.notes import NotePublic  # noqa: E402
+from app.api.schemas.pagination import Page  # noqa: E402
+
+REQUESTS = 2_000
+PAGE_SIZES = (1, 50, 500)
+
+
+def create_app(route_class: type[APIRoute], page: Page[NotePublic]) -> FastAPI:
+    """Create an app with a single endpoint that returns the given page."""
+    router = APIRouter(route_class=route_class)
+
+    @router.get("/notes", response_model=Page[NotePublic])
+    async def get_notes() -> Any:
+        return page
+
+    app = FastAPI()
+    app.include_router(router)
+    return app
+
+
+async def cpu_time_per_request(app: FastAPI) -> float:
+    """Send requests to the app and return the CPU time per request in seconds."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/notes",
+        "raw_path": b"/notes",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [],
+        "server": ("bench", 80),
+        "client": ("bench", 1234),
+    }
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Message) -> None:
+        del message
+
+    start = time.process_time()
+    for _ in range(REQUESTS):
+        await app(scope, receive, send)
+    return (time.process_time() - start) / REQUESTS
+
+
+async def main() -> None:
+    """Run the benchmark."""
+    print(f"{'notes':>6}  {'regular':>10}  {'prevalidated':>12}  saved")  # noqa: T201
+    for page_size in PAGE_SIZES:
+        page = Page[NotePublic](
+            items=[
+                NotePublic(
+                    id=i,
+                    version=1,
+                    title=f"Note {i}",
+                    body="Lorem ipsum " * 50,
+                    tag_ids=[1, 2, 3],
+                    folder_id=None,
+                )
+                for i in range(page_size)
+            ],
+            next_cursor="NTA=",
+        )
+        regular = await cpu_time_per_request(create_app(APIRoute, page))
+        prevalidated = await cpu_time_per_request(
+            create_app(PrevalidatedRoute, page),
+        )
+        print(  # noqa: T201
+            f"{page_size:>6}  {regular * 1e6:8.1f} µs  {prevalidated * 1e6:10.1f} µs  "
+            f"{1 - prevalidated / regular:5.0%}",
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
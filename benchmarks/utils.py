@@ -0,0 +1,56 @@
+import os
+import secrets
+import statistics
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+
+ALEMBIC_INI = Path(__file__).parent.parent / "alembic.ini"
+
+
+def configure_environment() -> Path:
+    """Point the application at a fresh, migrated SQLite database.
+
+    This must be called before anything from ``app`` is imported, because the
+    settings and the engine are created at import time. Settings that are
+    already present in the environment are kept, except for the database.
+    Returns the path of the database file.
+    """
+    database = Path(tempfile.mkdtemp(prefix="notes-bench-")) / "notes.db"
+    os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+    os.environ.setdefault("ENVIRONMENT", "development")
+    os.environ.setdefault("LOG_LEVEL", "warning")
+    os.environ.setdefault("SECRET_KEY", secrets.token_hex(32))
+    os.environ.setdefault("FIRST_SUPERUSER_USERNAME", "admin")
+    os.environ.setdefault("FIRST_SUPERUSER_PASSWORD", secrets.token_hex(16))
+    os.environ.setdefault("FIRST_SUPERUSER_EMAIL", "admin@example.com")
+    command.upgrade(Config(ALEMBIC_INI), "head")
+    return database
+
+
+@contextmanager
+def timer() -> Iterator[Callable[[], float]]:
+    """Measure the wall clock time of a block in seconds."""
+    start = time.perf_counter()
+    end = None
+
+    def elapsed() -> float:
+        return (end or time.perf_counter()) - start
+
+    yield elapsed
+    end = time.perf_counter()
+
+
+def summarize(latencies: list[float]) -> str:
+    """Format the p50, p95 and max of latencies given in seconds."""
+    quantiles = statistics.quantiles(latencies, n=20)
+    return (
+        f"p50 {statistics.median(latencies) * 1000:7.2f} ms  "
+        f"p95 {quantiles[-1] * 1000:7.2f} ms  "
+        f"max {max(latencies) * 1000:7.2f} ms"
+    )
@@ -0,0 +1,180 @@
+from typing import Any
+
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.api.routes.constants import (
+    FOLDER_ROUTE_PREFIX,
+    NOTES_ROUTE_PREFIX,
+    TAG_ROUTE_PREFIX,
+)
+from app.models.tables import User
+from tests.models.factories import UserFactory
+from tests.utils import get_auth_header_for_user
+
+CHANGES_ROUTE = f"{NOTES_ROUTE_PREFIX}/changes"
+
+
+def get_changes(client: TestClient, **params: Any) -> dict[str, Any]:
+    """Get the changes for the client and check that the request succeeded."""
+    response = client.get(CHANGES_ROUTE, params=params)
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def create_note(client: TestClient, **fields: Any) -> None:
+    """Create a note through the API."""
+    body = {"title": "Note", "body": "Body", "tag_ids": []} | fields
+    response = client.post(f"{NOTES_ROUTE_PREFIX}/", json=body)
+    assert response.status_code == status.HTTP_201_CREATED
+
+
+def create_folder(client: TestClient, user: User, name: str) -> None:
+    """Create a folder through the API."""
+    body = {"name": name, "owner_id": str(user.id)}
+    response = client.post(f"{FOLDER_ROUTE_PREFIX}/", json=body)
+    assert response.status_code == status.HTTP_201_CREATED
+
+
+def create_tag(client: TestClient, full_name: str) -> None:
+    """Create a tag through the API."""
+    response = client.post(f"{TAG_ROUTE_PREFIX}/", json={"full_name": full_name})
+    assert response.status_code == status.HTTP_201_CREATED
+
+
+def test_get_changes_full_sync(test_user: User, user_client: TestClient) -> None:
+    """Test that the first sync returns all objects."""
+    # GIVEN a folder, a tag and a note created by the user
+    create_folder(user_client, test_user, "folder")
+    create_tag(user_client, "work")
+    create_note(user_client, title="First")
+
+    # WHEN the client syncs without a token
+    changes = get_changes(user_client)
+
+    # THEN all objects are returned
+    assert [folder["name"] for folder in changes["folders"]] == ["folder"]
+    assert [tag["full_name"] for tag in changes["tags"]] == ["work"]
+    assert [note["title"] for note in changes["notes"]] == ["First"]
+
+    # AND nothing was deleted and there are no more changes
+    assert changes["deleted_note_ids"] == []
+    assert changes["deleted_folder_ids"] == []
+    assert changes["deleted_tag_ids"] == []
+    assert changes["has_more"] is False
+
+
+def test_get_changes_since_token(test_user: User, user_client: TestClient) -> None:
+    """Test that a sync with a token only returns the changes after it."""
+    # GIVEN two notes and a folder that the client has synced
+    create_note(user_client, title="Unchanged")
+    create_note(user_client, title="Changed")
+    create_folder(user_client, test_user, "folder")
+    changes = get_changes(user_client)
+    note_id = changes["notes"][1]["id"]
+    folder_id = changes["folders"][0]["id"]
+
+    # AND one note is updated and the folder is deleted afterwards
+    response = user_client.put(
+        f"{NOTES_ROUTE_PREFIX}/{note_id}",
+        json={"title": "Updated", "body": "Body", "tag_ids": []},
+    )
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    response = user_client.delete(f"{FOLDER_ROUTE_PREFIX}/{folder_id}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    # WHEN the client syncs with its token
+    changes = get_changes(user_client, since=changes["token"])
+
+    # THEN only the updated note and the deleted folder are returned
+    assert [note["title"] for note in changes["notes"]] == ["Updated"]
+    assert changes["folders"] == []
+    assert changes["deleted_folder_ids"] == [folder_id]
+
+    # AND syncing again with the new token returns nothing and the same token
+    again = get_changes(user_client, since=changes["token"])
+    assert again["notes"] == []
+    assert again["deleted_folder_ids"] == []
+    assert again["token"] == changes["token"]
+
+
+def test_get_changes_in_pages(user_client: TestClient) -> None:
+    """Test that many changes are returned in several responses."""
+    # GIVEN three notes
+    for title in ("One", "Two", "Three"):
+        create_note(user_client, title=title)
+
+    # WHEN the client syncs with a limit of two changes
+    first = get_changes(user_client, limit=2)
+    second = get_changes(user_client, since=first["token"], limit=2)
+
+    # THEN the first response has two notes and tells there are more
+    assert [note["title"] for note in first["notes"]] == ["One", "Two"]
+    assert first["has_more"] is True
+
+    # AND the second response has the last note
+    assert [note["title"] for note in second["notes"]] == ["Three"]
+    assert second["has_more"] is False
+
+
+def test_get_changes_deleted_note_and_tag(
+    user_client: TestClient,
+) -> None:
+    """Test that deleting notes and tags returns tombstones and changed objects."""
+    # GIVEN a tag with a child tag, a note with the tag and a note to delete
+    create_tag(user_client, "work/project")
+    tags = get_changes(user_client)["tags"]
+    tag_id, child_id = (tag["id"] for tag in tags)
+    create_note(user_client, title="Tagged", tag_ids=[tag_id])
+    create_note(user_client, title="Deleted")
+    changes = get_changes(user_client)
+    tagged_id, deleted_id = (note["id"] for note in changes["notes"])
+
+    # WHEN the tag and the second note are deleted
+    user_client.delete(f"{TAG_ROUTE_PREFIX}/{tag_id}")
+    user_client.delete(f"{NOTES_ROUTE_PREFIX}/{deleted_id}")
+    changes = get_changes(user_client, since=changes["token"])
+
+    # THEN the deleted tag and note are returned by id
+    assert changes["deleted_tag_ids"] == [tag_id]
+    assert changes["deleted_note_ids"] == [deleted_id]
+
+    # AND the child tag and the note of the tag are returned as changed
+    assert [(tag["id"], tag["full_name"]) for tag in changes["tags"]] == [
+        (child_id, "project"),
+    ]
+    assert [(note["id"], note["tag_ids"]) for note in changes["notes"]] == [
+        (tagged_id, []),
+    ]
+
+
+def test_get_changes_of_other_user(
+    user_client: TestClient,
+    user_factory: UserFactory,
+) -> None:
+    """Test that a user does not get the changes of another user."""
+    # GIVEN a note of another user
+    other_user = user_factory.create()
+    headers = get_auth_header_for_user(other_user.id)
+    response = user_client.post(
+        f"{NOTES_ROUTE_PREFIX}/",
+        json={"title": "Other", "body": "Body", "tag_ids": []},
+        headers=headers,
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+
+    # WHEN the current user syncs
+    changes = get_changes(user_client)
+
+    # THEN the note is not returned
+    assert changes["notes"] == []
+
+
+def test_get_changes_invalid_token(user_client: TestClient) -> None:
+    """Test that an invalid sync token is rejected."""
+    # GIVEN a token that was not returned by the API
+    # WHEN the client syncs with it
+    response = user_client.get(CHANGES_ROUTE, params={"since": "not a token"})
+
+    # THEN a bad request error is returned
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,253 @@
+import gzip
+import json
+from collections.abc import Iterator
+
+import pytest
+from fastapi import FastAPI, status
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.api.compression import ENCODERS, CompressionMiddleware, select_encoding
+from app.api.conditional import is_not_modified
+from app.api.routes.constants import NOTES_ROUTE_PREFIX
+from app.models.tables import User
+from app.typedefs import ContentEncoding
+from tests.models.factories import NoteFactory
+
+MINIMUM_SIZE = 100
+LARGE_BODY = json.dumps([{"title": f"Note {i}", "body": "Lorem"} for i in range(50)])
+
+
+@pytest.fixture(name="compression_client")
+def compression_client_fixture() -> TestClient:
+    """Fixture for a client of an app that compresses its responses."""
+    app = FastAPI()
+    app.add_middleware(
+        CompressionMiddleware,
+        encodings=list(ENCODERS),
+        minimum_size=MINIMUM_SIZE,
+    )
+
+    @app.get("/large")
+    def get_large() -> Response:
+        return Response(LARGE_BODY, media_type="application/json")
+
+    @app.get("/small")
+    def get_small() -> Response:
+        return Response('{"title": "Note"}', media_type="application/json")
+
+    @app.get("/stream")
+    def get_stream() -> StreamingResponse:
+        def lines() -> Iterator[str]:
+            for i in range(50):
+                yield json.dumps({"title": f"Note {i}"}) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.get("/etag")
+    def get_etag(etag: str) -> Response:
+        return Response(
+            LARGE_BODY,
+            media_type="application/json",
+            headers={"ETag": etag},
+        )
+
+    @app.get("/encoded")
+    def get_encoded() -> Response:
+        return Response(
+            gzip.compress(LARGE_BODY.encode()),
+            media_type="application/json",
+            headers={"Content-Encoding": "gzip"},
+        )
+
+    @app.get("/binary")
+    def get_binary() -> Response:
+        return Response(b"\x00" * 1000, media_type="image/png")
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("encoding", list(ENCODERS))
+@pytest.mark.parametrize("path", ["/large", "/stream"])
+def test_response_is_compressed(
+    encoding: ContentEncoding,
+    path: str,
+    compression_client: TestClient,
+) -> None:
+    """Test that large and streamed responses are compressed."""
+    # GIVEN a client that accepts an encoding
+    # WHEN it requests a large response
+    response = compression_client.get(path, headers={"Accept-Encoding": encoding})
+
+    # THEN the response is compressed with the encoding
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Encoding"] == encoding
+    assert ("Content-Length" in response.headers) == (path == "/large")
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.num_bytes_downloaded < len(response.content)
+
+    # AND it decodes to the original body
+    if path == "/large":
+        assert response.text == LARGE_BODY
+    else:
+        assert len(response.text.splitlines()) == 50  # noqa: PLR2004
+
+
+@pytest.mark.parametrize(
+    ("path", "accept_encoding", "content_encoding"),
+    [
+        pytest.param("/small", "gzip", None, id="below minimum size"),
+        pytest.param("/large", "identity", None, id="not accepted"),
+        pytest.param("/large", "gzip;q=0, *;q=0", None, id="refused"),
+        pytest.param("/encoded", "gzip, br, zstd", "gzip", id="already encoded"),
+        pytest.param("/binary", "gzip", None, id="binary"),
+    ],
+)
+def test_response_is_not_compressed(
+    path: str,
+    accept_encoding: str,
+    content_encoding: str | None,
+    compression_client: TestClient,
+) -> None:
+    """Test that responses are sent as they are if compression does not fit."""
+    # GIVEN a response that should not be compressed
+    # WHEN the client requests it
+    response = compression_client.get(
+        path,
+        headers={"Accept-Encoding": accept_encoding},
+    )
+
+    # THEN it is not compressed by the middleware
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers.get("Content-Encoding") == content_encoding
+    assert int(response.headers["Content-Length"]) == response.num_bytes_downloaded
+
+
+@pytest.mark.parametrize("encoding", list(ENCODERS))
+@pytest.mark.parametrize("etag", ['"5"', 'W/"5"'])
+def test_compressed_response_has_own_etag(
+    encoding: ContentEncoding,
+    etag: str,
+    compression_client: TestClient,
+) -> None:
+    """Test that compressed responses get entity tags of their own."""
+    # GIVEN a response with an entity tag
+    # WHEN it is requested compressed and uncompressed
+    compressed = compression_client.get(
+        "/etag",
+        params={"etag": etag},
+        headers={"Accept-Encoding": encoding},
+    )
+    uncompressed = compression_client.get(
+        "/etag",
+        params={"etag": etag},
+        headers={"Accept-Encoding": "identity"},
+    )
+
+    # THEN the compressed one has the tag with the encoding appended
+    assert compressed.headers["ETag"] == etag.removesuffix('"') + f'-{encoding}"'
+    assert uncompressed.headers["ETag"] == etag
+
+    # AND both match the tag of the resource, but not of another version
+    for response in (compressed, uncompressed):
+        assert is_not_modified(response.headers["ETag"], '"5"')
+        assert not is_not_modified(response.headers["ETag"], '"6"')
+
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "expected"),
+    [
+        ("", None),
+        ("gzip", ContentEncoding.GZIP),
+        ("gzip, br", ContentEncoding.BROTLI),
+        ("GZIP;q=1.0, br;q=0.5", ContentEncoding.GZIP),
+        ("*", ContentEncoding.BROTLI),
+        ("br;q=0, *", ContentEncoding.GZIP),
+        ("gzip;q=0, *;q=0", None),
+        ("gzip;q=invalid", None),
+        ("deflate", None),
+    ],
+)
+def test_select_encoding(
+    accept_encoding: str,
+    expected: ContentEncoding | None,
+) -> None:
+    """Test that the encoding is negotiated with the Accept-Encoding header."""
+    # GIVEN an Accept-Encoding header and a server that prefers brotli to gzip
+    encodings = [ContentEncoding.BROTLI, ContentEncoding.GZIP]
+
+    # WHEN the encoding is selected
+    # THEN the best encoding for both is selected
+    assert select_encoding(accept_encoding, encodings) == expected
+
+
+def test_export_is_compressed(
+    note_factory: NoteFactory,
+    test_user: User,
+    user_client: TestClient,
+) -> None:
+    """Test that the notes export is streamed compressed."""
+    # GIVEN many notes
+    note_factory.create_batch(20, owner_id=test_user.id)
+
+    # WHEN the client exports them
+    response = user_client.get(
+        f"{NOTES_ROUTE_PREFIX}/export",
+        headers={"Accept-Encoding": "gzip"},
+    )
+
+    # THEN the export is compressed
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert len(response.text.splitlines()) == 20  # noqa: PLR2004
+
+
+def test_unavailable_encoding_is_rejected() -> None:
+    """Test that configuring an encoding without its package fails early."""
+    # GIVEN an encoding whose package is not installed
+    missing = [encoding for encoding in ContentEncoding if encoding not in ENCODERS]
+    if not missing:
+        pytest.skip("All optional compression packages are installed.")
+
+    # WHEN the middleware is created with it
+    # THEN an error explains what is missing
+    with pytest.raises(RuntimeError, match="optional compression dependencies"):
+        CompressionMiddleware(PlainTextResponse(""), missing, MINIMUM_SIZE)
+
+
+def test_compressed_note_conditional_requests(
+    note_factory: NoteFactory,
+    test_user: User,
+    user_client: TestClient,
+) -> None:
+    """Test that the entity tag of a compressed note works in conditional requests."""
+    # GIVEN a note that is large enough to be compressed
+    note = note_factory.create(owner_id=test_user.id, body="Lorem ipsum " * 200)
+    headers = {"Accept-Encoding": "gzip"}
+
+    # WHEN the client reads it compressed
+    response = user_client.get(f"{NOTES_ROUTE_PREFIX}/{note.id}", headers=headers)
+
+    # THEN the entity tag names the encoding
+    assert response.headers["Content-Encoding"] == "gzip"
+    etag = response.headers["ETag"]
+    assert etag == '"1-gzip"'
+
+    # AND the client's copy is current with that tag
+    response = user_client.get(
+        f"{NOTES_ROUTE_PREFIX}/{note.id}",
+        headers=headers | {"If-None-Match": etag},
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # AND the 304 names the same entity tag and varies by encoding
+    assert response.headers["ETag"] == etag
+    assert response.headers["Vary"] == "Accept-Encoding"
+
+    # AND it can update the version it read with that tag
+    response = user_client.put(
+        f"{NOTES_ROUTE_PREFIX}/{note.id}",
+        json={"title": "Updated", "body": "Updated body", "tag_ids": []},
+        headers={"If-Match": etag},
+    )
+    assert response.status_code == status.HTTP_204_NO_CONTENT
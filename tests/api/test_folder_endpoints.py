@@ -6,8 +6,10 @@ from fastapi.testclient import TestClient
 from sqlmodel import Session, select
 
 from app.api.routes.constants import FOLDER_ROUTE_PREFIX
-from app.models.tables import Folder, User
-from tests.models.factories import FolderFactory
+from app.models.tables import Change, Folder, Note, NoteTagLink, User
+from tests.models.factories import FolderFactory, NoteFactory, TagFactory
+from tests.test_config import engine
+from tests.utils import count_queries
 
 
 def test_get_folder_by_id(
@@ -47,13 +49,168 @@ def test_get_all_folders(
     assert response.status_code == status.HTTP_200_OK
 
     # AND the response contains all the folders
-    response_data = response.json()
+    response_data = response.json()["items"]
     assert len(response_data) == len(folders)
     for folder, response_folder in zip(folders, response_data, strict=False):
         assert response_folder["id"] == folder.id
         assert response_folder["name"] == folder.name
 
 
+def test_stream_all_folders(
+    folder_factory: FolderFactory,
+    test_user: User,
+    user_client: TestClient,
+) -> None:
+    """Test streaming all folders as a single JSON array."""
+    # GIVEN multiple folders in the database
+    folders = folder_factory.create_batch(3, owner_id=test_user.id)
+
+    # WHEN the client requests the folders as a stream
+    response = user_client.get(f"{FOLDER_ROUTE_PREFIX}/", params={"stream": True})
+
+    # THEN the response is a JSON array with all the folders
+    assert response.status_code == status.HTTP_200_OK
+    response_data = response.json()
+    assert [folder["id"] for folder in response_data] == [
+        folder.id for folder in folders
+    ]
+
+
+def test_get_folder_not_modified(
+    folder_factory: FolderFactory,
+    test_user: User,
+    user_client: TestClient,
+) -> None:
+    """Test that a folder the client already has is not sent again."""
+    # GIVEN a folder the client has read before
+    folder = folder_factory.create(owner_id=test_user.id)
+    response = user_client.get(f"{FOLDER_ROUTE_PREFIX}/{folder.id}")
+    etag = response.headers["ETag"]
+
+    # WHEN the client reads the folder and the page of folders with entity tags
+    folder_response = user_client.get(
+        f"{FOLDER_ROUTE_PREFIX}/{folder.id}",
+        headers={"If-None-Match": etag},
+    )
+    page_etag = user_client.get(f"{FOLDER_ROUTE_PREFIX}/").headers["ETag"]
+    page_response = user_client.get(
+        f"{FOLDER_ROUTE_PREFIX}/",
+        headers={"If-None-Match": page_etag},
+    )
+
+    # THEN neither is modified
+    assert folder_response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert page_response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+def test_get_folder_tree(
+    folder_factory: FolderFactory,
+    test_user: User,
+    user: User,
+    user_client: TestClient,
+) -> None:
+    """Test retrieving a folder with all of its descendants in one query."""
+    # GIVEN a folder with a child and a grandchild
+    root = folder_factory.create(owner_id=test_user.id)
+    child = folder_factory.create(owner_id=test_user.id, parent_id=root.id)
+    grandchild = folder_factory.create(owner_id=test_user.id, parent_id=child.id)
+
+    # AND a folder outside of it and a child folder of another user
+    folder_factory.create(owner_id=test_user.id)
+    folder_factory.create(owner_id=user.id, parent_id=root.id)
+
+    # AND a client whose user is already cached by an earlier request
+    user_client.get(f"{FOLDER_ROUTE_PREFIX}/")
+
+    # WHEN the client requests the tree of the folder
+    with count_queries(engine) as statements:
+        response = user_client.get(f"{FOLDER_ROUTE_PREFIX}/{root.id}/tree")
+
+    # THEN the folder and its descendants of the user are returned
+    assert response.status_code == status.HTTP_200_OK
+    folders = response.json()["folders"]
+    assert [folder["id"] for folder in folders] == [root.id, child.id, grandchild.id]
+    assert [folder["parent_id"] for folder in folders] == [None, root.id, child.id]
+
+    # AND they are read in a single query
+    assert len(statements) == 1
+
+
+def test_get_folder_tree_deep(
+    folder_factory: FolderFactory,
+    test_user: User,
+    user_client: TestClient,
+) -> None:
+    """Test retrieving a very deep folder hierarchy."""
+    # GIVEN a chain of nested folders
+    depth = 2000
+    root = parent = folder_factory.create(owner_id=test_user.id)
+    for _ in range(depth - 1):
+        parent = folder_factory.create(owner_id=test_user.id, parent_id=parent.id)
+
+    # WHEN the client requests the tree of the outermost folder
+    response = user_client.get(f"{FOLDER_ROUTE_PREFIX}/{root.id}/tree")
+
+    # THEN all folders are returned
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()["folders"]) == depth
+
+
+def test_get_folder_tree_of_other_user(
+    folder_factory: FolderFactory,
+    user: User,
+    user_client: TestClient,
+) -> None:
+    """Test that the tree of a folder of another user is not found."""
+    # GIVEN a folder of another user
+    folder = folder_factory.create(owner_id=user.id)
+
+    # WHEN the client requests its tree
+    response = user_client.get(f"{FOLDER_ROUTE_PREFIX}/{folder.id}/tree")
+
+    # THEN it is not found
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.parametrize(
+    ("recursive", "expected_titles"),
+    [(False, ["in root"]), (True, ["in root", "in child", "in grandchild"])],
+)
+def test_get_folder_notes(  # noqa: PLR0913
+    recursive: bool,  # noqa: FBT001
+    expected_titles: list[str],
+    folder_factory: FolderFactory,
+    note_factory: NoteFactory,
+    test_user: User,
+    user_client: TestClient,
+) -> None:
+    """Test retrieving the notes in a folder, optionally with its descendants."""
+    # GIVEN a folder with a child and a grandchild, each with a note
+    root = folder_factory.create(owner_id=test_user.id)
+    child = folder_factory.create(owner_id=test_user.id, parent_id=root.id)
+    grandchild = folder_factory.create(owner_id=test_user.id, parent_id=child.id)
+    for title, folder in [
+        ("in root", root),
+        ("in child", child),
+        ("in grandchild", grandchild),
+    ]:
+        note_factory.create(title=title, folder_id=folder.id, owner_id=test_user.id)
+
+    # AND a note outside of the folder
+    note_factory.create(title="outside", owner_id=test_user.id)
+
+    # WHEN the client requests the notes in the folder
+    response = user_client.get(
+        f"{FOLDER_ROUTE_PREFIX}/{root.id}/notes",
+        params={"recursive": recursive},
+    )
+
+    # THEN only the notes in the expected folders are returned
+    assert response.status_code == status.HTTP_200_OK
+    titles = [note["title"] for note in response.json()["items"]]
+    assert titles == expected_titles
+
+
 @pytest.fixture(name="root_level_folder_data")
 def root_level_folder_data_fixture() -> dict[str, Any]:
     """Fixture to create data for a root level folder."""
@@ -61,8 +218,12 @@ def root_level_folder_data_fixture() -> dict[str, Any]:
 
 
 @pytest.fixture(name="nested_folder_data")
-def nested_folder_data_fixture(folder: Folder) -> dict[str, Any]:
+def nested_folder_data_fixture(
+    folder_factory: FolderFactory,
+    test_user: User,
+) -> dict[str, Any]:
     """Fixture to create data for a nested folder."""
+    folder = folder_factory.create(owner_id=test_user.id)
     return {"name": "A nested folder", "parent_id": folder.id}
 
 
@@ -119,3 +280,84 @@ def test_delete_folder(
     # AND the note is deleted from the database
     deleted_folder = session.get(Folder, folder.id)
     assert deleted_folder is None
+
+
+def test_delete_folder_subtree(  # noqa: PLR0913
+    folder_factory: FolderFactory,
+    note_factory: NoteFactory,
+    tag_factory: TagFactory,
+    test_user: User,
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test that deleting a folder deletes its descendants and all their notes."""
+    # GIVEN a folder with a child and a grandchild, each with a tagged note
+    tag = tag_factory.create(owner_id=test_user.id)
+    root = folder_factory.create(owner_id=test_user.id)
+    child = folder_factory.create(owner_id=test_user.id, parent_id=root.id)
+    grandchild = folder_factory.create(owner_id=test_user.id, parent_id=child.id)
+    notes = [
+        note_factory.create(owner_id=test_user.id, folder_id=folder.id, tags=[tag])
+        for folder in (root, child, grandchild)
+    ]
+
+    # AND a folder with a note outside of it
+    other_folder = folder_factory.create(owner_id=test_user.id)
+    other_note = note_factory.create(owner_id=test_user.id, folder_id=other_folder.id)
+
+    # WHEN the client deletes the folder
+    response = user_client.delete(f"{FOLDER_ROUTE_PREFIX}/{root.id}")
+
+    # THEN the folder and its descendants are deleted
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    folder_ids = session.exec(select(Folder.id)).all()
+    assert folder_ids == [other_folder.id]
+
+    # AND so are their notes and the links to their tags
+    assert session.exec(select(Note.id)).all() == [other_note.id]
+    assert session.exec(select(NoteTagLink)).all() == []
+
+    # AND all of them are recorded as deleted
+    statement = select(Change.kind, Change.object_id).where(Change.deleted)
+    assert set(session.exec(statement).all()) == {
+        *(("folder", folder.id) for folder in (root, child, grandchild)),
+        *(("note", note.id) for note in notes),
+    }
+
+
+def test_delete_folder_of_other_user(
+    folder_factory: FolderFactory,
+    user: User,
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test that a folder of another user cannot be deleted."""
+    # GIVEN a folder of another user
+    folder = folder_factory.create(owner_id=user.id)
+
+    # WHEN the client tries to delete it
+    response = user_client.delete(f"{FOLDER_ROUTE_PREFIX}/{folder.id}")
+
+    # THEN it is not found and not deleted
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert session.get(Folder, folder.id) is not None
+
+
+def test_create_folder_in_folder_of_other_user(
+    folder_factory: FolderFactory,
+    test_user: User,
+    user: User,
+    user_client: TestClient,
+) -> None:
+    """Test that a folder cannot be created in a folder of another user."""
+    # GIVEN a folder of another user
+    folder = folder_factory.create(owner_id=user.id)
+
+    # WHEN the client creates a folder in it
+    response = user_client.post(
+        f"{FOLDER_ROUTE_PREFIX}/",
+        json={"name": "child", "parent_id": folder.id, "owner_id": str(test_user.id)},
+    )
+
+    # THEN the parent is rejected
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -1,3 +1,4 @@
+import json
 from typing import Any
 
 import pytest
@@ -6,8 +7,11 @@ from fastapi.testclient import TestClient
 from sqlmodel import Session, select
 
 from app.api.routes.constants import NOTES_ROUTE_PREFIX
-from app.models.tables import Folder, Note, User
-from tests.models.factories import NoteFactory, TagFactory
+from app.models.tables import Note, NoteBody, User
+from app.shared.constants import MAX_IMPORT_LINE_BYTES, NOTE_PREVIEW_LENGTH
+from tests.models.factories import FolderFactory, NoteFactory, TagFactory
+from tests.test_config import engine
+from tests.utils import count_queries
 
 
 @pytest.fixture(name="post_body_simple")
@@ -16,7 +20,11 @@ def post_body_simple_fixture() -> dict[str, Any]:
 
 
 @pytest.fixture(name="post_body_with_folder")
-def post_body_with_folder_fixture(folder: Folder) -> dict[str, Any]:
+def post_body_with_folder_fixture(
+    folder_factory: FolderFactory,
+    test_user: User,
+) -> dict[str, Any]:
+    folder = folder_factory.create(owner_id=test_user.id)
     return {
         "title": "Test Note",
         "body": "This is a test note.",
@@ -26,8 +34,11 @@ def post_body_with_folder_fixture(folder: Folder) -> dict[str, Any]:
 
 
 @pytest.fixture(name="post_body_with_tags")
-def post_body_with_tags_fixture(tag_factory: TagFactory) -> dict[str, Any]:
-    tag1, tag2 = tag_factory.create_batch(2)
+def post_body_with_tags_fixture(
+    tag_factory: TagFactory,
+    test_user: User,
+) -> dict[str, Any]:
+    tag1, tag2 = tag_factory.create_batch(2, owner_id=test_user.id)
     return {
         "title": "Test Note",
         "body": "This is a test note.",
@@ -69,6 +80,144 @@ def test_create_note_correct_input(
         assert folder_id_post_body == post_body.get("folder_id", None)
 
 
+@pytest.fixture(name="tagged_notes")
+def tagged_notes_fixture(
+    note_factory: NoteFactory,
+    tag_factory: TagFactory,
+    test_user: User,
+) -> dict[str, Any]:
+    """Fixture for tags work, work/projectx, work/projectx/design and home.
+
+    Every note is titled after its tags and an untagged note is added too.
+    """
+    owner_id = test_user.id
+    work = tag_factory.create(name="work", full_name="work", owner_id=owner_id)
+    projectx = tag_factory.create(
+        name="projectx",
+        full_name="work/projectx",
+        parent_id=work.id,
+        path=work.descendant_path,
+        owner_id=owner_id,
+    )
+    design = tag_factory.create(
+        name="design",
+        full_name="work/projectx/design",
+        parent_id=projectx.id,
+        path=projectx.descendant_path,
+        owner_id=owner_id,
+    )
+    home = tag_factory.create(name="home", full_name="home", owner_id=owner_id)
+    for tags in ([projectx], [design], [home], [projectx, home], []):
+        title = "+".join(tag.name for tag in tags) or "untagged"
+        note_factory.create(title=title, tags=tags, owner_id=owner_id)
+    return {tag.full_name: tag.id for tag in (work, projectx, design, home)}
+
+
+@pytest.mark.parametrize(
+    ("tags", "params", "expected_titles"),
+    [
+        (["work/projectx"], {}, ["projectx", "projectx+home"]),
+        (
+            ["work/projectx"],
+            {"include_descendants": True},
+            ["projectx", "design", "projectx+home"],
+        ),
+        (
+            ["work"],
+            {"include_descendants": True},
+            ["projectx", "design", "projectx+home"],
+        ),
+        (["work"], {}, []),
+        (["work/projectx", "home"], {}, ["projectx", "home", "projectx+home"]),
+        (["work/projectx", "home"], {"tag_match": "all"}, ["projectx+home"]),
+        (
+            ["work", "home"],
+            {"tag_match": "all", "include_descendants": True},
+            ["projectx+home"],
+        ),
+    ],
+)
+def test_get_all_notes_by_tags(
+    tags: list[str],
+    params: dict[str, Any],
+    expected_titles: list[str],
+    tagged_notes: dict[str, int],
+    user_client: TestClient,
+) -> None:
+    """Test filtering notes by any or all of several tags."""
+    # GIVEN notes with tags in a hierarchy
+    # WHEN the client lists the notes with some of the tags
+    tag_ids = [tagged_notes[full_name] for full_name in tags]
+    response = user_client.get(
+        f"{NOTES_ROUTE_PREFIX}/",
+        params={"tag_ids": tag_ids, **params},
+    )
+
+    # THEN only the notes matching the tags are returned
+    assert response.status_code == status.HTTP_200_OK
+    assert [note["title"] for note in response.json()["items"]] == expected_titles
+
+
+def test_get_all_notes_by_tags_in_pages(
+    tagged_notes: dict[str, int],
+    user_client: TestClient,
+) -> None:
+    """Test that notes filtered by tags are paginated."""
+    # GIVEN notes with tags in a hierarchy
+    params = {"tag_ids": [tagged_notes["work"]], "include_descendants": True}
+
+    # WHEN the client lists the notes with a tag two at a time
+    first = user_client.get(f"{NOTES_ROUTE_PREFIX}/", params={**params, "limit": 2})
+    cursor = first.json()["next_cursor"]
+    second = user_client.get(
+        f"{NOTES_ROUTE_PREFIX}/",
+        params={**params, "limit": 2, "cursor": cursor},
+    )
+
+    # THEN the matching notes are spread over two pages
+    titles = [note["title"] for note in first.json()["items"]]
+    assert titles == ["projectx", "design"]
+    assert [note["title"] for note in second.json()["items"]] == ["projectx+home"]
+    assert second.json()["next_cursor"] is None
+
+
+def test_get_all_notes_by_unknown_tag(
+    tag_factory: TagFactory,
+    user: User,
+    user_client: TestClient,
+) -> None:
+    """Test that filtering by a tag of another user is rejected."""
+    # GIVEN a tag of another user
+    tag = tag_factory.create(owner_id=user.id)
+
+    # WHEN the client lists the notes with the tag
+    response = user_client.get(f"{NOTES_ROUTE_PREFIX}/", params={"tag_ids": [tag.id]})
+
+    # THEN the tag is rejected
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_create_note_in_folder_of_other_user(
+    folder_factory: FolderFactory,
+    user: User,
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test that a note cannot be created in a folder of another user."""
+    # GIVEN a folder of another user
+    folder = folder_factory.create(owner_id=user.id)
+
+    # WHEN the client creates a note in it
+    response = user_client.post(
+        f"{NOTES_ROUTE_PREFIX}/",
+        json={"title": "Note", "body": "Body", "tag_ids": [], "folder_id": folder.id},
+    )
+
+    # THEN the folder is rejected and no note is created
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert session.exec(select(Note.id)).first() is None
+
+
 def test_get_note_by_id(
     note_factory: NoteFactory,
     user_client: TestClient,
@@ -107,10 +256,433 @@ def test_get_all_notes(
     assert response.status_code == status.HTTP_200_OK
 
     # AND the response contains all the notes
-    response_data = response.json()
+    response_data = response.json()["items"]
     assert len(response_data) == len(notes)
 
 
+def test_get_all_notes_paginated(
+    note_factory: NoteFactory,
+    test_user: User,
+    user_client: TestClient,
+) -> None:
+    """Test walking through all notes page by page."""
+    # GIVEN more notes in the database than fit on one page
+    notes = note_factory.create_batch(5, owner_id=test_user.id)
+
+    # WHEN the client follows the cursors until the last page
+    received_ids = []
+    params: dict[str, Any] = {"limit": 2}
+    while True:
+        response = user_client.get(f"{NOTES_ROUTE_PREFIX}/", params=params)
+        assert response.status_code == status.HTTP_200_OK
+        page = response.json()
+        assert len(page["items"]) <= params["limit"]
+        received_ids.extend(note["id"] for note in page["items"])
+        if page["next_cursor"] is None:
+            break
+        params["cursor"] = page["next_cursor"]
+
+    # THEN every note is returned exactly once, in order of id
+    assert received_ids == sorted(note.id for note in notes)
+
+
+@pytest.mark.parametrize(
+    ("params", "expected_status"),
+    [
+        pytest.param({"limit": 0}, status.HTTP_422_UNPROCESSABLE_ENTITY, id="zero"),
+        pytest.param(
+            {"limit": 100_000},
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+            id="above maximum page size",
+        ),
+        pytest.param(
+            {"cursor": "not a cursor"},
+            status.HTTP_400_BAD_REQUEST,
+            id="invalid cursor",
+        ),
+    ],
+)
+def test_get_all_notes_invalid_pagination(
+    params: dict[str, Any],
+    expected_status: int,
+    user_client: TestClient,
+) -> None:
+    """Test that invalid pagination parameters are rejected."""
+    # WHEN the client requests notes with invalid pagination parameters
+    response = user_client.get(f"{NOTES_ROUTE_PREFIX}/", params=params)
+
+    # THEN the request is rejected
+    assert response.status_code == expected_status
+
+
+def test_get_all_notes_query_count_is_constant(
+    note_factory: NoteFactory,
+    tag_factory: TagFactory,
+    test_user: User,
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test that listing notes does not issue a query per note."""
+    # GIVEN a single note with tags
+    tags = tag_factory.create_batch(2)
+    note_factory.create(owner_id=test_user.id, tags=tags)
+
+    # AND the current user is already cached by an earlier request
+    user_client.get(f"{NOTES_ROUTE_PREFIX}/")
+
+    # WHEN the notes are listed
+    session.expunge_all()
+    with count_queries(engine) as few_notes_queries:
+        response = user_client.get(f"{NOTES_ROUTE_PREFIX}/")
+    assert response.status_code == status.HTTP_200_OK
+
+    # AND many more notes with tags are added and the notes are listed again
+    note_factory.create_batch(10, owner_id=test_user.id, tags=tags)
+    session.expunge_all()
+    with count_queries(engine) as many_notes_queries:
+        response = user_client.get(f"{NOTES_ROUTE_PREFIX}/")
+    assert response.status_code == status.HTTP_200_OK
+
+    # THEN the tags of every note are returned
+    response_data = response.json()["items"]
+    assert len(response_data) == 11  # noqa: PLR2004
+    assert all(len(note["tag_ids"]) == len(tags) for note in response_data)
+
+    # AND the number of queries does not grow with the number of notes
+    assert len(many_notes_queries) == len(few_notes_queries)
+
+
+def test_get_all_notes_summary(
+    note_factory: NoteFactory,
+    tag_factory: TagFactory,
+    test_user: User,
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test listing notes with a preview instead of the body."""
+    # GIVEN a tagged note with a short body and a note with a long body
+    tag = tag_factory.create(owner_id=test_user.id)
+    short = note_factory.create(owner_id=test_user.id, body="Short", tags=[tag])
+    long_body = "Ünïcode lorem ipsum " * 100
+    long = note_factory.create(owner_id=test_user.id, body=long_body)
+
+    # WHEN the client lists summaries of the notes
+    session.expunge_all()
+    with count_queries(engine) as statements:
+        response = user_client.get(
+            f"{NOTES_ROUTE_PREFIX}/",
+            params={"summary": True},
+        )
+
+    # THEN the notes are returned with a preview and without the body
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["items"] == [
+        {
+            "id": short.id,
+            "version": 1,
+            "title": short.title,
+            "folder_id": None,
+            "preview": "Short",
+            "tag_ids": [tag.id],
+        },
+        {
+            "id": long.id,
+            "version": 1,
+            "title": long.title,
+            "folder_id": None,
+            "preview": long_body[:NOTE_PREVIEW_LENGTH],
+            "tag_ids": [],
+        },
+    ]
+
+    # AND neither whole bodies nor tags are read
+    assert not any("decompress_body" in statement for statement in statements)
+    assert not any("FROM tag" in statement for statement in statements)
+
+    # AND the page has another entity tag than the full page
+    etag = response.headers["ETag"]
+    full_response = user_client.get(
+        f"{NOTES_ROUTE_PREFIX}/",
+        headers={"If-None-Match": etag},
+    )
+    assert full_response.status_code == status.HTTP_200_OK
+    assert full_response.headers["ETag"] != etag
+    response = user_client.get(
+        f"{NOTES_ROUTE_PREFIX}/",
+        params={"summary": True},
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # AND summaries cannot be streamed
+    response = user_client.get(
+        f"{NOTES_ROUTE_PREFIX}/",
+        params={"summary": True, "stream": True},
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_search_notes(
+    note_factory: NoteFactory,
+    test_user: User,
+    user: User,
+    user_client: TestClient,
+) -> None:
+    """Test searching the title and body of notes."""
+    # GIVEN notes of the test user, one mentioning the search term in the title
+    # and one in the body
+    title_match = note_factory.create(
+        owner_id=test_user.id,
+        title="Kubernetes cheatsheet",
+        body="Useful commands.",
+    )
+    body_match = note_factory.create(
+        owner_id=test_user.id,
+        title="Meeting notes",
+        body="We discussed moving the deployment to kubernetes next quarter.",
+    )
+    note_factory.create(owner_id=test_user.id, title="Groceries", body="Milk.")
+
+    # AND a matching note of another user
+    note_factory.create(owner_id=user.id, title="Kubernetes", body="Kubernetes.")
+
+    # WHEN the client searches for a prefix of the term
+    response = user_client.get(f"{NOTES_ROUTE_PREFIX}/search", params={"q": "kube"})
+
+    # THEN the correct status code is returned
+    assert response.status_code == status.HTTP_200_OK
+
+    # AND only the matching notes of the user are returned, best match first
+    hits = response.json()["items"]
+    assert [hit["id"] for hit in hits] == [title_match.id, body_match.id]
+
+    # AND the matched words are highlighted in the snippet
+    assert "<mark>kubernetes</mark>" in hits[1]["snippet"]
+
+
+def test_search_notes_after_update(
+    note_factory: NoteFactory,
+    post_body_simple: dict[str, Any],
+    test_user: User,
+    user_client: TestClient,
+) -> None:
+    """Test that the search index follows updates of notes."""
+    # GIVEN a note that is updated with a new title and body
+    note = note_factory.create(owner_id=test_user.id, title="Old title")
+    user_client.put(f"{NOTES_ROUTE_PREFIX}/{note.id}", json=post_body_simple)
+
+    # WHEN the client searches for the old and the new title
+    old_response = user_client.get(f"{NOTES_ROUTE_PREFIX}/search", params={"q": "old"})
+    new_response = user_client.get(
+        f"{NOTES_ROUTE_PREFIX}/search",
+        params={"q": post_body_simple["title"]},
+    )
+
+    # THEN only the new title is found
+    assert old_response.json()["items"] == []
+    assert [hit["id"] for hit in new_response.json()["items"]] == [note.id]
+
+
+def test_long_note_body(
+    test_user: User,
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test that long bodies are stored compressed, but read and found as is."""
+    # GIVEN a note with a long body
+    body = "Aardvark " + "lorem ipsum dolor " * 100
+    post_body = {"title": "Long", "body": body, "tag_ids": []}
+    user_client.post(f"{NOTES_ROUTE_PREFIX}/", json=post_body)
+    note_id = session.exec(select(Note.id).where(Note.owner_id == test_user.id)).one()
+
+    # WHEN the note is read
+    response = user_client.get(f"{NOTES_ROUTE_PREFIX}/{note_id}")
+
+    # THEN the body is returned as it was sent
+    assert response.json()["body"] == body
+
+    # AND it is stored compressed
+    content = session.get(NoteBody, note_id)
+    assert content.plain is None
+    assert len(content.compressed) < len(body)
+
+    # AND it can be found by its body
+    response = user_client.get(f"{NOTES_ROUTE_PREFIX}/search", params={"q": "aardvark"})
+    assert "<mark>Aardvark</mark>" in response.json()["items"][0]["snippet"]
+
+    # AND after the body is edited, the old word is no longer found
+    edit = {"start": 0, "end": len("Aardvark"), "text": "Zebra"}
+    user_client.patch(f"{NOTES_ROUTE_PREFIX}/{note_id}", json={"body_edits": [edit]})
+    response = user_client.get(f"{NOTES_ROUTE_PREFIX}/search", params={"q": "aardvark"})
+    assert response.json()["items"] == []
+    response = user_client.get(f"{NOTES_ROUTE_PREFIX}/search", params={"q": "zebra"})
+    assert [hit["id"] for hit in response.json()["items"]] == [note_id]
+
+    # AND after the note is deleted, it is not found at all
+    user_client.delete(f"{NOTES_ROUTE_PREFIX}/{note_id}")
+    response = user_client.get(f"{NOTES_ROUTE_PREFIX}/search", params={"q": "zebra"})
+    assert response.json()["items"] == []
+    assert session.get(NoteBody, note_id) is None
+
+
+def test_search_notes_needs_sqlite(
+    user_client: TestClient,
+    session: Session,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that searching on databases other than SQLite is refused clearly."""
+    # GIVEN a database without the SQLite full-text search index
+    monkeypatch.setattr(session.get_bind().dialect, "name", "postgresql")
+
+    # WHEN the client searches its notes
+    response = user_client.get(f"{NOTES_ROUTE_PREFIX}/search", params={"q": "zebra"})
+
+    # THEN the search is not available
+    assert response.status_code == status.HTTP_501_NOT_IMPLEMENTED
+
+
+def test_import_notes(
+    tag_factory: TagFactory,
+    test_user: User,
+    user: User,
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test importing notes from newline delimited JSON."""
+    # GIVEN a tag of the user and a tag of another user
+    tag = tag_factory.create(owner_id=test_user.id)
+    other_tag = tag_factory.create(owner_id=user.id)
+
+    # AND an export with valid notes, a blank line and invalid lines
+    lines = [
+        json.dumps({"title": "First", "body": "One", "tag_ids": [tag.id]}),
+        "",
+        json.dumps({"title": "Second", "body": "Two", "tag_ids": []}),
+        "{not json",
+        json.dumps({"title": "Missing body", "tag_ids": []}),
+        json.dumps({"title": "Foreign", "body": "Tag", "tag_ids": [other_tag.id]}),
+    ]
+
+    # WHEN the client imports the notes
+    response = user_client.post(
+        f"{NOTES_ROUTE_PREFIX}/import",
+        content="\n".join(lines).encode(),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    # THEN the valid notes are imported and the invalid lines are reported
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+    assert result["imported"] == 2  # noqa: PLR2004
+    assert result["failed"] == 3  # noqa: PLR2004
+    assert [error["line"] for error in result["errors"]] == [4, 5, 6]
+
+    # AND the notes are stored with their tags
+    notes = session.exec(select(Note).where(Note.owner_id == test_user.id)).all()
+    assert {note.title: [t.id for t in note.tags] for note in notes} == {
+        "First": [tag.id],
+        "Second": [],
+    }
+
+
+def test_import_notes_with_long_lines(
+    test_user: User,
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test that lines over the size limit are reported and the rest imported."""
+    # GIVEN an export with a line over the limit in the middle and at the end
+    long_line = json.dumps({"title": "Long", "body": "x" * MAX_IMPORT_LINE_BYTES})
+    lines = [
+        json.dumps({"title": "First", "body": "One", "tag_ids": []}),
+        long_line,
+        json.dumps({"title": "Second", "body": "Two", "tag_ids": []}),
+        long_line,
+    ]
+    content = "\n".join(lines).encode()
+
+    # WHEN the client imports the notes in small chunks
+    chunk_size = 1000
+    response = user_client.post(
+        f"{NOTES_ROUTE_PREFIX}/import",
+        content=(
+            content[start : start + chunk_size]
+            for start in range(0, len(content), chunk_size)
+        ),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    # THEN the long lines are reported
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+    assert [error["line"] for error in result["errors"]] == [2, 4]
+
+    # AND the other notes are imported
+    notes = session.exec(select(Note).where(Note.owner_id == test_user.id)).all()
+    assert sorted(note.title for note in notes) == ["First", "Second"]
+
+
+def test_export_notes(
+    note_factory: NoteFactory,
+    tag_factory: TagFactory,
+    test_user: User,
+    user: User,
+    user_client: TestClient,
+) -> None:
+    """Test exporting all notes as newline delimited JSON."""
+    # GIVEN notes of the user and a note of another user
+    tag = tag_factory.create(owner_id=test_user.id)
+    notes = note_factory.create_batch(3, owner_id=test_user.id, tags=[tag])
+    note_factory.create(owner_id=user.id)
+
+    # WHEN the client exports the notes
+    response = user_client.get(f"{NOTES_ROUTE_PREFIX}/export")
+
+    # THEN every note of the user is returned on its own line
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert [note["id"] for note in exported] == [note.id for note in notes]
+    assert all(note["tag_ids"] == [tag.id] for note in exported)
+
+
+def test_stream_all_notes(  # noqa: PLR0913
+    note_factory: NoteFactory,
+    tag_factory: TagFactory,
+    test_user: User,
+    user: User,
+    user_client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test streaming all notes as a single JSON array."""
+    # GIVEN more notes of the user than fit in one batch and a note of another user
+    monkeypatch.setattr("app.api.streaming.STREAM_BATCH_SIZE", 2)
+    tag = tag_factory.create(owner_id=test_user.id)
+    notes = note_factory.create_batch(5, owner_id=test_user.id, tags=[tag])
+    note_factory.create(owner_id=user.id)
+
+    # WHEN the client requests the notes as a stream
+    response = user_client.get(f"{NOTES_ROUTE_PREFIX}/", params={"stream": True})
+
+    # THEN every note of the user is returned in a single JSON array
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/json"
+    streamed = response.json()
+    assert [note["id"] for note in streamed] == [note.id for note in notes]
+    assert all(note["tag_ids"] == [tag.id] for note in streamed)
+
+
+def test_stream_all_notes_empty(user_client: TestClient) -> None:
+    """Test streaming notes when the user has none."""
+    # GIVEN a user without notes
+    # WHEN the client requests the notes as a stream
+    response = user_client.get(f"{NOTES_ROUTE_PREFIX}/", params={"stream": True})
+
+    # THEN an empty JSON array is returned
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == []
+
+
 def test_update_note(
     note_factory: NoteFactory,
     post_body_simple: dict[str, Any],
@@ -134,6 +706,100 @@ def test_update_note(
     assert updated_note.body == post_body_simple["body"]
 
 
+def link_writes(statements: list[str]) -> list[str]:
+    """Get the kinds of the statements that write note tag links."""
+    return [
+        statement.split()[0]
+        for statement in statements
+        if statement.startswith(("INSERT INTO notetaglink", "DELETE FROM notetaglink"))
+    ]
+
+
+@pytest.mark.parametrize("other_owner", [False, True])
+def test_create_note_unknown_tag(
+    other_owner: bool,  # noqa: FBT001
+    tag_factory: TagFactory,
+    user: User,
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test that a note cannot be tagged with a missing or another user's tag."""
+    # GIVEN a tag id that is missing or belongs to another user
+    tag_id = tag_factory.create(owner_id=user.id).id if other_owner else 999_999
+    post_body = {"title": "Test Note", "body": "", "tag_ids": [tag_id]}
+
+    # WHEN the client creates a note with the tag
+    response = user_client.post(f"{NOTES_ROUTE_PREFIX}/", json=post_body)
+
+    # THEN the request is rejected
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["detail"] == f"Unknown tag ids: [{tag_id}]"
+
+    # AND no note is created
+    assert session.exec(select(Note.id)).first() is None
+
+
+def test_create_note_tags_round_trips(
+    tag_factory: TagFactory,
+    user_client: TestClient,
+    test_user: User,
+    session: Session,
+) -> None:
+    """Test that the number of queries does not grow with the number of tags."""
+    # GIVEN a client that has already been authenticated once
+    user_client.post(f"{NOTES_ROUTE_PREFIX}/", json={"title": "Note", "body": ""})
+
+    # AND notes with one and with ten tags
+    statement_counts = []
+    for count in (1, 10):
+        tags = tag_factory.create_batch(count, owner_id=test_user.id)
+        post_body = {"title": "Note", "body": "", "tag_ids": [tag.id for tag in tags]}
+
+        # WHEN the notes are created
+        with count_queries(engine) as statements:
+            response = user_client.post(f"{NOTES_ROUTE_PREFIX}/", json=post_body)
+        assert response.status_code == status.HTTP_201_CREATED
+        statement_counts.append(len(statements))
+
+        # AND the note has all its tags
+        note = session.exec(select(Note).order_by(Note.id.desc())).first()
+        assert {tag.id for tag in note.tags} == {tag.id for tag in tags}
+
+    # THEN both use the same number of queries
+    assert statement_counts[0] == statement_counts[1]
+
+
+def test_update_note_tags_changes_only_diff(
+    note_factory: NoteFactory,
+    tag_factory: TagFactory,
+    user_client: TestClient,
+    test_user: User,
+    session: Session,
+) -> None:
+    """Test that updating tags only removes and adds the changed links."""
+    # GIVEN a note with tags a and b, and another tag c
+    tag_a, tag_b, tag_c = tag_factory.create_batch(3, owner_id=test_user.id)
+    note = note_factory.create(owner_id=test_user.id, tags=[tag_a, tag_b])
+    put_body = {"title": "Note", "body": "", "tag_ids": [tag_b.id, tag_c.id]}
+
+    # WHEN the tags of the note are changed to b and c
+    with count_queries(engine) as statements:
+        response = user_client.put(f"{NOTES_ROUTE_PREFIX}/{note.id}", json=put_body)
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    # THEN only the link to a is deleted and only the link to c is inserted
+    assert link_writes(statements) == ["DELETE", "INSERT"]
+
+    # AND the note is tagged with b and c
+    session.expire_all()
+    assert {tag.id for tag in session.get(Note, note.id).tags} == {tag_b.id, tag_c.id}
+
+    # AND sending the same tags again does not touch the links
+    with count_queries(engine) as statements:
+        user_client.put(f"{NOTES_ROUTE_PREFIX}/{note.id}", json=put_body)
+    assert link_writes(statements) == []
+
+
 def test_delete_note(
     note_factory: NoteFactory,
     user_client: TestClient,
@@ -153,3 +819,286 @@ def test_delete_note(
     # AND the note is deleted from the database
     deleted_note = session.get(Note, note.id)
     assert deleted_note is None
+
+
+def test_get_note_not_modified(
+    note_factory: NoteFactory,
+    test_user: User,
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test that a note the client already has is not sent again."""
+    # GIVEN a note the client has read before
+    note = note_factory.create(owner_id=test_user.id)
+    response = user_client.get(f"{NOTES_ROUTE_PREFIX}/{note.id}")
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["ETag"]
+    assert response.json()["version"] == 1
+
+    # WHEN the client reads the note again with its entity tag
+    session.expunge_all()
+    with count_queries(engine) as statements:
+        response = user_client.get(
+            f"{NOTES_ROUTE_PREFIX}/{note.id}",
+            headers={"If-None-Match": etag},
+        )
+
+    # THEN the note is not modified
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+    # AND only the version of the note was read
+    assert len(statements) == 1
+    assert "body" not in statements[0]
+
+
+def test_get_note_modified(
+    note_factory: NoteFactory,
+    post_body_simple: dict[str, Any],
+    test_user: User,
+    user_client: TestClient,
+) -> None:
+    """Test that a changed note is sent with a new entity tag."""
+    # GIVEN a note the client has read before, that was updated since
+    note = note_factory.create(owner_id=test_user.id)
+    etag = user_client.get(f"{NOTES_ROUTE_PREFIX}/{note.id}").headers["ETag"]
+    response = user_client.put(f"{NOTES_ROUTE_PREFIX}/{note.id}", json=post_body_simple)
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    # WHEN the client reads the note again with its entity tag
+    response = user_client.get(
+        f"{NOTES_ROUTE_PREFIX}/{note.id}",
+        headers={"If-None-Match": etag},
+    )
+
+    # THEN the updated note is sent with the entity tag of the update
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["title"] == post_body_simple["title"]
+    assert response.headers["ETag"] != etag
+
+
+def test_get_all_notes_not_modified(
+    note_factory: NoteFactory,
+    test_user: User,
+    user_client: TestClient,
+) -> None:
+    """Test that a page of notes the client already has is not sent again."""
+    # GIVEN a page of notes the client has read before
+    note_factory.create_batch(3, owner_id=test_user.id)
+    etag = user_client.get(f"{NOTES_ROUTE_PREFIX}/").headers["ETag"]
+
+    # WHEN the client reads the page again with its entity tag
+    response = user_client.get(
+        f"{NOTES_ROUTE_PREFIX}/",
+        headers={"If-None-Match": etag},
+    )
+
+    # THEN the page is not modified
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # AND once a note is added, the page is sent again
+    note_factory.create(owner_id=test_user.id)
+    response = user_client.get(
+        f"{NOTES_ROUTE_PREFIX}/",
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()["items"]) == 4  # noqa: PLR2004
+
+
+def test_update_note_if_match(
+    note_factory: NoteFactory,
+    post_body_simple: dict[str, Any],
+    test_user: User,
+    user_client: TestClient,
+) -> None:
+    """Test that an update only succeeds on the version the client read."""
+    # GIVEN a note the client has read
+    note = note_factory.create(owner_id=test_user.id)
+    etag = user_client.get(f"{NOTES_ROUTE_PREFIX}/{note.id}").headers["ETag"]
+
+    # WHEN the client updates the note with the entity tag it read
+    response = user_client.put(
+        f"{NOTES_ROUTE_PREFIX}/{note.id}",
+        json=post_body_simple,
+        headers={"If-Match": etag},
+    )
+
+    # THEN the update succeeds and returns the entity tag of the new version
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    new_etag = response.headers["ETag"]
+    assert new_etag != etag
+    assert (
+        user_client.get(f"{NOTES_ROUTE_PREFIX}/{note.id}").headers["ETag"] == new_etag
+    )
+
+    # AND another update based on the old version fails
+    response = user_client.put(
+        f"{NOTES_ROUTE_PREFIX}/{note.id}",
+        json={**post_body_simple, "title": "Lost update"},
+        headers={"If-Match": etag},
+    )
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    response = user_client.get(f"{NOTES_ROUTE_PREFIX}/{note.id}")
+    assert response.json()["title"] == post_body_simple["title"]
+
+
+def test_patch_note_title_only(
+    note_factory: NoteFactory,
+    tag_factory: TagFactory,
+    test_user: User,
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test that patching the title writes neither the body nor the tags."""
+    # GIVEN a tagged note
+    tag = tag_factory.create(owner_id=test_user.id)
+    note = note_factory.create(owner_id=test_user.id, body="Body", tags=[tag])
+
+    # WHEN only the title is patched
+    with count_queries(engine) as statements:
+        response = user_client.patch(
+            f"{NOTES_ROUTE_PREFIX}/{note.id}",
+            json={"title": "New title"},
+        )
+
+    # THEN the title is changed and the new version is returned
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert response.headers["ETag"] == '"2"'
+    session.expire_all()
+    patched = session.get(Note, note.id)
+    assert (patched.title, patched.body) == ("New title", "Body")
+    assert [tag.id for tag in patched.tags] == [tag.id]
+
+    # AND only the title and version columns are written
+    updates = [statement for statement in statements if statement.startswith("UPDATE")]
+    assert updates == [
+        "UPDATE note SET title=?, version=(note.version + ?) "
+        "WHERE note.id = ? RETURNING version",
+    ]
+    assert link_writes(statements) == []
+
+
+def test_patch_note_fields(  # noqa: PLR0913
+    note_factory: NoteFactory,
+    folder_factory: FolderFactory,
+    tag_factory: TagFactory,
+    test_user: User,
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test patching the folder and tags, and moving a note out of its folder."""
+    # GIVEN a note in a folder, and a tag
+    folder = folder_factory.create(owner_id=test_user.id)
+    tag = tag_factory.create(owner_id=test_user.id)
+    note = note_factory.create(owner_id=test_user.id, folder_id=folder.id)
+
+    # WHEN the note is tagged and moved out of its folder
+    response = user_client.patch(
+        f"{NOTES_ROUTE_PREFIX}/{note.id}",
+        json={"folder_id": None, "tag_ids": [tag.id]},
+    )
+
+    # THEN both are changed
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    session.expire_all()
+    patched = session.get(Note, note.id)
+    assert patched.folder_id is None
+    assert [tag.id for tag in patched.tags] == [tag.id]
+
+    # AND an empty patch changes nothing
+    response = user_client.patch(f"{NOTES_ROUTE_PREFIX}/{note.id}", json={})
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert response.headers["ETag"] == '"2"'
+
+
+def test_patch_note_body_edits(
+    note_factory: NoteFactory,
+    test_user: User,
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test changing the body of a note with edits."""
+    # GIVEN a note
+    note = note_factory.create(owner_id=test_user.id, body="Hello world")
+
+    # WHEN a word is replaced and text is inserted at the end
+    response = user_client.patch(
+        f"{NOTES_ROUTE_PREFIX}/{note.id}",
+        json={
+            "body_edits": [
+                {"start": 6, "end": 11, "text": "there"},
+                {"start": 11, "end": 11, "text": "!"},
+            ],
+        },
+    )
+
+    # THEN the edits are applied to the stored body
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    session.expire_all()
+    assert session.get(Note, note.id).body == "Hello there!"
+
+
+@pytest.mark.parametrize(
+    "patch_body",
+    [
+        {"body_edits": [{"start": 0, "end": 12, "text": ""}]},
+        {"body_edits": [{"start": 3, "end": 2, "text": ""}]},
+        {"body_edits": [{"start": 2, "end": 4}, {"start": 3, "end": 5}]},
+        {"body": "New", "body_edits": [{"start": 0, "end": 0, "text": "a"}]},
+        {"folder_id": 999_999},
+        {"tag_ids": [999_999]},
+    ],
+)
+def test_patch_note_invalid(
+    patch_body: dict[str, Any],
+    note_factory: NoteFactory,
+    test_user: User,
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test that invalid patches are rejected without changing the note."""
+    # GIVEN a note
+    note = note_factory.create(owner_id=test_user.id, body="Hello world")
+
+    # WHEN an invalid patch is sent
+    response = user_client.patch(f"{NOTES_ROUTE_PREFIX}/{note.id}", json=patch_body)
+
+    # THEN it is rejected
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    # AND the note is unchanged
+    session.expire_all()
+    assert session.get(Note, note.id).version == 1
+
+
+def test_patch_note_if_match(
+    note_factory: NoteFactory,
+    test_user: User,
+    user: User,
+    user_client: TestClient,
+) -> None:
+    """Test that a patch only succeeds on the version the client read."""
+    # GIVEN a note that was changed after the client read it
+    note = note_factory.create(owner_id=test_user.id)
+    etag = user_client.get(f"{NOTES_ROUTE_PREFIX}/{note.id}").headers["ETag"]
+    user_client.patch(f"{NOTES_ROUTE_PREFIX}/{note.id}", json={"title": "Changed"})
+
+    # WHEN the client patches the version it read
+    response = user_client.patch(
+        f"{NOTES_ROUTE_PREFIX}/{note.id}",
+        json={"title": "Lost update"},
+        headers={"If-Match": etag},
+    )
+
+    # THEN the precondition fails
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+
+    # AND notes of other users are not found
+    other_note = note_factory.create(owner_id=user.id)
+    response = user_client.patch(
+        f"{NOTES_ROUTE_PREFIX}/{other_note.id}",
+        json={"title": "Stolen"},
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,99 @@
+from collections.abc import Iterator
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel
+
+from app.api import deps
+from app.api.routes.constants import NOTES_ROUTE_PREFIX
+from app.database import create_database_engine
+from app.main import app
+from app.models.tables import Note, NoteBody, User
+from app.security import create_access_token, user_cache
+from tests.utils import get_auth_header_for_user
+
+NOTE_ID = 1
+
+
+@pytest.fixture(name="replicated_user")
+def replicated_user_fixture(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> Iterator[User]:
+    """Fixture to set up a primary and a replica database with a user.
+
+    The note with id NOTE_ID has the title "primary" in the primary database
+    and "replica" in the replica, so the tests can tell which one was read.
+    """
+    user = User(username="user", email="user@example.com", hashed_password="")
+    for name, attribute in (("primary", "engine"), ("replica", "read_engine")):
+        engine = create_database_engine(f"sqlite:///{tmp_path / name}.db")
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            session.add(User.model_validate(user))
+            session.flush()  # Notes have no relationship that orders the inserts
+            session.add(
+                Note(
+                    id=NOTE_ID,
+                    title=name,
+                    content=NoteBody.from_body(""),
+                    owner_id=user.id,
+                ),
+            )
+            session.commit()
+        monkeypatch.setattr(deps, attribute, engine)
+
+    yield user
+
+    deps.recent_writers.clear()
+    user_cache.clear()
+
+
+@pytest.fixture(name="replica_client")
+def replica_client_fixture(replicated_user: User) -> TestClient:
+    """Fixture for a client of the user, using the real database sessions."""
+    return TestClient(app, headers=get_auth_header_for_user(replicated_user.id))
+
+
+def get_note_title(client: TestClient) -> str:
+    """Get the title of the note with id NOTE_ID."""
+    response = client.get(f"{NOTES_ROUTE_PREFIX}/{NOTE_ID}")
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()["title"]
+
+
+def test_reads_use_replica(replica_client: TestClient) -> None:
+    """Test that read requests are sent to the read replica."""
+    # GIVEN a client that did not write anything
+    # WHEN the client reads a note
+    # THEN the note is read from the replica
+    assert get_note_title(replica_client) == "replica"
+
+
+def test_read_your_writes(
+    replica_client: TestClient,
+    replicated_user: User,
+) -> None:
+    """Test that a client reads from the primary database after it wrote."""
+    # GIVEN a client that updated a note
+    response = replica_client.put(
+        f"{NOTES_ROUTE_PREFIX}/{NOTE_ID}",
+        json={"title": "updated", "body": "", "tag_ids": []},
+    )
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    # WHEN the client reads the note right after
+    # THEN its own write is returned from the primary database
+    assert get_note_title(replica_client) == "updated"
+
+    # AND clients that did not write keep reading from the replica
+    token = create_access_token(replicated_user.id, expires_delta=timedelta(minutes=5))
+    other_client = TestClient(app, headers={"Authorization": f"Bearer {token}"})
+    assert get_note_title(other_client) == "replica"
+
+    # AND once the window has passed the client reads from the replica again
+    deps.recent_writers.clear()
+    assert get_note_title(replica_client) == "replica"
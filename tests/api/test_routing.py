@@ -0,0 +1,117 @@
+from typing import Any
+
+import pytest
+from fastapi import APIRouter, FastAPI, Response, status
+from fastapi.testclient import TestClient
+from pydantic import BaseModel, model_validator
+
+from app.api.routing import PrevalidatedRoute
+
+
+class Item(BaseModel):
+    """Model that counts how often it is validated."""
+
+    validations: int = 0
+    name: str
+
+    @model_validator(mode="after")
+    def count_validation(self) -> "Item":
+        """Count the validation of this item."""
+        Item.validations += 1
+        return self
+
+
+class Summary(BaseModel):
+    """Another model, to combine with the item in a union."""
+
+    title: str
+
+
+@pytest.fixture(name="routing_client")
+def routing_client_fixture() -> TestClient:
+    """Fixture for a client of an app with prevalidated routes."""
+    router = APIRouter(route_class=PrevalidatedRoute)
+
+    @router.get("/model", response_model=Item)
+    def get_model() -> Any:
+        return Item(name="model")
+
+    @router.get("/model-async", response_model=Item)
+    async def get_model_async() -> Any:
+        return Item(name="model")
+
+    @router.get("/dict", response_model=Item)
+    def get_dict() -> Any:
+        return {"name": "dict", "secret": "not in the response model"}
+
+    @router.get("/headers", response_model=Item)
+    def get_with_headers(response: Response) -> Any:
+        response.headers["ETag"] = '"1"'
+        response.status_code = status.HTTP_202_ACCEPTED
+        return Item(name="headers")
+
+    @router.post("/model", response_model=Item, status_code=status.HTTP_201_CREATED)
+    def create_model() -> Any:
+        return Item(name="created")
+
+    @router.get("/union", response_model=Summary | Item)
+    def get_union() -> Any:
+        return Item(name="model")
+
+    app = FastAPI()
+    app.include_router(router)
+    Item.validations = 0
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("path", ["/model", "/model-async", "/union"])
+def test_response_model_is_not_validated_again(
+    routing_client: TestClient,
+    path: str,
+) -> None:
+    """Test that a returned instance of the response model is sent as it is."""
+    # GIVEN an endpoint that returns an instance of its response model
+    # WHEN the client requests the endpoint
+    response = routing_client.get(path)
+
+    # THEN the model is returned
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"validations": 0, "name": "model"}
+
+    # AND it was only validated when the endpoint created it
+    assert Item.validations == 1
+
+
+def test_other_responses_are_validated(routing_client: TestClient) -> None:
+    """Test that anything but an instance of the response model is validated."""
+    # GIVEN an endpoint that returns a dict with a field unknown to the model
+    # WHEN the client requests the endpoint
+    response = routing_client.get("/dict")
+
+    # THEN the response is validated against the response model
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"validations": 0, "name": "dict"}
+    assert Item.validations == 1
+
+
+def test_route_status_code_is_kept(routing_client: TestClient) -> None:
+    """Test that a response sent as it is uses the status code of the route."""
+    # GIVEN an endpoint with a custom status code
+    # WHEN the client requests the endpoint
+    response = routing_client.post("/model")
+
+    # THEN the status code of the route is used
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["name"] == "created"
+
+
+def test_response_parameter_is_kept(routing_client: TestClient) -> None:
+    """Test that headers and status set on the Response parameter are sent."""
+    # GIVEN an endpoint that sets a header and status code on its response
+    # WHEN the client requests the endpoint
+    response = routing_client.get("/headers")
+
+    # THEN the header and status code are sent with the model
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.headers["ETag"] == '"1"'
+    assert response.json()["name"] == "headers"
@@ -3,9 +3,11 @@ from fastapi import status
 from fastapi.testclient import TestClient
 from sqlmodel import Session, select
 
-from app.api.routes.constants import TAG_ROUTE_PREFIX
+from app.api.routes.constants import NOTES_ROUTE_PREFIX, TAG_ROUTE_PREFIX
 from app.models.tables import Tag, User
-from tests.models.factories import TagFactory
+from tests.models.factories import NoteFactory, TagFactory
+from tests.test_config import engine
+from tests.utils import count_queries
 
 
 def test_get_tag_by_id(
@@ -45,13 +47,51 @@ def test_get_all_tags(
     assert response.status_code == status.HTTP_200_OK
 
     # AND the response contains all the tags
-    response_data = response.json()
+    response_data = response.json()["items"]
     assert len(response_data) == len(tags)
     for tag, response_tag in zip(tags, response_data, strict=False):
         assert response_tag["id"] == tag.id
         assert response_tag["name"] == tag.name
 
 
+def test_get_all_tags_query_count_independent_of_depth(
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test that listing tags does not walk the tag hierarchy."""
+    # GIVEN a single root tag
+    user_client.post(
+        f"{TAG_ROUTE_PREFIX}/",
+        json={"full_name": "root"},
+    )
+
+    # AND the current user is already cached by an earlier request
+    user_client.get(f"{TAG_ROUTE_PREFIX}/")
+
+    # WHEN the tags are listed
+    session.expunge_all()
+    with count_queries(engine) as flat_queries:
+        response = user_client.get(f"{TAG_ROUTE_PREFIX}/")
+    assert response.status_code == status.HTTP_200_OK
+
+    # AND a deep hierarchy of tags is added and the tags are listed again
+    user_client.post(
+        f"{TAG_ROUTE_PREFIX}/",
+        json={"full_name": "root/aa/bb/cc/dd/ee"},
+    )
+    session.expunge_all()
+    with count_queries(engine) as deep_queries:
+        response = user_client.get(f"{TAG_ROUTE_PREFIX}/")
+    assert response.status_code == status.HTTP_200_OK
+
+    # THEN the full names of all tags are returned
+    full_names = {tag["full_name"] for tag in response.json()["items"]}
+    assert "root/aa/bb/cc/dd/ee" in full_names
+
+    # AND the number of queries does not depend on the depth of the hierarchy
+    assert len(deep_queries) == len(flat_queries)
+
+
 @pytest.fixture(name="existing_tag")
 def existing_tag_fixture(tag_factory: TagFactory, test_user: User) -> Tag:
     """Fixture to create an existing tag."""
@@ -82,15 +122,11 @@ def existing_tag_fixture(tag_factory: TagFactory, test_user: User) -> Tag:
 def test_create_tag(
     post_body: dict[str, str],
     expected_tag_names: list[str],
-    test_user: User,
     user_client: TestClient,
     session: Session,
 ) -> None:
     """Test creating a new tag."""
-    # GIVEN a request body for creating a tag with the owner id
-    post_body["owner_id"] = str(test_user.id)
-
-    # AND a client to send requests
+    # GIVEN a client to send requests
     client = user_client
 
     # WHEN the client sends a POST request to the tags endpoint
@@ -122,3 +158,219 @@ def test_delete_tag(
     # AND the tag is removed from the database
     deleted_tag = session.get(Tag, existing_tag.id)
     assert deleted_tag is None
+
+
+def test_create_tag_stores_full_name_and_path(
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test that nested tags store their full name and ancestor path."""
+    # WHEN the client creates a nested tag
+    response = user_client.post(
+        f"{TAG_ROUTE_PREFIX}/",
+        json={"full_name": "aa/bb/cc"},
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+
+    # THEN every tag stores its full name and the ids of its ancestors
+    tags = {tag.name: tag for tag in session.exec(select(Tag)).all()}
+    assert tags["aa"].full_name == "aa"
+    assert tags["aa"].path == ""
+    assert tags["bb"].full_name == "aa/bb"
+    assert tags["bb"].path == f"{tags['aa'].id}/"
+    assert tags["cc"].full_name == "aa/bb/cc"
+    assert tags["cc"].path == f"{tags['aa'].id}/{tags['bb'].id}/"
+
+
+def test_delete_tag_turns_children_into_root_tags(
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test that the descendants of a deleted tag get new full names and paths."""
+    # GIVEN a hierarchy of tags
+    user_client.post(
+        f"{TAG_ROUTE_PREFIX}/",
+        json={"full_name": "aa/bb/cc/dd"},
+    )
+    tags = {tag.name: tag for tag in session.exec(select(Tag)).all()}
+
+    # WHEN a tag in the middle of the hierarchy is deleted
+    response = user_client.delete(f"{TAG_ROUTE_PREFIX}/{tags['bb'].id}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    # THEN its child becomes a root tag
+    session.expire_all()
+    child = session.get(Tag, tags["cc"].id)
+    assert child.parent_id is None
+    assert child.full_name == "cc"
+    assert child.path == ""
+
+    # AND the grandchild is moved along with it
+    grandchild = session.get(Tag, tags["dd"].id)
+    assert grandchild.parent_id == child.id
+    assert grandchild.full_name == "cc/dd"
+    assert grandchild.path == f"{child.id}/"
+
+    # AND the rest of the hierarchy is untouched
+    assert session.get(Tag, tags["aa"].id).full_name == "aa"
+
+
+def test_create_tag_round_trips(
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test that tags are created with one query plus one insert per new tag.
+
+    Recording the changes of the new tags takes two more statements.
+    """
+    # GIVEN a client whose user is already cached by an earlier request
+    user_client.get(f"{TAG_ROUTE_PREFIX}/")
+    post_body = {"full_name": "aa/bb/cc/dd/ee/ff"}
+
+    # WHEN a deep tag is created that does not exist yet
+    with count_queries(engine) as new_queries:
+        response = user_client.post(f"{TAG_ROUTE_PREFIX}/", json=post_body)
+    assert response.status_code == status.HTTP_201_CREATED
+
+    # AND the same tag is created again
+    with count_queries(engine) as existing_queries:
+        response = user_client.post(f"{TAG_ROUTE_PREFIX}/", json=post_body)
+    assert response.status_code == status.HTTP_201_CREATED
+
+    # THEN the existing tags are read in one query, each new tag is inserted
+    # and the changes are recorded
+    assert len(new_queries) == 1 + 6 + 2
+    assert len(existing_queries) == 1
+
+    # AND no tag was created twice
+    assert len(session.exec(select(Tag)).all()) == 6  # noqa: PLR2004
+
+
+def test_create_tag_per_owner(
+    tag_factory: TagFactory,
+    test_user: User,
+    user: User,
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test that users do not share tags with the same name."""
+    # GIVEN a tag of another user
+    other_tag = tag_factory.create(name="shared", owner_id=user.id)
+
+    # WHEN the client creates a tag with the same name
+    response = user_client.post(
+        f"{TAG_ROUTE_PREFIX}/",
+        json={"full_name": "shared"},
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+
+    # THEN a separate tag is created for the current user
+    statement = select(Tag).where(Tag.owner_id == test_user.id)
+    tag = session.exec(statement).one()
+    assert tag.full_name == "shared"
+    assert tag.id != other_tag.id
+
+
+def test_delete_tag_changes_notes(
+    note_factory: NoteFactory,
+    tag_factory: TagFactory,
+    test_user: User,
+    user_client: TestClient,
+) -> None:
+    """Test that deleting a tag gives its notes a new version."""
+    # GIVEN a note with a tag that the client has read
+    tag = tag_factory.create(owner_id=test_user.id)
+    note = note_factory.create(owner_id=test_user.id, tags=[tag])
+    etag = user_client.get(f"{NOTES_ROUTE_PREFIX}/{note.id}").headers["ETag"]
+
+    # WHEN the tag is deleted
+    response = user_client.delete(f"{TAG_ROUTE_PREFIX}/{tag.id}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    # THEN the note without the tag is sent again
+    response = user_client.get(
+        f"{NOTES_ROUTE_PREFIX}/{note.id}",
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["tag_ids"] == []
+
+
+def test_delete_tag_with_taken_full_name(
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test that a tag is not deleted if a descendant's new full name is taken."""
+    # GIVEN a root tag and a child tag with the same name below another tag
+    for full_name in ("bb", "aa/bb"):
+        user_client.post(
+            f"{TAG_ROUTE_PREFIX}/",
+            json={"full_name": full_name},
+        )
+    tags = {tag.full_name: tag for tag in session.exec(select(Tag)).all()}
+
+    # WHEN the parent of the child tag is deleted
+    response = user_client.delete(f"{TAG_ROUTE_PREFIX}/{tags['aa'].id}")
+
+    # THEN the conflict is reported
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert "['bb']" in response.json()["detail"]
+
+    # AND all tags are unchanged
+    session.expire_all()
+    full_names = {tag.full_name for tag in session.exec(select(Tag)).all()}
+    assert full_names == {"bb", "aa", "aa/bb"}
+
+
+def test_delete_tag_child_takes_over_full_name(
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test that a child with the name of the deleted tag takes over its full name."""
+    # GIVEN a tag with a child of the same name
+    user_client.post(
+        f"{TAG_ROUTE_PREFIX}/",
+        json={"full_name": "aa/aa/bb"},
+    )
+    tags = {tag.full_name: tag for tag in session.exec(select(Tag)).all()}
+
+    # WHEN the tag is deleted
+    response = user_client.delete(f"{TAG_ROUTE_PREFIX}/{tags['aa'].id}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    # THEN its descendants are moved up
+    session.expire_all()
+    full_names = {tag.full_name for tag in session.exec(select(Tag)).all()}
+    assert full_names == {"aa", "aa/bb"}
+
+
+@pytest.mark.parametrize(
+    ("full_names", "expected_full_names"),
+    [
+        (["aa/aa/aa"], {"aa", "aa/aa"}),
+        (["aa/aa/cc/bb", "aa/cc/bb"], {"aa", "aa/cc", "aa/cc/bb", "cc", "cc/bb"}),
+    ],
+)
+def test_delete_tag_with_repeated_names(
+    full_names: list[str],
+    expected_full_names: set[str],
+    user_client: TestClient,
+    session: Session,
+) -> None:
+    """Test that descendants may take over the full names of other descendants."""
+    # GIVEN a root tag with descendants whose names repeat the names above them
+    for full_name in full_names:
+        user_client.post(
+            f"{TAG_ROUTE_PREFIX}/",
+            json={"full_name": full_name},
+        )
+    root = session.exec(select(Tag).where(Tag.full_name == "aa")).one()
+
+    # WHEN the root tag is deleted
+    response = user_client.delete(f"{TAG_ROUTE_PREFIX}/{root.id}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    # THEN every descendant is moved up without a conflict
+    session.expire_all()
+    full_names = {tag.full_name for tag in session.exec(select(Tag)).all()}
+    assert full_names == expected_full_names
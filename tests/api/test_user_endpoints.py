@@ -6,9 +6,16 @@ from fastapi.testclient import TestClient
 from sqlmodel import Session, select
 
 from app.api.routes.constants import USERS_ROUTE_PREFIX
-from app.models.tables import User
-from tests.models.factories import UserFactory
+from app.models.tables import Folder, Note, Tag, User
+from tests.models.factories import (
+    FolderFactory,
+    NoteFactory,
+    TagFactory,
+    UserFactory,
+)
+from tests.test_config import engine
 from tests.typedefs import Outcome
+from tests.utils import count_queries, get_auth_header_for_user
 
 
 def test_get_user(user: User, superuser_client: TestClient) -> None:
@@ -48,7 +55,7 @@ def test_get_multiple_users(
     assert response.status_code == status.HTTP_200_OK
 
     # AND the response data matches the user data
-    response_body = response.json()
+    response_body = response.json()["items"]
     assert len(response_body) >= len(users)
     for user in users:
         user_data = next((u for u in response_body if str(user.id) == u["id"]), None)
@@ -58,6 +65,31 @@ def test_get_multiple_users(
         assert user_data["is_active"] == user.is_active
 
 
+def test_get_users_paginated(
+    user_factory: type[UserFactory],
+    superuser_client: TestClient,
+) -> None:
+    """Test walking through all users page by page."""
+    # GIVEN multiple users in the database
+    users = user_factory.create_batch(5)
+
+    # WHEN the client follows the cursors until the last page
+    received_ids = []
+    params: dict[str, Any] = {"limit": 2}
+    while True:
+        response = superuser_client.get(USERS_ROUTE_PREFIX, params=params)
+        assert response.status_code == status.HTTP_200_OK
+        page = response.json()
+        received_ids.extend(user["id"] for user in page["items"])
+        if page["next_cursor"] is None:
+            break
+        params["cursor"] = page["next_cursor"]
+
+    # THEN every user is returned exactly once
+    assert len(received_ids) == len(set(received_ids))
+    assert {str(user.id) for user in users} <= set(received_ids)
+
+
 @pytest.mark.parametrize(
     ("new_user_data", "expected_outcome"),
     [
@@ -126,7 +158,9 @@ def test_create_user(
 
 
 def test_delete_user(
-    user: User, superuser_client: TestClient, session: Session,
+    user: User,
+    superuser_client: TestClient,
+    session: Session,
 ) -> None:
     """Test deleting a user using a DELETE request."""
     # GIVEN a user in the database
@@ -143,3 +177,63 @@ def test_delete_user(
     statement = select(User).where(User.id == user.id)
     deleted_user = session.exec(statement).first()
     assert deleted_user is None
+
+
+def test_delete_user_with_data(  # noqa: PLR0913
+    user: User,
+    folder_factory: FolderFactory,
+    note_factory: NoteFactory,
+    tag_factory: TagFactory,
+    superuser_client: TestClient,
+    session: Session,
+) -> None:
+    """Test that deleting a user also deletes everything the user owns."""
+    # GIVEN a user with a folder, a tag with a child and a tagged note
+    folder = folder_factory.create(owner_id=user.id)
+    tag = tag_factory.create(owner_id=user.id)
+    tag_factory.create(owner_id=user.id, parent_id=tag.id)
+    note_factory.create(owner_id=user.id, folder_id=folder.id, tags=[tag])
+
+    # WHEN a delete request is sent to the delete endpoint
+    response = superuser_client.delete(f"{USERS_ROUTE_PREFIX}/{user.id}")
+
+    # THEN the user is deleted despite the foreign keys to it
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    # AND so are the notes, tags and folders of the user
+    for obj_type in (Note, Tag, Folder):
+        statement = select(obj_type).where(obj_type.owner_id == user.id)
+        assert session.exec(statement).first() is None
+
+
+def test_deleted_user_is_not_served_from_cache(
+    user: User,
+    superuser_client: TestClient,
+) -> None:
+    """Test that a deleted user can no longer use a valid token."""
+    # GIVEN a user that recently made an authenticated request
+    headers = get_auth_header_for_user(user.id)
+    response = superuser_client.get(USERS_ROUTE_PREFIX, headers=headers)
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    # WHEN the user is deleted
+    response = superuser_client.delete(f"{USERS_ROUTE_PREFIX}/{user.id}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    # THEN the token of the user is no longer accepted
+    response = superuser_client.get(USERS_ROUTE_PREFIX, headers=headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_current_user_is_cached(user_client: TestClient) -> None:
+    """Test that repeated requests do not read the current user again."""
+    # GIVEN a user that made an authenticated request
+    user_client.get("/folders/")
+
+    # WHEN the user makes another request
+    with count_queries(engine) as queries:
+        response = user_client.get("/folders/")
+
+    # THEN the request succeeds without reading the user from the database
+    assert response.status_code == status.HTTP_200_OK
+    assert not any("FROM user" in query for query in queries)
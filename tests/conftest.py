@@ -8,6 +8,8 @@ from sqlmodel import Session
 from app.api.deps import get_db
 from app.main import app
 from app.models.tables import User
+from app.security import user_cache
+from tests.factories import Session as FactorySession
 from tests.models.factories import FolderFactory, NoteFactory, TagFactory, UserFactory
 from tests.test_config import engine
 from tests.utils import get_auth_header_for_user
@@ -31,6 +33,8 @@ def session_fixture() -> Iterator[Session]:
     yield session
 
     session.close()
+    # Forget the objects of the factories, their ids are reused after the rollback
+    FactorySession.remove()
     transaction.rollback()  # Rollback any changes made during the test
     connection.close()
 
@@ -47,6 +51,7 @@ def client_fixture(session: Session) -> Iterator[TestClient]:
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
+    user_cache.clear()
 
 
 @pytest.fixture(name="test_user")
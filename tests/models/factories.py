@@ -2,7 +2,7 @@ from typing import Any
 
 import factory
 
-from app.models.tables import Folder, Note, Tag, User
+from app.models.tables import Folder, Note, NoteBody, Tag, User
 from app.security import get_password_hash
 from tests.factories import ModelFactory
 
@@ -11,8 +11,11 @@ class NoteFactory(ModelFactory):
     class Meta:
         model = Note
 
+    class Params:
+        body = factory.Faker("text", max_nb_chars=200)
+
     title = factory.Faker("sentence", nb_words=4)
-    body = factory.Faker("text", max_nb_chars=200)
+    content = factory.LazyAttribute(lambda note: NoteBody.from_body(note.body))
 
 
 class TagFactory(ModelFactory):
@@ -20,6 +23,7 @@ class TagFactory(ModelFactory):
         model = Tag
 
     name = factory.Faker("word")
+    full_name = factory.SelfAttribute("name")
 
 
 class FolderFactory(ModelFactory):
@@ -0,0 +1,91 @@
+import uuid
+from typing import Any
+
+import pytest
+from sqlalchemy import text
+from sqlmodel import SQLModel, select
+
+from app.crud import select_by_owner, select_folder_subtree
+from app.models.tables import Change, Folder, Note, NoteTagLink, Tag
+from tests.test_config import engine
+
+
+def explain(statement: Any) -> str:
+    """Get the SQLite query plan of a statement as a single string."""
+    compiled = statement.compile(
+        dialect=engine.dialect,
+        compile_kwargs={"literal_binds": True},
+    )
+    with engine.connect() as connection:
+        plan = connection.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+    return "\n".join(row.detail for row in plan)
+
+
+@pytest.mark.parametrize("obj_type", [Note, Folder, Tag, Change])
+def test_listing_by_owner_uses_index(obj_type: type[SQLModel]) -> None:
+    """Test that a page of objects of an owner is read through an index."""
+    # GIVEN the query for a page of objects of an owner
+    statement = select_by_owner(obj_type, uuid.uuid4()).order_by(obj_type.id)
+
+    # WHEN the query is planned
+    plan = explain(statement.limit(50))
+
+    # THEN the index on owner and id is searched and no sorting is needed
+    table = obj_type.__tablename__
+    assert f"SEARCH {table} USING INDEX ix_{table}_owner_id_id (owner_id=?)" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+@pytest.mark.parametrize("obj_type", [Folder, Tag])
+def test_child_by_name_uses_index(obj_type: type[SQLModel]) -> None:
+    """Test that a child folder or tag is found by name through an index."""
+    # GIVEN the query for a child with a specific name
+    statement = select(obj_type).where(
+        obj_type.parent_id == 1,
+        obj_type.name == "name",
+    )
+
+    # WHEN the query is planned
+    plan = explain(statement)
+
+    # THEN the index on parent and name is searched
+    table = obj_type.__tablename__
+    assert f"USING INDEX ix_{table}_parent_id_name (parent_id=? AND name=?)" in plan
+
+
+def test_notes_of_tag_use_index() -> None:
+    """Test that the notes of a tag are found through an index."""
+    # GIVEN the query for the notes of a tag
+    statement = select(NoteTagLink.note_id).where(NoteTagLink.tag_id == 1)
+
+    # WHEN the query is planned
+    plan = explain(statement)
+
+    # THEN only the index on tag and note is read
+    assert "USING COVERING INDEX ix_notetaglink_tag_id_note_id (tag_id=?)" in plan
+
+
+def test_notes_in_folder_use_index() -> None:
+    """Test that the notes in a folder are found through an index."""
+    # GIVEN the query for the notes in a folder
+    statement = select(Note).where(Note.folder_id == 1)
+
+    # WHEN the query is planned
+    plan = explain(statement)
+
+    # THEN the index on the folder is searched
+    assert "USING INDEX ix_note_folder_id (folder_id=?)" in plan
+
+
+def test_folder_subtree_uses_index() -> None:
+    """Test that every level of a folder subtree is found through an index."""
+    # GIVEN the query for a folder and all of its descendants
+    subtree = select_folder_subtree(1, uuid.uuid4())
+    statement = select(Folder).join(subtree, Folder.id == subtree.c.id)
+
+    # WHEN the query is planned
+    plan = explain(statement)
+
+    # THEN the children of each folder are searched with the index on the parent
+    recursive_step = plan.split("RECURSIVE STEP")[1]
+    assert "USING INDEX ix_folder_parent_id_name (parent_id=?)" in recursive_step
@@ -0,0 +1,59 @@
+import time
+
+from app.cache import TTLCache
+
+
+def test_cache_get_and_set() -> None:
+    """Test storing and retrieving a value."""
+    # GIVEN a cache with a value
+    cache: TTLCache[str, int] = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+
+    # WHEN the value is retrieved
+    # THEN it is returned, while missing keys return None
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+
+
+def test_cache_evicts_least_recently_used() -> None:
+    """Test that a full cache evicts the least recently used entry."""
+    # GIVEN a full cache where "a" was used after "b" was stored
+    cache: TTLCache[str, int] = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+
+    # WHEN another value is stored
+    cache.set("c", 3)
+
+    # THEN "b" is evicted
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3  # noqa: PLR2004
+
+
+def test_cache_entries_expire() -> None:
+    """Test that entries are no longer returned after the ttl."""
+    # GIVEN a cache with a very short ttl
+    cache: TTLCache[str, int] = TTLCache(max_size=2, ttl=0.01)
+    cache.set("a", 1)
+
+    # WHEN the ttl has passed
+    time.sleep(0.02)
+
+    # THEN the entry is gone
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_cache_invalidate() -> None:
+    """Test removing a single entry."""
+    # GIVEN a cache with a value
+    cache: TTLCache[str, int] = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+
+    # WHEN the entry is invalidated
+    cache.invalidate("a")
+
+    # THEN it is gone
+    assert cache.get("a") is None
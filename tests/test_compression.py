@@ -0,0 +1,42 @@
+import pytest
+
+from app.shared.compression import (
+    compress_body,
+    decompress_body,
+    preview_compressed_body,
+)
+from app.shared.constants import BODY_COMPRESSION_MIN_BYTES
+
+
+@pytest.mark.parametrize(
+    ("body", "is_compressed"),
+    [
+        pytest.param("Short body", False, id="short"),
+        pytest.param("Long body " * 200, True, id="long"),
+        pytest.param("a" * (BODY_COMPRESSION_MIN_BYTES - 1), False, id="threshold"),
+    ],
+)
+def test_compress_body(body: str, is_compressed: bool) -> None:  # noqa: FBT001
+    """Test that only long bodies are compressed."""
+    # GIVEN a body
+    # WHEN it is compressed
+    plain, compressed = compress_body(body)
+
+    # THEN it is only stored compressed if it is long enough
+    assert (compressed is not None) == is_compressed
+    assert (plain is None) == is_compressed
+
+    # AND it can be restored
+    assert decompress_body(plain, compressed) == body
+
+
+def test_preview_compressed_body() -> None:
+    """Test that a preview of a compressed body has the requested length."""
+    # GIVEN a compressed body with characters of several bytes
+    body = "Ünïcode 😀 text " * 200
+    _, compressed = compress_body(body)
+
+    # WHEN a preview is taken
+    # THEN it is the start of the body
+    assert preview_compressed_body(compressed, 20) == body[:20]
+    assert preview_compressed_body(None, 20) is None
@@ -1,10 +1,8 @@
-from sqlmodel import SQLModel, create_engine
-from sqlmodel.pool import StaticPool
+from sqlmodel import SQLModel
 
-# global engine for unit tests, using an in-memory SQLite database for testing purposes
-engine = create_engine(
-    "sqlite://",
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
-)
+from app.database import create_database_engine
+
+# global engine for unit tests, using an in-memory SQLite database for testing
+# purposes, with the same connection settings as the application
+engine = create_database_engine("sqlite://")
 SQLModel.metadata.create_all(engine)
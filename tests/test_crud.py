@@ -0,0 +1,110 @@
+from pathlib import Path
+from typing import Any
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, select
+
+from app.crud import (
+    get_note_summaries,
+    get_or_create_tag,
+    record_changes,
+    record_changes_where,
+)
+from app.database import create_database_engine
+from app.models.tables import Note, Tag, User
+from app.shared.constants import NOTE_PREVIEW_LENGTH
+from tests.models.factories import NoteFactory
+from tests.test_config import engine
+from tests.utils import count_queries
+
+
+def test_get_or_create_tag_reads_concurrent_tag(tmp_path: Path) -> None:
+    """Test that a tag created by another transaction is read instead of inserted."""
+    # GIVEN a user in a database file
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'notes.db'}")
+    SQLModel.metadata.create_all(engine)
+    user = User(username="user", email="user@example.com", hashed_password="")
+    owner_id = user.id
+    with Session(engine) as session:
+        session.add(user)
+        session.commit()
+
+    # AND another transaction that commits the root tag right before it is inserted
+    competing_tag = Tag(name="aa", full_name="aa", owner_id=owner_id)
+    raced: list[bool] = []
+
+    def before_cursor_execute(*args: Any) -> None:
+        if args[2].startswith("INSERT INTO tag ") and not raced:
+            raced.append(True)
+            with Session(engine, expire_on_commit=False) as other_session:
+                other_session.add(competing_tag)
+                other_session.commit()
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+
+    # WHEN the tags are created
+    with Session(engine) as session:
+        tag = get_or_create_tag(["aa", "bb"], owner_id, session)
+        session.commit()
+        session.refresh(tag)
+
+        # THEN the new child tag is created below the competing tag
+        assert tag.full_name == "aa/bb"
+        assert tag.parent_id == competing_tag.id
+
+        # AND the root tag exists only once
+        statement = select(Tag).where(Tag.full_name == "aa")
+        assert [tag.id for tag in session.exec(statement)] == [competing_tag.id]
+
+
+def test_get_note_summaries_without_sql_decompression(
+    note_factory: NoteFactory,
+    test_user: User,
+    session: Session,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that compressed bodies are previewed here on databases other than SQLite."""
+    # GIVEN a note with a short body and a note with a compressed long body
+    long_body = "Ünïcode lorem ipsum " * 100
+    note_factory.create(owner_id=test_user.id, body="Short")
+    note_factory.create(owner_id=test_user.id, body=long_body)
+
+    # AND a database that cannot decompress bodies
+    monkeypatch.setattr(session.get_bind().dialect, "name", "postgresql")
+
+    # WHEN the summaries of the notes are read
+    with count_queries(engine) as statements:
+        summaries, _ = get_note_summaries(test_user.id, session, None, 10)
+
+    # THEN both previews are cut from the bodies
+    previews = [summary.preview for summary in summaries]
+    assert previews == ["Short", long_body[:NOTE_PREVIEW_LENGTH]]
+
+    # AND the database is not asked to decompress
+    assert not any("preview_compressed_body" in statement for statement in statements)
+
+
+def test_record_changes_locks_owner_on_postgresql(
+    note_factory: NoteFactory,
+    test_user: User,
+    session: Session,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that changes are recorded under a lock of their owner on PostgreSQL."""
+    # GIVEN a note of the user
+    note = note_factory.create(owner_id=test_user.id)
+
+    # AND a database that reports PostgreSQL and records the advisory locks
+    keys: list[int] = []
+    connection = session.connection().connection.driver_connection
+    connection.create_function("pg_advisory_xact_lock", 1, keys.append)
+    monkeypatch.setattr(session.get_bind().dialect, "name", "postgresql")
+
+    # WHEN changes of the note are recorded by id and by a condition
+    record_changes(Note, [note.id], test_user.id, session)
+    record_changes_where(Note, Note.id == note.id, session)
+
+    # THEN both take the lock of the user
+    key = int.from_bytes(test_user.id.bytes[:8], signed=True)
+    assert keys == [key, key]
@@ -0,0 +1,309 @@
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+import sqlalchemy as sa
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import Connection, Engine, inspect
+from sqlmodel import SQLModel
+
+from app import migrations
+from app.database import create_database_engine
+from app.migrations import (
+    backfill_in_batches,
+    check_schema_version,
+    include_name,
+    rebuild_table_in_batches,
+)
+from tests.utils import count_queries
+
+ALEMBIC_INI = Path(__file__).parent.parent / "alembic.ini"
+
+
+@pytest.fixture(name="migration_engine")
+def migration_engine_fixture(tmp_path: Path) -> Iterator[Engine]:
+    """Fixture for an engine of an empty SQLite database file."""
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'notes.db'}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(name="migration_connection")
+def migration_connection_fixture(migration_engine: Engine) -> Iterator[Connection]:
+    """Fixture for a connection to migrate the database, like alembic/env.py.
+
+    Foreign keys are not enforced, as tables are recreated.
+    """
+    with migration_engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        connection.commit()
+        yield connection
+
+
+def run_alembic(connection: Connection, action: str, revision: str) -> None:
+    """Upgrade or downgrade the database of the connection to a revision."""
+    config = Config(ALEMBIC_INI)
+    config.attributes["connection"] = connection
+    getattr(command, action)(config, revision)
+    connection.commit()
+
+
+def test_migrations_match_models(
+    migration_engine: Engine,
+    migration_connection: Connection,
+) -> None:
+    """Test that the migrations create the schema described by the models."""
+    # GIVEN a database migrated to the latest revision
+    run_alembic(migration_connection, "upgrade", "head")
+
+    # WHEN the schema is compared with the models
+    context = MigrationContext.configure(
+        migration_connection,
+        opts={"include_name": include_name},
+    )
+    differences = compare_metadata(context, SQLModel.metadata)
+
+    # THEN there are no differences
+    assert differences == []
+
+    # AND the full-text search index exists
+    assert "note_fts" in inspect(migration_engine).get_table_names()
+
+
+def test_migrations_downgrade(
+    migration_engine: Engine,
+    migration_connection: Connection,
+) -> None:
+    """Test that all migrations can be reverted."""
+    # GIVEN a database migrated to the latest revision
+    run_alembic(migration_connection, "upgrade", "head")
+
+    # WHEN all migrations are reverted
+    run_alembic(migration_connection, "downgrade", "base")
+
+    # THEN only the version table is left
+    assert inspect(migration_engine).get_table_names() == ["alembic_version"]
+
+
+def test_check_schema_version(
+    migration_engine: Engine,
+    migration_connection: Connection,
+) -> None:
+    """Test that startup requires a migrated database."""
+    # GIVEN a database that is not migrated
+    # WHEN the schema version is checked
+    # THEN an error explains how to migrate it
+    with pytest.raises(RuntimeError, match="alembic upgrade head"):
+        check_schema_version(migration_engine)
+
+    # AND once it is migrated the check passes
+    run_alembic(migration_connection, "upgrade", "head")
+    check_schema_version(migration_engine)
+
+
+def test_upgrade_unversioned_database(
+    migration_engine: Engine,
+    migration_connection: Connection,
+) -> None:
+    """Test that a database built by create_all before the migrations is upgraded."""
+    # GIVEN a database with the baseline schema and a tag, but no version table
+    run_alembic(migration_connection, "upgrade", "0001")
+    migration_connection.execute(sa.text("DROP TABLE alembic_version"))
+    migration_connection.execute(sa.text("INSERT INTO tag (id, name) VALUES (1, 'aa')"))
+    migration_connection.commit()
+
+    # WHEN the database is migrated
+    run_alembic(migration_connection, "upgrade", "head")
+
+    # THEN it is at the latest revision
+    check_schema_version(migration_engine)
+
+    # AND its data is kept
+    statement = sa.text("SELECT full_name FROM tag")
+    assert migration_connection.execute(statement).scalars().all() == ["aa"]
+
+
+def test_backfill_in_batches(migration_engine: Engine) -> None:
+    """Test that a backfill updates all matching rows in batches."""
+    # GIVEN a table with 25 rows, of which the odd ones need a value
+    metadata = sa.MetaData()
+    table = sa.Table(
+        "item",
+        metadata,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("value", sa.Integer, nullable=True),
+    )
+    metadata.create_all(migration_engine)
+    with migration_engine.begin() as connection:
+        connection.execute(table.insert(), [{"id": i} for i in range(1, 26)])
+
+    # WHEN the rows are backfilled in batches of 10
+    autocommit_engine = migration_engine.execution_options(
+        isolation_level="AUTOCOMMIT",
+    )
+    with (
+        autocommit_engine.connect() as connection,
+        count_queries(migration_engine) as statements,
+    ):
+        updated = backfill_in_batches(
+            connection,
+            table,
+            table.c.id,
+            {"value": 1},
+            where=table.c.id % 2 == 1,
+            batch_size=10,
+        )
+
+    # THEN only the matching rows are updated
+    assert updated == 13  # noqa: PLR2004
+    with migration_engine.connect() as connection:
+        rows = connection.execute(sa.select(table).order_by(table.c.id)).all()
+    assert [row.value for row in rows] == [1 if i % 2 else None for i in range(1, 26)]
+
+    # AND every batch is a separate update
+    assert sum(statement.startswith("UPDATE") for statement in statements) == 3  # noqa: PLR2004
+
+
+def test_rebuild_table_in_batches(
+    migration_connection: Connection,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that a table is recreated without losing writes during the copy."""
+    # GIVEN a table with 25 rows, an index and a trigger
+    connection = migration_connection
+    for ddl in (
+        "CREATE TABLE item (id INTEGER PRIMARY KEY, value INTEGER)",
+        "CREATE INDEX ix_item_value ON item (value)",
+        "CREATE TRIGGER item_after_delete AFTER DELETE ON item BEGIN SELECT 1; END",
+    ):
+        connection.exec_driver_sql(ddl)
+    connection.execute(
+        sa.text("INSERT INTO item (id, value) VALUES (:id, :id)"),
+        [{"id": i} for i in range(1, 26)],
+    )
+    connection.commit()
+
+    # AND writes to copied and not yet copied rows after the first batch
+    iter_key_ranges = migrations.iter_key_ranges
+
+    def iter_key_ranges_with_writes(*args: Any) -> Iterator[tuple[Any, Any]]:
+        for i, key_range in enumerate(iter_key_ranges(*args, batch_size=10)):
+            yield key_range
+            if i == 0:
+                for statement in (
+                    "UPDATE item SET value = 100 WHERE id IN (1, 20)",
+                    "DELETE FROM item WHERE id IN (2, 21)",
+                    "INSERT INTO item (id, value) VALUES (26, 26)",
+                ):
+                    connection.exec_driver_sql(statement)
+
+    monkeypatch.setattr(migrations, "iter_key_ranges", iter_key_ranges_with_writes)
+
+    # WHEN the table is recreated with a new column, in the transaction of a
+    # migration as alembic/env.py runs them
+    context = MigrationContext.configure(
+        connection,
+        opts={"transaction_per_migration": True},
+    )
+    with (
+        Operations.context(context),
+        context.begin_transaction(_per_migration=True),
+    ):
+        rebuild_table_in_batches(
+            "item",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("value", sa.Integer()),
+            sa.Column("added", sa.Integer(), server_default="0", nullable=False),
+            columns=["id", "value"],
+        )
+
+    # THEN it has all rows as they were written, with the new column
+    statement = sa.text("SELECT id, value, added FROM item ORDER BY id")
+    expected = {i: i for i in range(1, 27) if i not in {2, 21}} | {1: 100, 20: 100}
+    assert connection.execute(statement).tuples().all() == [
+        (key, value, 0) for key, value in sorted(expected.items())
+    ]
+
+    # AND only the index and trigger of the old table are left
+    statement = sa.text(
+        "SELECT name FROM sqlite_master WHERE name LIKE '%item%' ORDER BY name",
+    )
+    assert connection.execute(statement).scalars().all() == [
+        "item",
+        "item_after_delete",
+        "ix_item_value",
+    ]
+
+
+def test_tag_paths_migration(migration_connection: Connection) -> None:
+    """Test that the full names and paths of existing tags are backfilled."""
+    # GIVEN a database before tags had full names, with a hierarchy of tags and
+    # a tag whose parent was deleted
+    run_alembic(migration_connection, "upgrade", "0001")
+    migration_connection.execute(
+        sa.text("INSERT INTO tag (id, name, parent_id) VALUES (:id, :name, :parent)"),
+        [
+            {"id": 1, "name": "aa", "parent": None},
+            {"id": 2, "name": "bb", "parent": 1},
+            {"id": 3, "name": "cc", "parent": 2},
+            {"id": 4, "name": "dd", "parent": 1},
+            {"id": 5, "name": "ee", "parent": 99},
+        ],
+    )
+    migration_connection.commit()
+
+    # WHEN the database is migrated
+    run_alembic(migration_connection, "upgrade", "0002")
+
+    # THEN every tag has the full name and path of its place in the hierarchy
+    statement = sa.text("SELECT id, parent_id, full_name, path FROM tag ORDER BY id")
+    assert migration_connection.execute(statement).tuples().all() == [
+        (1, None, "aa", ""),
+        (2, 1, "aa/bb", "1/"),
+        (3, 2, "aa/bb/cc", "1/2/"),
+        (4, 1, "aa/dd", "1/"),
+        (5, None, "ee", ""),
+    ]
+
+
+def test_note_bodies_migration(migration_connection: Connection) -> None:
+    """Test that note bodies are moved to their own table and back."""
+    # GIVEN a database before the note bodies were moved, with a short and a
+    # long note
+    bodies = {1: "Short body", 2: "Long body " * 200}
+    connection = migration_connection
+    run_alembic(connection, "upgrade", "0006")
+    for note_id, body in bodies.items():
+        connection.execute(
+            sa.text("INSERT INTO note (id, title, body) VALUES (:id, 'T', :body)"),
+            {"id": note_id, "body": body},
+        )
+    connection.commit()
+
+    # WHEN the database is migrated
+    run_alembic(connection, "upgrade", "0007")
+
+    # THEN the bodies are in their own table, the long one compressed
+    rows = connection.execute(
+        sa.text("SELECT note_id, plain, compressed FROM notebody ORDER BY note_id"),
+    ).all()
+    assert [(row.plain, row.compressed is None) for row in rows] == [
+        (bodies[1], True),
+        (None, False),
+    ]
+
+    # AND both can still be found
+    statement = sa.text("SELECT rowid FROM note_fts WHERE note_fts MATCH 'body'")
+    assert connection.execute(statement).scalars().all() == [1, 2]
+
+    # AND the migration can be reverted without losing the bodies
+    run_alembic(connection, "downgrade", "0006")
+    rows = connection.execute(sa.text("SELECT id, body FROM note")).all()
+    assert {row.id: row.body for row in rows} == bodies
+    statement = sa.text("SELECT rowid FROM note_fts WHERE note_fts MATCH 'long'")
+    assert connection.execute(statement).scalars().all() == [2]
@@ -1,4 +1,9 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
 from datetime import timedelta
+from typing import Any
+
+from sqlalchemy import Engine, event
 
 from app.security import create_access_token
 
@@ -16,3 +21,18 @@ def get_auth_header_for_user(
     )
     headers["Authorization"] = f"Bearer {token}"
     return headers
+
+
+@contextmanager
+def count_queries(engine: Engine) -> Iterator[list[str]]:
+    """Record every SQL statement executed on the engine inside the block."""
+    statements: list[str] = []
+
+    def before_cursor_execute(*args: Any) -> None:
+        statements.append(args[2])
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)